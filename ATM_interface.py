@@ -1,39 +1,13 @@
-class Account:
-    def __init__(self, account_number, pin, balance=0):
-        self.account_number = account_number
-        self.pin = pin
-        self.balance = balance
+from datetime import date, timedelta
 
-    def check_balance(self):
-        return self.balance
-
-    def deposit(self, amount):
-        if amount > 0:
-            self.balance += amount
-            return True
-        return False
-
-    def withdraw(self, amount):
-        if 0 < amount <= self.balance:
-            self.balance -= amount
-            return True
-        return False
+import metrics
+from atm_core import ATMCore, TooManyAttempts, open_store
+from atm_journal import describe
+from money import Money
 
 class ATM:
-    def __init__(self):
-        self.accounts = {}
-
-    def create_account(self, account_number, pin, initial_balance=0):
-        if account_number not in self.accounts:
-            self.accounts[account_number] = Account(account_number, pin, initial_balance)
-            return True
-        return False
-
-    def authenticate(self, account_number, pin):
-        account = self.accounts.get(account_number)
-        if account and account.pin == pin:
-            return account
-        return None
+    def __init__(self, core=None):
+        self.core = core if core is not None else ATMCore()
 
     def run(self):
         while True:
@@ -56,8 +30,13 @@ class ATM:
     def create_account_flow(self):
         account_number = input("Enter new account number: ")
         pin = input("Enter new PIN: ")
-        initial_balance = self.get_float_input("Enter initial deposit amount: ")
-        if self.create_account(account_number, pin, initial_balance):
+        initial_balance = self.get_money_input("Enter initial deposit amount: ")
+        try:
+            created = self.core.create_account(account_number, pin, initial_balance)
+        except ValueError as e:
+            print(f"{e}. Please try again.")
+            return
+        if created:
             print("Account created successfully!")
         else:
             print("Account number already exists. Please try again.")
@@ -65,7 +44,11 @@ class ATM:
     def login_flow(self):
         account_number = input("Enter account number: ")
         pin = input("Enter PIN: ")
-        account = self.authenticate(account_number, pin)
+        try:
+            account = self.core.authenticate(account_number, pin, source='console')
+        except TooManyAttempts as e:
+            print(e)
+            return
         if account:
             print("Login successful!")
             self.account_menu(account)
@@ -78,37 +61,70 @@ class ATM:
             print("1. Check Balance")
             print("2. Deposit Money")
             print("3. Withdraw Money")
-            print("4. Logout")
+            print("4. Recent Transactions")
+            print("5. Statement")
+            print("6. Logout")
             choice = input("Enter your choice: ")
 
             if choice == "1":
-                print(f"Your balance is: ${account.check_balance():.2f}")
+                print(f"Your balance is: ${account.check_balance()}")
             elif choice == "2":
-                amount = self.get_float_input("Enter amount to deposit: ")
+                amount = self.get_money_input("Enter amount to deposit: ")
                 if account.deposit(amount):
-                    print(f"${amount:.2f} deposited successfully!")
+                    print(f"${amount} deposited successfully!")
                 else:
                     print("Invalid deposit amount. Please try again.")
             elif choice == "3":
-                amount = self.get_float_input("Enter amount to withdraw: ")
+                amount = self.get_money_input("Enter amount to withdraw: ")
                 if account.withdraw(amount):
-                    print(f"${amount:.2f} withdrawn successfully!")
+                    print(f"${amount} withdrawn successfully!")
                 else:
                     print("Invalid withdrawal amount or insufficient funds. Please try again.")
             elif choice == "4":
+                self.print_entries(account.history(10))
+            elif choice == "5":
+                start, end = self.get_date_range()
+                self.print_entries(account.statement(start, end))
+            elif choice == "6":
                 print("Logged out successfully!")
                 break
             else:
                 print("Invalid choice. Please try again.")
 
     @staticmethod
-    def get_float_input(prompt):
+    def print_entries(entries):
+        if not entries:
+            print("No transactions.")
+        for entry in entries:
+            print(describe(entry))
+
+    @staticmethod
+    def get_date_range():
+        # Both dates inclusive; blank means the last 30 days
+        while True:
+            try:
+                start = input("From date (YYYY-MM-DD, blank for 30 days ago): ").strip()
+                end = input("To date (YYYY-MM-DD, blank for today): ").strip()
+                end = date.fromisoformat(end) if end else date.today()
+                start = date.fromisoformat(start) if start else end - timedelta(days=30)
+                return start, end + timedelta(days=1)
+            except ValueError:
+                print("Invalid date. Please use YYYY-MM-DD.")
+
+    @staticmethod
+    def get_money_input(prompt):
         while True:
             try:
-                return float(input(prompt))
+                return Money.parse(input(prompt))
             except ValueError:
                 print("Invalid input. Please enter a numeric value.")
 
 if __name__ == "__main__":
-    atm = ATM()
-    atm.run()
+    # Storage comes from ATM_STORE, e.g. "sqlite:atm.db"; see atm_core
+    metrics.start_from_env()
+    core = ATMCore(open_store())
+    atm = ATM(core)
+    try:
+        atm.run()
+    finally:
+        core.close()
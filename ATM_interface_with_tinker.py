@@ -1,77 +1,78 @@
 import tkinter as tk
+from datetime import date, timedelta
 from tkinter import messagebox
 
-class Account:
-    def __init__(self, account_number, pin, balance=0):
-        self.account_number = account_number
-        self.pin = pin
-        self.balance = balance
-
-    def check_balance(self):
-        return self.balance
-
-    def deposit(self, amount):
-        if amount > 0:
-            self.balance += amount
-            return True
-        return False
-
-    def withdraw(self, amount):
-        if 0 < amount <= self.balance:
-            self.balance -= amount
-            return True
-        return False
+import metrics
+from atm_core import ATMCore, TooManyAttempts, open_store
+from atm_journal import describe
+from money import Money
+from tk_screens import ScreenManager, clear
 
 class ATM:
-    def __init__(self, root):
-        self.accounts = {}
+    def __init__(self, root, core=None):
+        self.core = core if core is not None else ATMCore()
         self.current_account = None
         self.root = root
         self.root.title("ATM Interface")
+        self.screens = ScreenManager(root)
+        self.screens.container.pack(fill='both', expand=True)
+        self.screens.add('login', self.build_login_screen,
+                         lambda: clear(self.account_number_entry, self.pin_entry))
+        self.screens.add('create_account', self.build_create_account_screen,
+                         lambda: clear(self.new_account_number_entry, self.new_pin_entry,
+                                       self.initial_deposit_entry))
+        self.screens.add('account_menu', self.build_account_menu, self.refresh_account_menu)
+        self.screens.add('deposit', self.build_deposit_screen,
+                         lambda: clear(self.deposit_amount_entry))
+        self.screens.add('withdraw', self.build_withdraw_screen,
+                         lambda: clear(self.withdraw_amount_entry))
+        self.screens.add('history', self.build_history_screen, self.refresh_history)
         self.create_login_screen()
 
     def create_login_screen(self):
-        self.clear_screen()
-        
-        tk.Label(self.root, text="ATM", font=('Helvetica', 16)).pack(pady=10)
+        self.screens.show('login')
+
+    def build_login_screen(self, frame):
+        tk.Label(frame, text="ATM", font=('Helvetica', 16)).pack(pady=10)
         
-        tk.Label(self.root, text="Account Number:").pack(pady=5)
-        self.account_number_entry = tk.Entry(self.root)
+        tk.Label(frame, text="Account Number:").pack(pady=5)
+        self.account_number_entry = tk.Entry(frame)
         self.account_number_entry.pack(pady=5)
         
-        tk.Label(self.root, text="PIN:").pack(pady=5)
-        self.pin_entry = tk.Entry(self.root, show='*')
+        tk.Label(frame, text="PIN:").pack(pady=5)
+        self.pin_entry = tk.Entry(frame, show='*')
         self.pin_entry.pack(pady=5)
         
-        tk.Button(self.root, text="Login", command=self.login).pack(pady=10)
-        tk.Button(self.root, text="Create Account", command=self.create_account_screen).pack(pady=5)
+        tk.Button(frame, text="Login", command=self.login).pack(pady=10)
+        tk.Button(frame, text="Create Account", command=self.create_account_screen).pack(pady=5)
 
     def create_account_screen(self):
-        self.clear_screen()
-        
-        tk.Label(self.root, text="Create Account", font=('Helvetica', 16)).pack(pady=10)
+        self.screens.show('create_account')
+
+    def build_create_account_screen(self, frame):
+        tk.Label(frame, text="Create Account", font=('Helvetica', 16)).pack(pady=10)
         
-        tk.Label(self.root, text="Account Number:").pack(pady=5)
-        self.new_account_number_entry = tk.Entry(self.root)
+        tk.Label(frame, text="Account Number:").pack(pady=5)
+        self.new_account_number_entry = tk.Entry(frame)
         self.new_account_number_entry.pack(pady=5)
         
-        tk.Label(self.root, text="PIN:").pack(pady=5)
-        self.new_pin_entry = tk.Entry(self.root, show='*')
+        tk.Label(frame, text="PIN:").pack(pady=5)
+        self.new_pin_entry = tk.Entry(frame, show='*')
         self.new_pin_entry.pack(pady=5)
         
-        tk.Label(self.root, text="Initial Deposit:").pack(pady=5)
-        self.initial_deposit_entry = tk.Entry(self.root)
+        tk.Label(frame, text="Initial Deposit:").pack(pady=5)
+        self.initial_deposit_entry = tk.Entry(frame)
         self.initial_deposit_entry.pack(pady=5)
         
-        tk.Button(self.root, text="Create Account", command=self.create_account).pack(pady=10)
-        tk.Button(self.root, text="Back to Login", command=self.create_login_screen).pack(pady=5)
+        tk.Button(frame, text="Create Account", command=self.create_account).pack(pady=10)
+        tk.Button(frame, text="Back to Login", command=self.create_login_screen).pack(pady=5)
 
     def create_account(self):
         account_number = self.new_account_number_entry.get()
         pin = self.new_pin_entry.get()
-        initial_deposit = self.get_float_input(self.initial_deposit_entry.get())
-        if account_number and pin and initial_deposit is not None:
-            if self.create_account_logic(account_number, pin, initial_deposit):
+        initial_deposit = self.get_money_input(self.initial_deposit_entry.get())
+        if account_number and pin and initial_deposit is not None and initial_deposit.cents >= 0:
+            if self.core.create_account(account_number, pin, initial_deposit):
                 messagebox.showinfo("Success", "Account created successfully!")
                 self.create_login_screen()
             else:
@@ -79,59 +80,59 @@ class ATM:
         else:
             messagebox.showerror("Error", "Please fill in all fields correctly.")
 
-    def create_account_logic(self, account_number, pin, initial_balance=0):
-        if account_number not in self.accounts:
-            self.accounts[account_number] = Account(account_number, pin, initial_balance)
-            return True
-        return False
-
     def login(self):
         account_number = self.account_number_entry.get()
         pin = self.pin_entry.get()
-        account = self.authenticate(account_number, pin)
+        try:
+            account = self.core.authenticate(account_number, pin, source='tk')
+        except TooManyAttempts as e:
+            messagebox.showerror("Error", str(e))
+            return
         if account:
             self.current_account = account
             self.account_menu()
         else:
             messagebox.showerror("Error", "Invalid account number or PIN.")
 
-    def authenticate(self, account_number, pin):
-        account = self.accounts.get(account_number)
-        if account and account.pin == pin:
-            return account
-        return None
-
     def account_menu(self):
-        self.clear_screen()
-        
-        tk.Label(self.root, text="Account Menu", font=('Helvetica', 16)).pack(pady=10)
+        self.screens.show('account_menu')
+
+    def build_account_menu(self, frame):
+        tk.Label(frame, text="Account Menu", font=('Helvetica', 16)).pack(pady=10)
+        self.account_label = tk.Label(frame)
+        self.account_label.pack()
         
-        tk.Button(self.root, text="Check Balance", command=self.check_balance).pack(pady=5)
-        tk.Button(self.root, text="Deposit Money", command=self.deposit_screen).pack(pady=5)
-        tk.Button(self.root, text="Withdraw Money", command=self.withdraw_screen).pack(pady=5)
-        tk.Button(self.root, text="Logout", command=self.logout).pack(pady=10)
+        tk.Button(frame, text="Check Balance", command=self.check_balance).pack(pady=5)
+        tk.Button(frame, text="Deposit Money", command=self.deposit_screen).pack(pady=5)
+        tk.Button(frame, text="Withdraw Money", command=self.withdraw_screen).pack(pady=5)
+        tk.Button(frame, text="Transaction History", command=self.history_screen).pack(pady=5)
+        tk.Button(frame, text="Logout", command=self.logout).pack(pady=10)
+
+    def refresh_account_menu(self):
+        self.account_label.config(text=f"Account {self.current_account.account_number}")
 
     def check_balance(self):
         balance = self.current_account.check_balance()
-        messagebox.showinfo("Balance", f"Your balance is: ${balance:.2f}")
+        messagebox.showinfo("Balance", f"Your balance is: ${balance}")
 
     def deposit_screen(self):
-        self.clear_screen()
-        
-        tk.Label(self.root, text="Deposit Money", font=('Helvetica', 16)).pack(pady=10)
+        self.screens.show('deposit')
+
+    def build_deposit_screen(self, frame):
+        tk.Label(frame, text="Deposit Money", font=('Helvetica', 16)).pack(pady=10)
         
-        tk.Label(self.root, text="Amount to Deposit:").pack(pady=5)
-        self.deposit_amount_entry = tk.Entry(self.root)
+        tk.Label(frame, text="Amount to Deposit:").pack(pady=5)
+        self.deposit_amount_entry = tk.Entry(frame)
         self.deposit_amount_entry.pack(pady=5)
         
-        tk.Button(self.root, text="Deposit", command=self.deposit).pack(pady=10)
-        tk.Button(self.root, text="Back to Menu", command=self.account_menu).pack(pady=5)
+        tk.Button(frame, text="Deposit", command=self.deposit).pack(pady=10)
+        tk.Button(frame, text="Back to Menu", command=self.account_menu).pack(pady=5)
 
     def deposit(self):
-        amount = self.get_float_input(self.deposit_amount_entry.get())
+        amount = self.get_money_input(self.deposit_amount_entry.get())
         if amount is not None:
             if self.current_account.deposit(amount):
-                messagebox.showinfo("Success", f"${amount:.2f} deposited successfully!")
+                messagebox.showinfo("Success", f"${amount} deposited successfully!")
                 self.account_menu()
             else:
                 messagebox.showerror("Error", "Invalid deposit amount.")
@@ -139,44 +140,91 @@ class ATM:
             messagebox.showerror("Error", "Please enter a valid amount.")
 
     def withdraw_screen(self):
-        self.clear_screen()
-        
-        tk.Label(self.root, text="Withdraw Money", font=('Helvetica', 16)).pack(pady=10)
+        self.screens.show('withdraw')
+
+    def build_withdraw_screen(self, frame):
+        tk.Label(frame, text="Withdraw Money", font=('Helvetica', 16)).pack(pady=10)
         
-        tk.Label(self.root, text="Amount to Withdraw:").pack(pady=5)
-        self.withdraw_amount_entry = tk.Entry(self.root)
+        tk.Label(frame, text="Amount to Withdraw:").pack(pady=5)
+        self.withdraw_amount_entry = tk.Entry(frame)
         self.withdraw_amount_entry.pack(pady=5)
         
-        tk.Button(self.root, text="Withdraw", command=self.withdraw).pack(pady=10)
-        tk.Button(self.root, text="Back to Menu", command=self.account_menu).pack(pady=5)
+        tk.Button(frame, text="Withdraw", command=self.withdraw).pack(pady=10)
+        tk.Button(frame, text="Back to Menu", command=self.account_menu).pack(pady=5)
 
     def withdraw(self):
-        amount = self.get_float_input(self.withdraw_amount_entry.get())
+        amount = self.get_money_input(self.withdraw_amount_entry.get())
         if amount is not None:
             if self.current_account.withdraw(amount):
-                messagebox.showinfo("Success", f"${amount:.2f} withdrawn successfully!")
+                messagebox.showinfo("Success", f"${amount} withdrawn successfully!")
                 self.account_menu()
             else:
                 messagebox.showerror("Error", "Invalid withdrawal amount or insufficient funds.")
         else:
             messagebox.showerror("Error", "Please enter a valid amount.")
 
+    def history_screen(self):
+        self.screens.show('history')
+
+    def build_history_screen(self, frame):
+        tk.Label(frame, text="Transaction History", font=('Helvetica', 16)).pack(pady=10)
+        
+        self.history_list = tk.Listbox(frame, width=60, height=12, font=('Courier', 10))
+        self.history_list.pack(padx=10, pady=5)
+        
+        dates = tk.Frame(frame)
+        dates.pack(pady=5)
+        tk.Label(dates, text="From (YYYY-MM-DD):").grid(row=0, column=0)
+        self.statement_start_entry = tk.Entry(dates, width=12)
+        self.statement_start_entry.grid(row=0, column=1)
+        tk.Label(dates, text="To:").grid(row=0, column=2)
+        self.statement_end_entry = tk.Entry(dates, width=12)
+        self.statement_end_entry.grid(row=0, column=3)
+        
+        tk.Button(frame, text="Show Statement", command=self.show_statement).pack(pady=5)
+        tk.Button(frame, text="Back to Menu", command=self.account_menu).pack(pady=5)
+
+    def refresh_history(self):
+        clear(self.statement_start_entry, self.statement_end_entry)
+        self.show_entries(self.current_account.history(10))
+
+    def show_statement(self):
+        # Both dates inclusive; blank means the last 30 days
+        try:
+            end = self.statement_end_entry.get().strip()
+            end = date.fromisoformat(end) if end else date.today()
+            start = self.statement_start_entry.get().strip()
+            start = date.fromisoformat(start) if start else end - timedelta(days=30)
+        except ValueError:
+            messagebox.showerror("Error", "Please enter dates as YYYY-MM-DD.")
+            return
+        self.show_entries(self.current_account.statement(start, end + timedelta(days=1)))
+
+    def show_entries(self, entries):
+        self.history_list.delete(0, 'end')
+        for entry in entries:
+            self.history_list.insert('end', describe(entry))
+        if not entries:
+            self.history_list.insert('end', "No transactions.")
+
     def logout(self):
         self.current_account = None
         self.create_login_screen()
 
-    def clear_screen(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
-
     @staticmethod
-    def get_float_input(value):
+    def get_money_input(value):
         try:
-            return float(value)
+            return Money.parse(value)
         except ValueError:
             return None
 
 if __name__ == "__main__":
+    # Storage comes from ATM_STORE, e.g. "sqlite:atm.db"; see atm_core
+    metrics.start_from_env()
+    core = ATMCore(open_store())
     root = tk.Tk()
-    atm = ATM(root)
-    root.mainloop()
+    atm = ATM(root, core)
+    try:
+        root.mainloop()
+    finally:
+        core.close()
@@ -0,0 +1,230 @@
+import threading
+from array import array
+
+from atm_journal import new_entry
+from metrics import timed
+from money import Money, ZERO
+
+# Account table shared by concurrent ATM sessions, laid out to hold millions
+# of accounts. Instead of one Python object per account, each account is a
+# row number: a dict maps the account number to its row, balances (in cents)
+# live in an array('q') column at 8 bytes each and PIN hashes in a parallel
+# list. Account objects are small views over a row, made on demand.
+#
+# Each row is guarded by one of a fixed set of striped locks, so sessions on
+# different accounts almost never wait on each other and the lock count
+# stays constant however many accounts there are.
+#
+# With a journal (see atm_journal) every balance change is also recorded,
+# under the same lock, as an entry in the account's transaction history.
+# With a ledger too, the entries go through the ledger, which passes them
+# on once their records are on disk (see atm_ledger).
+
+class Account:
+    __slots__ = ('account_number', '_store', '_row')
+
+    def __init__(self, account_number, store, row):
+        self.account_number = account_number
+        self._store = store
+        self._row = row
+
+    @property
+    def balance(self):
+        return Money(self._store._balances[self._row])
+
+    @property
+    def lock(self):
+        return self._store._lock_for_row(self._row)
+
+    @property
+    def ledger(self):
+        return self._store.ledger
+
+    def check_balance(self):
+        return self.balance
+
+    def history(self, n=10):
+        # The last n journal entries, newest first
+        journal = self._store.journal
+        return journal.last(self.account_number, n) if journal else []
+
+    def statement(self, start=None, end=None):
+        # Journal entries in [start, end), oldest first
+        journal = self._store.journal
+        return journal.statement(self.account_number, start, end) if journal else []
+
+    @timed('atm.deposit')
+    def deposit(self, amount):
+        if amount.cents <= 0:
+            return False
+        store = self._store
+        seq = None
+        with self.lock:
+            store._balances[self._row] += amount.cents
+            seq = store._log('deposit', (self.account_number, amount.cents),
+                             new_entry(self.account_number, 'D', amount.cents, store._balances[self._row]))
+        # Wait for the disk outside the lock so other sessions can group-commit
+        if seq is not None:
+            store.ledger.wait(seq)
+        return True
+
+    @timed('atm.withdraw')
+    def withdraw(self, amount):
+        store = self._store
+        seq = None
+        with self.lock:
+            if not 0 < amount.cents <= store._balances[self._row]:
+                return False
+            store._balances[self._row] -= amount.cents
+            seq = store._log('withdraw', (self.account_number, amount.cents),
+                             new_entry(self.account_number, 'W', amount.cents, store._balances[self._row]))
+        if seq is not None:
+            store.ledger.wait(seq)
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, Account) and other._store is self._store and other._row == self._row
+
+    def __hash__(self):
+        return hash(self._row)
+
+    def __repr__(self):
+        return f"Account({self.account_number!r}, balance={self.balance})"
+
+
+class AccountStore:
+    def __init__(self, stripes=1024, ledger=None, journal=None):
+        # With both, the journal is fed through the ledger; open the ledger
+        # after this
+        self.ledger = ledger
+        self.journal = journal
+        if ledger is not None and journal is not None:
+            ledger.journal = journal
+        self._rows = {}                  # account number -> row
+        self._balances = array('q')      # cents
+        self._pins = []                  # PIN hashes, see auth.hash_password
+        self._locked = {}                # row -> locked out until (Unix time)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._create_lock = threading.Lock()
+
+    def _lock_for_row(self, row):
+        return self._locks[row % len(self._locks)]
+
+    def load(self, accounts):
+        # Bulk-loads {account: (pin, balance_cents)} from the ledger at startup
+        with self._create_lock:
+            for account_number, (pin_hash, balance, locked) in accounts.items():
+                row = len(self._balances)
+                self._rows[account_number] = row
+                self._balances.append(balance)
+                self._pins.append(pin_hash)
+                if locked:
+                    self._locked[row] = locked
+
+    def create(self, account_number, pin_hash, balance=ZERO):
+        # Returns the new Account, or None if the number is taken
+        seq = None
+        with self._create_lock:
+            if account_number in self._rows:
+                return None
+            row = len(self._balances)
+            self._balances.append(balance.cents)
+            self._pins.append(pin_hash)
+            seq = self._log('create', (account_number, pin_hash, balance.cents),
+                            new_entry(account_number, 'C', balance.cents, balance.cents))
+            # Publish the row only after the creation is logged, so no
+            # deposit can reach the log ahead of it
+            self._rows[account_number] = row
+        if seq is not None:
+            self.ledger.wait(seq)
+        return Account(account_number, self, row)
+
+    def _log(self, record, args, *entries):
+        # Logs a balance change as ledger.<record>(*args) with its journal
+        # entries, or straight to the journal without a ledger. Call under
+        # the account's lock; returns the ledger sequence number to wait for.
+        if self.ledger:
+            return getattr(self.ledger, record)(*args, wait=False, entries=entries)
+        if self.journal:
+            self.journal.add(entries)
+        return None
+
+    def pin_hash(self, account_number):
+        row = self._rows.get(account_number)
+        return None if row is None else self._pins[row]
+
+    def set_pin_hash(self, account_number, pin_hash):
+        row = self._rows[account_number]
+        with self._lock_for_row(row):
+            self._pins[row] = pin_hash
+            seq = self.ledger.set_pin(account_number, pin_hash, wait=False) if self.ledger else None
+        if seq is not None:
+            self.ledger.wait(seq)
+
+    def locked_until(self, account_number):
+        row = self._rows.get(account_number)
+        return self._locked.get(row, 0.0)
+
+    def set_locked_until(self, account_number, until):
+        row = self._rows[account_number]
+        with self._lock_for_row(row):
+            if until:
+                self._locked[row] = until
+            else:
+                self._locked.pop(row, None)
+            seq = self.ledger.lock(account_number, until, wait=False) if self.ledger else None
+        if seq is not None:
+            self.ledger.wait(seq)
+
+    def get(self, account_number, default=None):
+        row = self._rows.get(account_number)
+        return default if row is None else Account(account_number, self, row)
+
+    def __getitem__(self, account_number):
+        return Account(account_number, self, self._rows[account_number])
+
+    def __contains__(self, account_number):
+        return account_number in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def values(self):
+        return (Account(number, self, row) for number, row in self._rows.items())
+
+    def transfer(self, src, dst, amount):
+        src_row = self._rows.get(src)
+        dst_row = self._rows.get(dst)
+        if src_row is None or dst_row is None or src == dst or amount.cents <= 0:
+            return False
+
+        # Always lock the lower stripe first so two opposite transfers
+        # can't each hold one lock and wait for the other
+        stripes = sorted({src_row % len(self._locks), dst_row % len(self._locks)})
+        locks = [self._locks[i] for i in stripes]
+        seq = None
+        for lock in locks:
+            lock.acquire()
+        try:
+            if self._balances[src_row] < amount.cents:
+                return False
+            self._balances[src_row] -= amount.cents
+            self._balances[dst_row] += amount.cents
+            seq = self._log('transfer', (src, dst, amount.cents),
+                            new_entry(src, 'O', amount.cents, self._balances[src_row]),
+                            new_entry(dst, 'I', amount.cents, self._balances[dst_row]))
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        if seq is not None:
+            self.ledger.wait(seq)
+        return True
+
+    def close(self):
+        if self.ledger:
+            self.ledger.close()
+        if self.journal:
+            self.journal.close()
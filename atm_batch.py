@@ -0,0 +1,394 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+import auth
+from atm_accounts import AccountStore
+from atm_core import ATMCore
+from money import Money, format_cents
+
+# Non-interactive batch mode for the ATM: replays a stream of operations
+# (settlement files, load simulations) through the normal ATM/Account logic.
+# One operation per line, fields separated by whitespace; blank lines and
+# lines starting with # are skipped:
+#
+#   create   <account> <pin> [initial balance]
+#   deposit  <account> <amount>
+#   withdraw <account> <amount>
+#   transfer <from> <to> <amount>
+#
+# Each operation gets one output line, in input order:
+#
+#   <line number> <operation> ok|rejected|error <balance or reason>
+#
+# and summary statistics go to stderr.
+#
+# Accounts are sharded by account number across worker processes, each with
+# its own ATM, so every account's operations run in order on one worker.
+# A transfer between two shards is split into a debit on the source shard
+# and a credit on the target shard, which waits for the debit's outcome.
+#
+#   python atm_batch.py settlement.txt -o results.txt --workers 4
+#   python atm_batch.py - < ops.txt
+
+KINDS = ('create', 'deposit', 'withdraw', 'transfer')
+# Batch runs are in memory and never log in, so created PINs get the
+# cheapest scrypt instead of the login-strength one
+BATCH_SCRYPT_N = 2
+FIELDS = {'deposit': 3, 'withdraw': 3, 'transfer': 4}
+
+
+def _batch_pin_hash(pin):
+    return auth.hash_password(pin, n=BATCH_SCRYPT_N)
+
+
+class Shard:
+    # Applies the operations routed to one shard, in order, to its own ATM
+    def __init__(self, shard=0, inboxes=None):
+        # No transaction journal: the results file is the record of a run
+        self.atm = ATMCore(AccountStore(), hash_pin=_batch_pin_hash)
+        self.shard = shard
+        self.inboxes = inboxes       # per-shard queues for cross-shard debits
+        self.outbox = {}             # target shard -> {line: debited cents}
+        self.debits = {}             # line -> debited cents, from other shards
+        self.stats = Counter()
+
+    def run(self, ops):
+        out = []
+        for op in ops:
+            result = self.apply(op)
+            if result is not None:
+                out.append(result)
+        self.flush()
+        return out
+
+    def apply(self, op):
+        line, kind = op[0], op[1]
+        if kind == 'credit':
+            self.credit(line, op[2])
+            return None
+        try:
+            status, detail = getattr(self, kind)(*op[2:])
+        except ValueError as e:
+            status, detail = 'error', str(e)
+        if kind == 'debit':
+            kind = 'transfer'
+        self.stats[kind, status] += 1
+        return f"{line}\t{kind}\t{status}\t{detail}"
+
+    def create(self, account_number, pin, cents):
+        try:
+            if not self.atm.create_account(account_number, pin, Money(cents)):
+                return 'rejected', 'account exists'
+        except ValueError:
+            return 'rejected', 'invalid amount'
+        self.stats['created'] += cents
+        return 'ok', format_cents(cents)
+
+    def deposit(self, account_number, amount):
+        account = self.atm.accounts.get(account_number)
+        if account is None:
+            return 'rejected', 'unknown account'
+        amount = Money.parse(amount)
+        if not account.deposit(amount):
+            return 'rejected', 'invalid amount'
+        self.stats['deposited'] += amount.cents
+        return 'ok', account.balance
+
+    def withdraw(self, account_number, amount):
+        account = self.atm.accounts.get(account_number)
+        if account is None:
+            return 'rejected', 'unknown account'
+        amount = Money.parse(amount)
+        if not account.withdraw(amount):
+            return 'rejected', 'invalid amount' if amount.cents <= 0 else 'insufficient funds'
+        self.stats['withdrawn'] += amount.cents
+        return 'ok', account.balance
+
+    def transfer(self, src, dst, amount):
+        accounts = self.atm.accounts
+        if src not in accounts or dst not in accounts:
+            return 'rejected', 'unknown account'
+        if src == dst:
+            return 'rejected', 'same account'
+        amount = Money.parse(amount)
+        if amount.cents <= 0:
+            return 'rejected', 'invalid amount'
+        if not self.atm.transfer(src, dst, amount):
+            return 'rejected', 'insufficient funds'
+        self.stats['transferred'] += amount.cents
+        return 'ok', accounts[src].balance
+
+    def debit(self, src, amount, line, target):
+        # Source half of a cross-shard transfer; the target shard credits
+        # whatever was debited here (0 if the transfer was rejected)
+        debited = 0
+        try:
+            result = self.withdraw(src, amount)
+            if result[0] == 'ok':
+                debited = Money.parse(amount).cents
+                self.stats['withdrawn'] -= debited
+                self.stats['transferred'] += debited
+            return result
+        finally:
+            self.outbox.setdefault(target, {})[line] = debited
+
+    def credit(self, line, dst):
+        while line not in self.debits:
+            # Send our own debits first: the source shard may be waiting on them
+            self.flush()
+            self.debits.update(self.inboxes[self.shard].get())
+        cents = self.debits.pop(line)
+        account = self.atm.accounts.get(dst)
+        if account is None:
+            # Routing only sends credits to created accounts; should one
+            # still go astray, the summary shows the money as uncredited
+            # rather than the worker dying with the run waiting on it
+            self.stats['uncredited'] += cents
+            return 'rejected', 'unknown account'
+        if cents:
+            account.deposit(Money(cents))
+        return 'ok', account.balance
+
+    def flush(self):
+        for target, debits in self.outbox.items():
+            self.inboxes[target].put(debits)
+        self.outbox = {}
+
+    def summary(self):
+        stats = dict(self.stats)
+        stats['accounts'] = len(self.atm.accounts)
+        stats['balance'] = sum(account.balance.cents for account in self.atm.accounts.values())
+        return stats
+
+
+def _worker(shard, tasks, results, inboxes):
+    engine = Shard(shard, inboxes)
+    while True:
+        task = tasks.get()
+        if task is None:
+            results.put((shard, None, engine.summary()))
+            return
+        seq, ops = task
+        results.put((shard, seq, engine.run(ops)))
+
+
+class BatchProcessor:
+    def __init__(self, workers=1, chunk_size=20000):
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.known = set()           # accounts created so far in the stream
+        self.stats = Counter()       # operations rejected before routing
+
+    def route(self, lines, first_line):
+        # Splits a chunk into per-shard operation lists. Returns the output
+        # slots (pre-filled for lines answered here), the operations per
+        # shard and, per shard, the output slot of each result it returns.
+        workers = self.workers
+        known = self.known
+        out = []
+        ops = [[] for _ in range(workers)]
+        slots = [[] for _ in range(workers)]
+        for number, text in enumerate(lines, first_line):
+            fields = text.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            kind = fields[0]
+            slot = len(out)
+            out.append(None)
+            if kind == 'create' and len(fields) in (3, 4):
+                try:
+                    cents = Money.parse(fields[3]).cents if len(fields) == 4 else 0
+                except ValueError as e:
+                    out[slot] = self.reject(number, kind, 'error', e)
+                    continue
+                if cents < 0:
+                    # Rejected here so the account never counts as known:
+                    # a cross-shard credit to it would find no account
+                    out[slot] = self.reject(number, kind, 'rejected', 'invalid amount')
+                    continue
+                known.add(fields[1])
+                shard = hash(fields[1]) % workers
+                ops[shard].append((number, kind, fields[1], fields[2], cents))
+            elif FIELDS.get(kind) != len(fields):
+                out[slot] = self.reject(number, kind, 'error', 'bad operation')
+                continue
+            elif fields[1] not in known:
+                out[slot] = self.reject(number, kind, 'rejected', 'unknown account')
+                continue
+            elif kind == 'transfer':
+                shard = hash(fields[1]) % workers
+                target = hash(fields[2]) % workers
+                if shard == target or fields[2] not in known:
+                    ops[shard].append((number, kind, fields[1], fields[2], fields[3]))
+                else:
+                    ops[shard].append((number, 'debit', fields[1], fields[3], number, target))
+                    ops[target].append((number, 'credit', fields[2]))
+            else:
+                shard = hash(fields[1]) % workers
+                ops[shard].append((number, kind, fields[1], fields[2]))
+            slots[shard].append(slot)
+        return out, ops, slots
+
+    def reject(self, number, kind, status, reason):
+        self.stats[kind if kind in KINDS else 'bad', status] += 1
+        return f"{number}\t{kind}\t{status}\t{reason}"
+
+    def run(self, infile, outfile):
+        # Returns the summary statistics
+        start = time.perf_counter()
+        if self.workers == 1:
+            summaries = self._run_inline(infile, outfile)
+        else:
+            summaries = self._run_sharded(infile, outfile)
+        elapsed = time.perf_counter() - start
+
+        stats = Counter(self.stats)
+        for summary in summaries:
+            stats.update(summary)
+        stats['elapsed'] = elapsed
+        return stats
+
+    def _chunks(self, infile):
+        first_line = 1
+        while True:
+            lines = list(islice(infile, self.chunk_size))
+            if not lines:
+                return
+            yield first_line, lines
+            first_line += len(lines)
+
+    def _run_inline(self, infile, outfile):
+        shard = Shard()
+        for first_line, lines in self._chunks(infile):
+            out, ops, slots = self.route(lines, first_line)
+            for slot, result in zip(slots[0], shard.run(ops[0])):
+                out[slot] = result
+            _write(outfile, out)
+        return [shard.summary()]
+
+    def _run_sharded(self, infile, outfile):
+        tasks = [multiprocessing.Queue() for _ in range(self.workers)]
+        inboxes = [multiprocessing.Queue() for _ in range(self.workers)]
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_worker, args=(i, tasks[i], results, inboxes),
+                                             daemon=True)
+                     for i in range(self.workers)]
+        for p in processes:
+            p.start()
+
+        pending = {}      # seq -> (out, slots)
+        done = {}         # (shard, seq) -> results that arrived early
+        next_write = 0
+
+        def receive():
+            # A worker that crashed will never answer; fail instead of waiting
+            while True:
+                try:
+                    return results.get(timeout=1.0)
+                except queue.Empty:
+                    for shard, p in enumerate(processes):
+                        if p.exitcode not in (None, 0):
+                            raise RuntimeError(f"Batch worker {shard} exited with code {p.exitcode}")
+
+        def collect(seq):
+            out, slots = pending[seq]
+            for shard in range(self.workers):
+                while (shard, seq) not in done:
+                    got_shard, got_seq, texts = receive()
+                    done[got_shard, got_seq] = texts
+                for slot, result in zip(slots[shard], done.pop((shard, seq))):
+                    out[slot] = result
+            _write(outfile, out)
+            del pending[seq]
+
+        try:
+            # Keep two chunks in flight so routing overlaps with the workers
+            for seq, (first_line, lines) in enumerate(self._chunks(infile)):
+                out, ops, slots = self.route(lines, first_line)
+                pending[seq] = (out, slots)
+                for shard in range(self.workers):
+                    tasks[shard].put((seq, ops[shard]))
+                if len(pending) > 2:
+                    collect(next_write)
+                    next_write += 1
+            while pending:
+                collect(next_write)
+                next_write += 1
+
+            for task_queue in tasks:
+                task_queue.put(None)
+            summaries = []
+            while len(summaries) < self.workers:
+                _, seq, summary = receive()
+                if seq is None:
+                    summaries.append(summary)
+        except BaseException:
+            # The other workers may be waiting on the one that failed
+            for p in processes:
+                if p.is_alive():
+                    p.terminate()
+            raise
+        for p in processes:
+            p.join()
+        return summaries
+
+
+def _write(outfile, out):
+    outfile.write('\n'.join(out))
+    if out:
+        outfile.write('\n')
+
+
+def format_summary(stats):
+    lines = []
+    total = sum(count for key, count in stats.items() if isinstance(key, tuple))
+    elapsed = stats['elapsed']
+    lines.append(f"{total} operations in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f}/s)")
+    for kind in KINDS + ('bad',):
+        counts = {status: stats[kind, status] for status in ('ok', 'rejected', 'error')}
+        if any(counts.values()):
+            lines.append(f"  {kind:<9}" + ''.join(f"{status} {n:<10}" for status, n in counts.items()))
+    lines.append(f"  created {format_cents(stats['created'])}, deposited {format_cents(stats['deposited'])}, "
+                 f"withdrawn {format_cents(stats['withdrawn'])}, "
+                 f"transferred {format_cents(stats['transferred'])}")
+    expected = stats['created'] + stats['deposited'] - stats['withdrawn']
+    lines.append(f"  {stats['accounts']} accounts holding {format_cents(stats['balance'])}"
+                 f" ({'balanced' if expected == stats['balance'] else 'MISMATCH'})")
+    if stats['uncredited']:
+        lines.append(f"  {format_cents(stats['uncredited'])} debited for transfers to unknown accounts")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a file of ATM operations")
+    parser.add_argument('input', help="operations file, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="results file (default: stdout)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    processor = BatchProcessor(args.workers, args.chunk_size)
+    infile = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        stats = processor.run(infile, outfile)
+    except RuntimeError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    print(format_summary(stats), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import hmac
+import os
+import time
+
+import auth
+from metrics import timed
+from money import ZERO
+
+# The ATM engine shared by the command-line and Tkinter front ends. All
+# account logic lives here and in the storage backends; the front ends only
+# collect input and show results.
+#
+# Storage is chosen by a config string, taken from ATM_STORE by default:
+#
+#   memory                 accounts live only as long as the process
+#   log:<directory>        in memory, persisted to an append-only ledger
+#   sqlite:<file>          every change written straight to SQLite
+#
+# Every backend offers the same interface: create, get, transfer, PIN hash
+# and lockout accessors, len/iteration and close, with account objects that
+# support check_balance, deposit, withdraw, and history and statement for
+# the account's transaction journal (see atm_journal).
+DEFAULT_STORE = os.environ.get('ATM_STORE', 'log:atm_data')
+
+# Login throttling. An account allows ACCOUNT_ATTEMPTS wrong PINs, regaining
+# one every ACCOUNT_REFILL seconds; when they run out it is locked until the
+# next attempt is due, and the lockout is saved with the account so a
+# restart doesn't lift it. Each source (a terminal, a client address) has
+# its own budget too, which slows one client guessing across many accounts.
+ACCOUNT_ATTEMPTS = 5
+ACCOUNT_REFILL = 60.0
+SOURCE_ATTEMPTS = 20
+SOURCE_REFILL = 5.0
+
+BACKENDS = ('memory', 'log', 'sqlite')
+
+
+def open_store(config=None):
+    kind, _, path = (config or DEFAULT_STORE).partition(':')
+    if kind == 'memory':
+        from atm_accounts import AccountStore
+        from atm_journal import Journal
+        return AccountStore(journal=Journal())
+    if kind == 'log':
+        from atm_accounts import AccountStore
+        from atm_journal import Journal
+        from atm_ledger import Ledger
+        ledger = Ledger(path or 'atm_data')
+        store = AccountStore(ledger=ledger, journal=Journal(os.path.join(path or 'atm_data', 'journal.db')))
+        store.load(ledger.open())
+        return store
+    if kind == 'sqlite':
+        from atm_sqlite import SQLiteAccountStore
+        return SQLiteAccountStore(path or 'atm.db')
+    raise ValueError(f"Unknown ATM store {config!r}; expected one of {', '.join(BACKENDS)}")
+
+
+class TooManyAttempts(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many attempts. Try again in {retry_after:.0f} seconds.")
+        self.retry_after = retry_after
+
+
+class ATMCore:
+    def __init__(self, store=None, hash_pin=None):
+        # Defaults to a throwaway in-memory store. hash_pin lets tools that
+        # create many accounts and never log in use a cheaper hash.
+        self.accounts = store if store is not None else open_store('memory')
+        self.hash_pin = hash_pin or auth.hash_password
+        self.account_attempts = auth.RateLimiter(ACCOUNT_ATTEMPTS, 1 / ACCOUNT_REFILL)
+        self.source_attempts = auth.RateLimiter(SOURCE_ATTEMPTS, 1 / SOURCE_REFILL)
+        self._dummy_hash = None
+
+    def create_account(self, account_number, pin, initial_balance=ZERO):
+        # Returns False if the number is taken; raises ValueError for a
+        # negative opening balance
+        if initial_balance.cents < 0:
+            raise ValueError("Initial balance can't be negative")
+        if account_number in self.accounts:
+            return False   # don't pay for the hash
+        return self.accounts.create(account_number, self.hash_pin(pin), initial_balance) is not None
+
+    @timed('atm.authenticate')
+    def authenticate(self, account_number, pin, source='local'):
+        # Returns the account, or None for a wrong number or PIN. Raises
+        # TooManyAttempts while the account or the source is throttled.
+        now = time.time()
+        locked = self.accounts.locked_until(account_number)
+        if locked > now:
+            raise TooManyAttempts(locked - now)
+        if not self.source_attempts.allow(source):
+            raise TooManyAttempts(self.source_attempts.retry_after(source))
+
+        stored = self.accounts.pin_hash(account_number)
+        if stored is None:
+            # Same work as a real check, so unknown numbers can't be told apart
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash_pin('')
+            auth.verify_password(pin, self._dummy_hash)
+            matched = False
+        elif auth.is_hash(stored):
+            matched = auth.verify_password(pin, stored)
+        else:
+            # PIN saved before hashing; replaced by a hash below once it matches
+            matched = hmac.compare_digest(pin.encode(), stored.encode())
+
+        if not matched:
+            self.source_attempts.consume(source)
+            if stored is not None:
+                self.account_attempts.consume(account_number)
+                if not self.account_attempts.allow(account_number):
+                    retry_after = self.account_attempts.retry_after(account_number)
+                    self.accounts.set_locked_until(account_number, now + retry_after)
+            return None
+
+        self.account_attempts.reset(account_number)
+        if locked:
+            self.accounts.set_locked_until(account_number, 0.0)
+        if not auth.is_hash(stored) or (self.hash_pin is auth.hash_password and auth.needs_rehash(stored)):
+            self.accounts.set_pin_hash(account_number, self.hash_pin(pin))
+        return self.accounts.get(account_number)
+
+    @timed('atm.transfer')
+    def transfer(self, src, dst, amount):
+        return self.accounts.transfer(src, dst, amount)
+
+    def close(self):
+        self.accounts.close()
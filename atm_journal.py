@@ -0,0 +1,182 @@
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+
+from money import format_cents
+
+# Per-account transaction history for the ATM: one row for every balance
+# change, with its time, kind, amount and the balance it left behind.
+#
+# Rows are clustered by (account, time) in a WITHOUT ROWID table, so one
+# account's history is a single contiguous range of the primary key. The
+# last N entries and date-range statements read only that range, never
+# another account's rows, however large the journal grows.
+#
+# Kinds: C account opened, D deposit, W withdrawal, I transfer in,
+# O transfer out. Times are integer microseconds since the epoch and
+# strictly increasing per account; amounts and balances are integer cents.
+#
+# atm_sqlite keeps this table in its own database and writes it in the same
+# transaction as the balance. The in-memory and ledger stores use Journal,
+# which buffers entries and writes them in batches from a background thread.
+#
+# With the ledger (atm_ledger), the ledger is the record of what happened
+# and the journal an index of it that may lag behind. The ledger hands
+# entries over only once their records are on disk, and each batch is
+# stored together with the ledger position it reaches. When the ledger is
+# opened, records past that position (lost with the last batches before a
+# crash) are turned back into entries. Those carry the time of the
+# recovery, since ledger records have no times of their own.
+
+KINDS = {'C': 'Opened', 'D': 'Deposit', 'W': 'Withdrawal', 'I': 'Transfer in', 'O': 'Transfer out'}
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS journal (
+            account TEXT NOT NULL,
+            at INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            balance INTEGER NOT NULL,
+            PRIMARY KEY (account, at)) WITHOUT ROWID'''
+
+# Ledger position the journal has caught up with: records of segment
+# `generation` up to `line`, and everything in earlier segments
+POSITION_SCHEMA = '''CREATE TABLE IF NOT EXISTS ledger_position (
+                     id INTEGER PRIMARY KEY CHECK (id = 0),
+                     generation INTEGER NOT NULL,
+                     line INTEGER NOT NULL)'''
+
+# Two entries for one account in the same microsecond (a transfer, or two
+# processes) would collide, so each insert goes just past the account's
+# latest entry when needed; that is one seek to the end of its range
+LATEST = "COALESCE((SELECT MAX(at) FROM journal WHERE account = ?1), 0) + 1"
+INSERT = ("INSERT INTO journal (account, at, kind, amount, balance) "
+          f"SELECT ?1, MAX(?2, {LATEST}), ?3, ?4, ?5")
+
+LAST = "SELECT at, kind, amount, balance FROM journal WHERE account = ? ORDER BY at DESC LIMIT ?"
+RANGE = ("SELECT at, kind, amount, balance FROM journal "
+         "WHERE account = ? AND at >= ? AND at < ? ORDER BY at")
+
+# Times beyond any real entry, for open-ended ranges
+FIRST_US, LAST_US = 0, 2 ** 62
+
+
+def now_us():
+    return time.time_ns() // 1000
+
+
+def new_entry(account, kind, amount, balance):
+    # A journal entry for a balance change happening now
+    return (account, now_us(), kind, amount, balance)
+
+
+def to_us(value, default):
+    # Accepts None (the default), microseconds, a datetime, a date
+    # (midnight local time) or an ISO string
+    if value is None:
+        return default
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        if not isinstance(value, date):
+            raise ValueError(f"Invalid date {value!r}")
+        value = datetime(value.year, value.month, value.day)
+    return int(value.timestamp() * 1000000)
+
+
+def last(conn, account, n):
+    # Newest first
+    return conn.execute(LAST, (account, int(n))).fetchall()
+
+
+def statement(conn, account, start=None, end=None):
+    # Entries in [start, end), oldest first
+    return conn.execute(RANGE, (account, to_us(start, FIRST_US), to_us(end, LAST_US))).fetchall()
+
+
+def describe(entry):
+    # One line of a statement: "2024-05-01 09:30:12  Deposit       20.00   120.00"
+    at, kind, amount, balance = entry
+    when = datetime.fromtimestamp(at / 1000000).strftime('%Y-%m-%d %H:%M:%S')
+    return f"{when}  {KINDS.get(kind, kind):<13}{format_cents(amount):>10}{format_cents(balance):>12}"
+
+
+class Journal:
+    def __init__(self, path=':memory:', flush_interval=0.05):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(SCHEMA)
+            self._conn.execute(POSITION_SCHEMA)
+
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._position = None   # ledger position reached by the buffered entries
+        self._closed = False
+        # Held while writing or reading the database; writes take the
+        # buffer under it, so batches reach the table in the order recorded
+        self._db_lock = threading.Lock()
+        self._flusher = threading.Thread(target=self._flush_loop, name='atm-journal', daemon=True)
+        self._flusher.start()
+
+    def add(self, entries, position=None):
+        # Entries made with new_entry, in the order they happened. The ledger
+        # passes the position (generation, line) its records have reached.
+        with self._cond:
+            self._buffer.extend(entries)
+            if position is not None:
+                self._position = position
+            self._cond.notify()
+
+    def position(self):
+        # The ledger position stored entries reach, or None if no ledger
+        # position has been saved
+        with self._db_lock:
+            return self._conn.execute("SELECT generation, line FROM ledger_position").fetchone()
+
+    def last(self, account, n=10):
+        self.flush()
+        with self._db_lock:
+            return last(self._conn, account, n)
+
+    def statement(self, account, start=None, end=None):
+        self.flush()
+        with self._db_lock:
+            return statement(self._conn, account, start, end)
+
+    def flush(self):
+        with self._db_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+                position, self._position = self._position, None
+            if batch or position:
+                with self._conn:
+                    self._conn.executemany(INSERT, batch)
+                    if position:
+                        self._conn.execute("INSERT OR REPLACE INTO ledger_position (id, generation, line) "
+                                           "VALUES (0, ?, ?)", position)
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._position and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Let entries accumulate so each commit writes many of them
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,317 @@
+import os
+import threading
+import time
+
+from atm_journal import new_entry
+
+# Durable storage for ATM accounts: an append-only transaction log with
+# group commit, plus snapshots so restarts don't replay all of history.
+#
+# Layout of the ledger directory:
+#   ledger-000007.log     log segments, one record per line
+#   snapshot-000006.txt   state of every account after segments 1..6
+#
+# Records are tab-separated:
+#   C <account> <pin> <balance>    account created
+#   D <account> <amount>           deposit
+#   W <account> <amount>           withdrawal
+#   T <from> <to> <amount>         transfer between two accounts
+#   P <account> <pin hash>         PIN hash replaced (rehashed or upgraded)
+#   L <account> <until>            locked out until a Unix time (0 unlocks)
+#
+# Balances and amounts are integer cents. Snapshot lines hold account, PIN
+# hash and balance, plus the lockout time when there is one.
+#
+# Writers append to an in-memory buffer and a flusher thread writes and
+# fsyncs whatever has accumulated, so concurrent writers share one fsync.
+# Full segments are sealed and folded into a new snapshot in the background;
+# the snapshot is built from files only, so it is always consistent.
+#
+# With a journal (atm_journal.Journal), writers pass the history entries for
+# each record. They go to the journal once the record is on disk, with the
+# position it reached, and records the journal missed (its last batches
+# before a crash) are turned into entries again on open. Segments are only
+# folded into a snapshot after the journal has stored their entries.
+
+
+def _escape(field):
+    return field.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _unescape(field):
+    if '\\' not in field:
+        return field
+    return field.replace('\\n', '\n').replace('\\t', '\t').replace('\\\\', '\\')
+
+
+def _fsync_dir(path):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _generations(path, prefix, suffix):
+    found = []
+    for name in os.listdir(path):
+        if name.startswith(prefix) and name.endswith(suffix):
+            number = name[len(prefix):-len(suffix)]
+            if number.isdigit():
+                found.append(int(number))
+    return sorted(found)
+
+
+def _segment_name(path, generation):
+    return os.path.join(path, f"ledger-{generation:06d}.log")
+
+
+def _snapshot_name(path, generation):
+    return os.path.join(path, f"snapshot-{generation:06d}.txt")
+
+
+def _parse_amount(text):
+    try:
+        return int(text)
+    except ValueError:
+        # Ledgers written before amounts were stored in cents
+        return round(float(text) * 100)
+
+
+def replay(lines, accounts, missed=None, skip=0):
+    # Applies log records to a dict of account -> [pin, balance, locked until].
+    # With a missed list, appends the journal entries for every record after
+    # the first `skip`.
+    for number, line in enumerate(lines):
+        if not line.endswith('\n'):
+            break  # Torn write from a crash; everything before it is intact
+        kind, account, rest = line[:-1].split('\t', 2)
+        account = _unescape(account)
+        if kind == 'D':
+            accounts[account][1] += _parse_amount(rest)
+        elif kind == 'W':
+            accounts[account][1] -= _parse_amount(rest)
+        elif kind == 'T':
+            target, amount = rest.rsplit('\t', 1)
+            amount = _parse_amount(amount)
+            accounts[account][1] -= amount
+            accounts[_unescape(target)][1] += amount
+        elif kind == 'C':
+            pin, balance = rest.rsplit('\t', 1)
+            accounts[account] = [_unescape(pin), _parse_amount(balance), 0.0]
+        elif kind == 'P':
+            accounts[account][0] = _unescape(rest)
+        elif kind == 'L':
+            accounts[account][2] = float(rest)
+        if missed is not None and number >= skip:
+            missed.extend(_entries(kind, account, rest, accounts))
+    return accounts
+
+
+def _entries(kind, account, rest, accounts):
+    # Journal entries for a record just replayed, with the balances it left
+    if kind in ('D', 'W'):
+        return [new_entry(account, kind, _parse_amount(rest), accounts[account][1])]
+    if kind == 'T':
+        target, amount = rest.rsplit('\t', 1)
+        target, amount = _unescape(target), _parse_amount(amount)
+        return [new_entry(account, 'O', amount, accounts[account][1]),
+                new_entry(target, 'I', amount, accounts[target][1])]
+    if kind == 'C':
+        return [new_entry(account, 'C', accounts[account][1], accounts[account][1])]
+    return []
+
+
+def load_snapshot(filename, accounts):
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            account, pin, balance, *locked = line[:-1].split('\t')
+            accounts[_unescape(account)] = [_unescape(pin), _parse_amount(balance),
+                                            float(locked[0]) if locked else 0.0]
+    return accounts
+
+
+class Ledger:
+    def __init__(self, path, segment_records=1000000, commit_delay=0.001, journal=None):
+        self.path = path
+        self.segment_records = segment_records
+        self.commit_delay = commit_delay    # how long the flusher waits to batch writes
+        self.journal = journal
+        os.makedirs(path, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._buffer = []        # (record line, journal entries)
+        self._appended = 0       # sequence number of the last appended record
+        self._durable = 0        # sequence number of the last fsynced record
+        self._error = None
+        self._closed = False
+        self._file = None
+        self._segment_count = 0
+        self._compacting = None
+
+    # Startup: rebuild every account from the latest snapshot plus the log
+    def open(self):
+        accounts = {}
+        snapshots = _generations(self.path, 'snapshot-', '.txt')
+        covered = snapshots[-1] if snapshots else 0
+        if covered:
+            load_snapshot(_snapshot_name(self.path, covered), accounts)
+        segments = [g for g in _generations(self.path, 'ledger-', '.log') if g > covered]
+        # Journals from before positions were saved are taken as complete
+        position = self.journal.position() if self.journal else None
+        missed = []
+        for generation in segments:
+            with open(_segment_name(self.path, generation), encoding='utf-8') as f:
+                if position is None or generation < position[0]:
+                    replay(f, accounts)
+                else:
+                    replay(f, accounts, missed, position[1] if generation == position[0] else 0)
+
+        # Always start a fresh segment; older ones are only read from now on
+        self._generation = max(segments + [covered]) + 1
+        self._file = open(_segment_name(self.path, self._generation), 'a', encoding='utf-8')
+        _fsync_dir(self.path)
+        if self.journal:
+            self.journal.add(missed, (self._generation, 0))
+            self.journal.flush()
+        self._flusher = threading.Thread(target=self._flush_loop, name='atm-ledger', daemon=True)
+        self._flusher.start()
+        if segments:
+            self._start_compaction(self._generation - 1)
+        return {account: tuple(state) for account, state in accounts.items()}
+
+    # entries: the journal entries (atm_journal.new_entry) for the record
+    def create(self, account, pin, balance, wait=True, entries=()):
+        return self._append(f"C\t{_escape(account)}\t{_escape(pin)}\t{balance!r}\n", wait, entries)
+
+    def deposit(self, account, amount, wait=True, entries=()):
+        return self._append(f"D\t{_escape(account)}\t{amount!r}\n", wait, entries)
+
+    def withdraw(self, account, amount, wait=True, entries=()):
+        return self._append(f"W\t{_escape(account)}\t{amount!r}\n", wait, entries)
+
+    def transfer(self, src, dst, amount, wait=True, entries=()):
+        # One record, so a crash can never keep the debit and lose the credit
+        return self._append(f"T\t{_escape(src)}\t{_escape(dst)}\t{amount!r}\n", wait, entries)
+
+    def set_pin(self, account, pin, wait=True):
+        return self._append(f"P\t{_escape(account)}\t{_escape(pin)}\n", wait)
+
+    def lock(self, account, until, wait=True):
+        return self._append(f"L\t{_escape(account)}\t{until!r}\n", wait)
+
+    def _append(self, line, wait, entries=()):
+        with self._cond:
+            if self._closed:
+                raise ValueError("Ledger is closed")
+            self._buffer.append((line, entries))
+            self._appended += 1
+            seq = self._appended
+            self._cond.notify_all()
+        if wait:
+            self.wait(seq)
+        return seq
+
+    def wait(self, seq=None):
+        # Blocks until record `seq` (default: everything appended so far) is on disk
+        with self._cond:
+            if seq is None:
+                seq = self._appended
+            while self._durable < seq and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._closed:
+                    return
+            if self.commit_delay:
+                # Let a few more writers join this commit
+                time.sleep(self.commit_delay)
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+                seq = self._appended
+            try:
+                self._file.write(''.join(line for line, _ in batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._segment_count += len(batch)
+                if self.journal:
+                    self.journal.add([entry for _, entries in batch for entry in entries],
+                                     (self._generation, self._segment_count))
+                if self._segment_count >= self.segment_records:
+                    self._rotate()
+            except OSError as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._durable = seq
+                self._cond.notify_all()
+
+    def _rotate(self):
+        sealed = self._generation
+        self._file.close()
+        self._generation += 1
+        self._segment_count = 0
+        self._file = open(_segment_name(self.path, self._generation), 'a', encoding='utf-8')
+        _fsync_dir(self.path)
+        self._start_compaction(sealed)
+
+    def _start_compaction(self, upto):
+        if self._compacting is not None and self._compacting.is_alive():
+            return  # The next rotation will pick up whatever this one misses
+        self._compacting = threading.Thread(target=self.compact, args=(upto,),
+                                            name='atm-ledger-compact', daemon=True)
+        self._compacting.start()
+
+    def compact(self, upto):
+        # Fold the latest snapshot and sealed segments up to `upto` into a
+        # new snapshot, then delete the files it replaces
+        accounts = {}
+        snapshots = _generations(self.path, 'snapshot-', '.txt')
+        covered = snapshots[-1] if snapshots else 0
+        if covered >= upto:
+            return
+        if self.journal:
+            # The segments' entries are on their way to the journal; store
+            # them before the records are folded away
+            self.journal.flush()
+        if covered:
+            load_snapshot(_snapshot_name(self.path, covered), accounts)
+        segments = [g for g in _generations(self.path, 'ledger-', '.log') if covered < g <= upto]
+        for generation in segments:
+            with open(_segment_name(self.path, generation), encoding='utf-8') as f:
+                replay(f, accounts)
+
+        target = _snapshot_name(self.path, upto)
+        with open(target + '.tmp', 'w', encoding='utf-8') as f:
+            f.writelines(f"{_escape(account)}\t{_escape(pin)}\t{balance!r}"
+                         + (f"\t{locked!r}\n" if locked else "\n")
+                         for account, (pin, balance, locked) in accounts.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(target + '.tmp', target)
+        _fsync_dir(self.path)
+
+        for generation in segments:
+            os.remove(_segment_name(self.path, generation))
+        for generation in snapshots:
+            os.remove(_snapshot_name(self.path, generation))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._file is not None:
+            self._flusher.join()
+            self._file.close()
+            self._file = None
+        if self._compacting is not None:
+            self._compacting.join()
@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+
+import atm_journal
+from metrics import timed
+from money import Money, ZERO
+
+# SQLite storage backend for ATM accounts. Every change is a single
+# conditional UPDATE (or one IMMEDIATE transaction for transfers), so
+# balances stay consistent across threads and across processes sharing the
+# same file, and nothing needs to be replayed at startup. The transaction
+# journal lives in the same file and each entry is written in the same
+# transaction as the balance change it records.
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+)
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS accounts (
+            number TEXT PRIMARY KEY,
+            pin TEXT NOT NULL,
+            balance INTEGER NOT NULL,
+            locked_until REAL NOT NULL DEFAULT 0) WITHOUT ROWID'''
+
+# Journal entry carrying the account's balance after the change
+JOURNAL_INSERT = ("INSERT INTO journal (account, at, kind, amount, balance) "
+                  f"SELECT ?1, MAX(?2, {atm_journal.LATEST}), ?3, ?4, balance "
+                  "FROM accounts WHERE number = ?1")
+
+
+class SQLiteAccount:
+    __slots__ = ('account_number', '_store')
+
+    def __init__(self, account_number, store):
+        self.account_number = account_number
+        self._store = store
+
+    @property
+    def balance(self):
+        row = self._store._conn().execute("SELECT balance FROM accounts WHERE number = ?",
+                                          (self.account_number,)).fetchone()
+        return Money(row[0])
+
+    def check_balance(self):
+        return self.balance
+
+    def history(self, n=10):
+        return atm_journal.last(self._store._conn(), self.account_number, n)
+
+    def statement(self, start=None, end=None):
+        return atm_journal.statement(self._store._conn(), self.account_number, start, end)
+
+    @timed('atm.deposit', 'sqlite')
+    def deposit(self, amount):
+        if amount.cents <= 0:
+            return False
+        conn = self._store._conn()
+        with conn:
+            cur = conn.execute("UPDATE accounts SET balance = balance + ? WHERE number = ?",
+                               (amount.cents, self.account_number))
+            if cur.rowcount == 1:
+                _journal(conn, self.account_number, 'D', amount.cents)
+        return cur.rowcount == 1
+
+    @timed('atm.withdraw', 'sqlite')
+    def withdraw(self, amount):
+        if amount.cents <= 0:
+            return False
+        conn = self._store._conn()
+        with conn:
+            cur = conn.execute("UPDATE accounts SET balance = balance - ? "
+                               "WHERE number = ? AND balance >= ?",
+                               (amount.cents, self.account_number, amount.cents))
+            if cur.rowcount == 1:
+                _journal(conn, self.account_number, 'W', amount.cents)
+        return cur.rowcount == 1
+
+    def __repr__(self):
+        return f"SQLiteAccount({self.account_number!r}, balance={self.balance})"
+
+
+def _journal(conn, account_number, kind, cents):
+    conn.execute(JOURNAL_INSERT, (account_number, atm_journal.now_us(), kind, cents))
+
+
+class SQLiteAccountStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._all = []
+        self._all_lock = threading.Lock()
+        conn = self._conn()
+        with conn:
+            conn.execute(SCHEMA)
+            conn.execute(atm_journal.SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(accounts)")}
+            if 'locked_until' not in columns:
+                # Files created before lockouts were stored
+                conn.execute("ALTER TABLE accounts ADD COLUMN locked_until REAL NOT NULL DEFAULT 0")
+
+    def _conn(self):
+        # One connection per thread, like inventory_db
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._all_lock:
+                self._all.append(conn)
+        return conn
+
+    def create(self, account_number, pin_hash, balance=ZERO):
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("INSERT OR IGNORE INTO accounts (number, pin, balance) VALUES (?, ?, ?)",
+                               (account_number, pin_hash, balance.cents))
+            if cur.rowcount == 1:
+                _journal(conn, account_number, 'C', balance.cents)
+        return SQLiteAccount(account_number, self) if cur.rowcount == 1 else None
+
+    def pin_hash(self, account_number):
+        row = self._conn().execute("SELECT pin FROM accounts WHERE number = ?",
+                                   (account_number,)).fetchone()
+        return row and row[0]
+
+    def set_pin_hash(self, account_number, pin_hash):
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE accounts SET pin = ? WHERE number = ?", (pin_hash, account_number))
+
+    def locked_until(self, account_number):
+        row = self._conn().execute("SELECT locked_until FROM accounts WHERE number = ?",
+                                   (account_number,)).fetchone()
+        return row[0] if row else 0.0
+
+    def set_locked_until(self, account_number, until):
+        conn = self._conn()
+        with conn:
+            conn.execute("UPDATE accounts SET locked_until = ? WHERE number = ?",
+                         (until, account_number))
+
+    def get(self, account_number, default=None):
+        return SQLiteAccount(account_number, self) if account_number in self else default
+
+    def __getitem__(self, account_number):
+        if account_number not in self:
+            raise KeyError(account_number)
+        return SQLiteAccount(account_number, self)
+
+    def __contains__(self, account_number):
+        return self._conn().execute("SELECT 1 FROM accounts WHERE number = ?",
+                                    (account_number,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def __iter__(self):
+        return (number for number, in self._conn().execute("SELECT number FROM accounts"))
+
+    def values(self):
+        return (SQLiteAccount(number, self) for number in self)
+
+    def transfer(self, src, dst, amount):
+        if src == dst or amount.cents <= 0:
+            return False
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            debited = conn.execute("UPDATE accounts SET balance = balance - ? "
+                                   "WHERE number = ? AND balance >= ?",
+                                   (amount.cents, src, amount.cents)).rowcount
+            credited = debited and conn.execute("UPDATE accounts SET balance = balance + ? "
+                                                "WHERE number = ?",
+                                                (amount.cents, dst)).rowcount
+            if not credited:
+                conn.rollback()
+                return False
+            _journal(conn, src, 'O', amount.cents)
+            _journal(conn, dst, 'I', amount.cents)
+        return True
+
+    def close(self):
+        with self._all_lock:
+            for conn in self._all:
+                conn.close()
+            self._all = []
+        self._local = threading.local()
@@ -0,0 +1,243 @@
+import binascii
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Password hashing and login throttling shared by the inventory users and
+# the ATM PINs.
+#
+# Hashes are stored with their parameters so the cost can be raised later:
+#   scrypt$<n>$<r>$<p>$<salt>$<hash>
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# Old unsalted SHA-256 hex digests are still accepted and are upgraded by
+# the caller when needs_rehash() says so.
+
+SCRYPT_N = int(os.environ.get('AUTH_SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = int(os.environ.get('AUTH_PBKDF2_ITERATIONS', 600000))
+SALT_BYTES = 16
+
+_b64encode = lambda data: binascii.b2a_base64(data, newline=False).decode('ascii')
+_b64decode = binascii.a2b_base64
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+
+def hash_password(password, n=None):
+    # n overrides the scrypt cost, for callers that never verify at scale
+    salt = os.urandom(SALT_BYTES)
+    if hasattr(hashlib, 'scrypt'):
+        n = n or SCRYPT_N
+        digest = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+    digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password(password, stored):
+    if not stored:
+        return False
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            expected = _b64decode(parts[5])
+            actual = _scrypt(password, _b64decode(parts[4]), n, r, p)
+        elif parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            expected = _b64decode(parts[3])
+            actual = _pbkdf2(password, _b64decode(parts[2]), int(parts[1]))
+        elif len(stored) == 64:
+            # Legacy unsalted SHA-256 hex digest
+            expected = stored.encode()
+            actual = hashlib.sha256(password.encode()).hexdigest().encode()
+        else:
+            return False
+    except (ValueError, TypeError, OverflowError, binascii.Error):
+        return False   # Truncated or corrupted hash; it matches no password
+    return hmac.compare_digest(expected, actual)
+
+
+def is_hash(stored):
+    # False for values that were stored before hashing was introduced
+    return stored.startswith(('scrypt$', 'pbkdf2_sha256$')) or \
+        (len(stored) == 64 and all(c in '0123456789abcdef' for c in stored))
+
+
+def needs_rehash(stored):
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            return not hasattr(hashlib, 'scrypt') or \
+                (int(parts[1]), int(parts[2]), int(parts[3])) < (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            return hasattr(hashlib, 'scrypt') or int(parts[1]) < PBKDF2_ITERATIONS
+    except ValueError:
+        pass   # Corrupted parameters; replace it like any unknown format
+    return True
+
+
+# Hashing is deliberately slow, so it runs on a small bounded pool. No
+# matter how many logins arrive at once, at most this many cores are busy
+# hashing, and the Tk and server threads only wait on a future.
+HASH_WORKERS = max(2, (os.cpu_count() or 2) // 2)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='auth-hash')
+    return _pool
+
+
+def hash_password_async(password):
+    return _get_pool().submit(hash_password, password)
+
+
+def verify_password_async(password, stored):
+    return _get_pool().submit(verify_password, password, stored)
+
+
+# Bounded LRU mapping with per-entry expiry
+class TTLCache:
+    def __init__(self, maxsize=10000, ttl=900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Remembers recently verified credentials so repeat logins skip the slow
+# hash. Keys are an HMAC with a per-process secret, so the cache never
+# holds anything that can be checked offline against a password guess.
+class VerifiedCache:
+    def __init__(self, maxsize=10000, ttl=300):
+        self._cache = TTLCache(maxsize, ttl)
+        self._secret = os.urandom(32)
+
+    def _key(self, username, password, stored):
+        message = '\0'.join((username, password, stored)).encode()
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def check(self, username, password, stored):
+        return self._cache.get(self._key(username, password, stored)) is not None
+
+    def add(self, username, password, stored):
+        self._cache.set(self._key(username, password, stored), True)
+
+
+# Token buckets keyed by anything (an account, a client address). Each key
+# holds `capacity` tokens that refill at `rate` per second; an attempt costs
+# one. A key's state is two numbers, and keys whose bucket has refilled are
+# forgotten, so memory only grows with the keys active right now.
+class RateLimiter:
+    def __init__(self, capacity, rate, maxsize=100000):
+        self.capacity = capacity
+        self.rate = rate
+        self.maxsize = maxsize
+        self._refill_time = capacity / rate
+        self._buckets = OrderedDict()   # key -> [tokens, last update], oldest first
+        self._lock = threading.Lock()
+
+    def _tokens(self, key, now):
+        entry = self._buckets.get(key)
+        if entry is None:
+            return self.capacity
+        return min(self.capacity, entry[0] + (now - entry[1]) * self.rate)
+
+    def _expire(self, now):
+        # Buckets are ordered by last update, so the full ones are at the front
+        buckets = self._buckets
+        while buckets:
+            key, (_, stamp) = next(iter(buckets.items()))
+            if now - stamp < self._refill_time and len(buckets) <= self.maxsize:
+                break
+            del buckets[key]
+
+    def allow(self, key):
+        # Whether an attempt would be allowed, without spending a token
+        with self._lock:
+            return self._tokens(key, time.monotonic()) >= 1
+
+    def consume(self, key):
+        # Spends one token; returns False (and spends nothing) if none is left
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                return False
+            self._buckets[key] = [tokens - 1, now]
+            self._buckets.move_to_end(key)
+            self._expire(now)
+            return True
+
+    def retry_after(self, key):
+        # Seconds until the next attempt is allowed
+        with self._lock:
+            return max(0.0, (1 - self._tokens(key, time.monotonic())) / self.rate)
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Opaque session tokens handed out after a successful login
+class SessionStore:
+    def __init__(self, maxsize=10000, ttl=3600):
+        self._cache = TTLCache(maxsize, ttl)
+
+    def create(self, username):
+        token = os.urandom(24).hex()
+        self._cache.set(token, username)
+        return token
+
+    def user(self, token):
+        return self._cache.get(token) if token else None
+
+    def revoke(self, token):
+        self._cache.pop(token)
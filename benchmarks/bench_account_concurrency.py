@@ -0,0 +1,68 @@
+# Multi-threaded stress test for ATM accounts: threads run random
+# deposits, withdrawals and transfers against shared accounts, then the
+# total balance must equal the starting total plus deposits minus
+# withdrawals. Reports operations/sec as the thread count grows.
+#
+#   python -m benchmarks.bench_account_concurrency [accounts] [ops_per_thread]
+import random
+import sys
+import threading
+import time
+
+import auth
+from atm_core import ATMCore
+from money import Money
+
+THREAD_COUNTS = (1, 2, 4, 8, 16, 32)
+
+
+def run(threads, accounts, ops_per_thread):
+    atm = ATMCore(hash_pin=lambda pin: auth.hash_password(pin, n=2))
+    numbers = [str(i) for i in range(accounts)]
+    for number in numbers:
+        atm.create_account(number, '0000', Money(100000))
+    deposited = [0] * threads
+    withdrawn = [0] * threads
+
+    def worker(t):
+        rng = random.Random(t)
+        for _ in range(ops_per_thread):
+            kind = rng.random()
+            amount = Money(rng.randint(1, 5000))
+            if kind < 0.3:
+                if atm.accounts[rng.choice(numbers)].deposit(amount):
+                    deposited[t] += amount.cents
+            elif kind < 0.6:
+                if atm.accounts[rng.choice(numbers)].withdraw(amount):
+                    withdrawn[t] += amount.cents
+            else:
+                atm.transfer(rng.choice(numbers), rng.choice(numbers), amount)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(account.balance.cents for account in atm.accounts.values())
+    expected = accounts * 100000 + sum(deposited) - sum(withdrawn)
+    negative = sum(1 for account in atm.accounts.values() if account.balance.cents < 0)
+    return threads * ops_per_thread / elapsed, total == expected and not negative
+
+
+def main(accounts=100, ops_per_thread=50000):
+    # Few accounts on purpose, so threads really do collide on the same ones
+    print(f"{'threads':>8}{'ops/s':>12}  balances")
+    ok = True
+    for threads in THREAD_COUNTS:
+        rate, conserved = run(threads, accounts, ops_per_thread)
+        ok = ok and conserved
+        print(f"{threads:>8}{rate:>12.0f}  {'conserved' if conserved else 'MISMATCH'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*args))
@@ -0,0 +1,76 @@
+# Memory per ATM account: the column-backed AccountStore against the old
+# layout of one Python object (with its own __dict__) per account in a dict.
+# Measured with tracemalloc, so only allocations made by each table count.
+#
+#   python -m benchmarks.bench_account_memory [accounts]
+import sys
+import time
+import tracemalloc
+
+import auth
+from atm_accounts import AccountStore
+from atm_core import ATMCore
+from money import Money
+
+
+class ObjectAccount:
+    # The per-account object the ATM used to keep for every account
+    def __init__(self, account_number, pin_hash, balance):
+        self.account_number = account_number
+        self.pin_hash = pin_hash
+        self.balance = balance
+
+
+def build_objects(numbers, pin_hashes):
+    table = {}
+    for number, pin_hash in zip(numbers, pin_hashes):
+        table[number] = ObjectAccount(number, pin_hash, Money(10000))
+    return table
+
+
+def build_store(numbers, pin_hashes):
+    store = AccountStore()
+    for number, pin_hash in zip(numbers, pin_hashes):
+        store.create(number, pin_hash, Money(10000))
+    return store
+
+
+def measure(build, numbers, pin_hashes):
+    tracemalloc.start()
+    start = time.perf_counter()
+    table = build(numbers, pin_hashes)
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return table, size, peak, elapsed
+
+
+def main(accounts=1000000):
+    # Account numbers and PIN hashes exist before either table is built, as
+    # they would when read from the ledger, so neither side is charged for
+    # them. Real hashes are too slow to make a million of; these have the
+    # same length.
+    numbers = [f"{i:010d}" for i in range(accounts)]
+    template = auth.hash_password('0000', n=2)
+    pin_hashes = [template[:-10] + number for number in numbers]
+    results = {}
+    print(f"{'layout':>8}{'bytes/acct':>12}{'peak MB':>10}{'build s':>9}")
+    for name, build in (('objects', build_objects), ('columns', build_store)):
+        table, size, peak, elapsed = measure(build, numbers, pin_hashes)
+        results[name] = size
+        print(f"{name:>8}{size / accounts:>12.0f}{peak / 2 ** 20:>10.0f}{elapsed:>9.2f}")
+        del table
+    print(f"columns use {results['objects'] / results['columns']:.1f}x less memory")
+
+    core = ATMCore(hash_pin=lambda pin: auth.hash_password(pin, n=2))
+    core.create_account(numbers[7], '0007', Money(10000))
+    account = core.authenticate(numbers[7], '0007')
+    if account is None or account.balance != Money(10000) or core.authenticate(numbers[7], '0008'):
+        print("FAIL: authentication against the column store")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:2]]
+    sys.exit(main(*args))
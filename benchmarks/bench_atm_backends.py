@@ -0,0 +1,82 @@
+# Runs the same workload against every ATM storage backend: threads doing
+# random deposits, withdrawals and transfers, reporting operations/sec and
+# checking no money was created or lost. tests/test_atm_backends.py checks
+# that the backends behave the same.
+#
+#   python -m benchmarks.bench_atm_backends [accounts] [ops_per_thread] [threads]
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import auth
+from atm_core import ATMCore, open_store
+from money import Money
+
+
+def cheap_hash(pin):
+    # Real scrypt hashes, just cheap enough to create thousands of accounts
+    return auth.hash_password(pin, n=16)
+
+
+def configs(tmp):
+    return {
+        'memory': 'memory',
+        'log': f"log:{os.path.join(tmp, 'ledger')}",
+        'sqlite': f"sqlite:{os.path.join(tmp, 'atm.db')}",
+    }
+
+
+def workload(config, accounts, ops_per_thread, threads):
+    core = ATMCore(open_store(config), cheap_hash)
+    numbers = [f"{i:06d}" for i in range(accounts)]
+    start_total = 0
+    for number in numbers:
+        core.create_account(number, '0000', Money(100000))
+        start_total += 100000
+    deposited = [0] * threads
+    withdrawn = [0] * threads
+
+    def worker(t):
+        rng = random.Random(t)
+        for _ in range(ops_per_thread):
+            kind = rng.random()
+            amount = Money(rng.randint(1, 5000))
+            if kind < 0.3:
+                if core.accounts[rng.choice(numbers)].deposit(amount):
+                    deposited[t] += amount.cents
+            elif kind < 0.6:
+                if core.accounts[rng.choice(numbers)].withdraw(amount):
+                    withdrawn[t] += amount.cents
+            else:
+                core.transfer(rng.choice(numbers), rng.choice(numbers), amount)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(account.balance.cents for account in core.accounts.values())
+    core.close()
+    return threads * ops_per_thread / elapsed, total == start_total + sum(deposited) - sum(withdrawn)
+
+
+def main(accounts=1000, ops_per_thread=2000, threads=8):
+    ok = True
+    print(f"{'backend':>8}{'ops/s':>12}  balances ({threads} threads)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, config in configs(tmp).items():
+            rate, conserved = workload(config, accounts, ops_per_thread, threads)
+            ok = ok and conserved
+            print(f"{name:>8}{rate:>12.0f}  {'conserved' if conserved else 'MISMATCH'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    sys.exit(main(*args))
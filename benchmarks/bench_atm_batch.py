@@ -0,0 +1,53 @@
+# Throughput of the ATM batch engine. Generates a settlement-style stream
+# (account creations, then random deposits, withdrawals and transfers),
+# runs it with growing worker counts and checks every run produces the same
+# per-operation results as the single-process run.
+#
+#   python -m benchmarks.bench_atm_batch [operations] [accounts]
+import io
+import os
+import random
+import sys
+
+from atm_batch import BatchProcessor, format_summary
+
+WORKER_COUNTS = (1, 2, 4)
+
+
+def generate(operations, accounts, seed=1):
+    rng = random.Random(seed)
+    lines = [f"create {i:08d} {i % 10000:04d} {rng.randint(0, 100000) / 100:.2f}\n"
+             for i in range(accounts)]
+    for _ in range(operations - accounts):
+        kind = rng.random()
+        account = f"{rng.randrange(accounts):08d}"
+        amount = f"{rng.randint(1, 20000) / 100:.2f}"
+        if kind < 0.4:
+            lines.append(f"deposit {account} {amount}\n")
+        elif kind < 0.8:
+            lines.append(f"withdraw {account} {amount}\n")
+        else:
+            lines.append(f"transfer {account} {rng.randrange(accounts):08d} {amount}\n")
+    return lines
+
+
+def main(operations=1000000, accounts=100000):
+    lines = generate(operations, accounts)
+    print(f"{len(lines)} operations, {accounts} accounts, {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in WORKER_COUNTS:
+        out = io.StringIO()
+        stats = BatchProcessor(workers).run(iter(lines), out)
+        print(f"workers {workers}: " + format_summary(stats).split('\n', 1)[0])
+        if baseline is None:
+            baseline = out.getvalue()
+            print(format_summary(stats))
+        elif out.getvalue() != baseline:
+            print(f"FAIL: results with {workers} workers differ from 1 worker")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*args))
@@ -0,0 +1,101 @@
+# Ops/sec for each inventory operation: a fresh sqlite3.connect() per call
+# (the old behaviour) versus the long-lived pooled connection in inventory_db.
+#
+#   python -m benchmarks.bench_connections [iterations]
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+import inventory_db as db
+
+
+def fresh_connection_ops(path):
+    def run(sql, params=(), fetch=False, commit=False):
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+        c.execute(sql, params)
+        rows = c.fetchall() if fetch else None
+        if commit:
+            conn.commit()
+        conn.close()
+        return rows
+
+    def record_sale(product_id, qty):
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+        c.execute("SELECT quantity, price FROM products WHERE id=?", (product_id,))
+        current_quantity, price = c.fetchone()
+        c.execute("UPDATE products SET quantity=? WHERE id=?", (current_quantity - qty, product_id))
+        c.execute("INSERT INTO sales (product_id, quantity, total_price) VALUES (?, ?, ?)",
+                  (product_id, qty, qty * price))
+        conn.commit()
+        conn.close()
+
+    return {
+        'register_user': lambda i: run("INSERT INTO users (username, password) VALUES (?, ?)",
+                                       (f"old{i}", db.hash_password("pw")), commit=True),
+        'authenticate_user': lambda i: run("SELECT password FROM users WHERE username=?",
+                                           ("old0",), fetch=True),
+        'add_product': lambda i: run("INSERT INTO products (name, quantity, price) VALUES (?, ?, ?)",
+                                     (f"item{i}", 10 ** 6, 150), commit=True),
+        'update_product': lambda i: run("UPDATE products SET quantity=?, price=? WHERE id=?",
+                                        (10 ** 6, 200, 1), commit=True),
+        'record_sale': lambda i: record_sale(1, 1),
+        'view_inventory': lambda i: run("SELECT * FROM products LIMIT 100", fetch=True),
+        'low_stock_report': lambda i: run("SELECT * FROM products WHERE quantity < 5", fetch=True),
+        'sales_summary': lambda i: run("SELECT p.name, s.quantity, s.total_price, s.date FROM sales s "
+                                       "JOIN products p ON s.product_id = p.id LIMIT 100", fetch=True),
+        'delete_product': lambda i: run("DELETE FROM products WHERE id=?", (i + 2,), commit=True),
+    }
+
+
+def pooled_ops():
+    return {
+        'register_user': lambda i: db.register_user(f"new{i}", "pw"),
+        'authenticate_user': lambda i: db.authenticate_user("new0", "pw"),
+        'add_product': lambda i: db.add_product(f"item{i}", 10 ** 6, 150),
+        'update_product': lambda i: db.update_product(1, 10 ** 6, 200),
+        'record_sale': lambda i: db.record_sale(1, 1),
+        'view_inventory': lambda i: db.get_connection().execute("SELECT * FROM products LIMIT 100").fetchall(),
+        'low_stock_report': lambda i: db.low_stock_products(),
+        'sales_summary': lambda i: db.get_connection().execute(
+            "SELECT p.name, s.quantity, s.total_price, s.date FROM sales s "
+            "JOIN products p ON s.product_id = p.id LIMIT 100").fetchall(),
+        'delete_product': lambda i: db.delete_product(i + 2),
+    }
+
+
+def time_ops(ops, iterations):
+    results = {}
+    for name, op in ops.items():
+        start = time.perf_counter()
+        for i in range(iterations):
+            op(i)
+        results[name] = iterations / (time.perf_counter() - start)
+    return results
+
+
+def main(iterations=500):
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, 'old.db')
+        db.configure(old_path)
+        db.setup_database()
+        db.close_connection()
+        # The old code never enabled WAL, so measure it on a rollback-journal file
+        sqlite3.connect(old_path).execute("PRAGMA journal_mode=DELETE").fetchone()
+        before = time_ops(fresh_connection_ops(old_path), iterations)
+
+        db.configure(os.path.join(tmp, 'new.db'))
+        db.setup_database()
+        after = time_ops(pooled_ops(), iterations)
+        db.close_connection()
+
+    print(f"{'operation':<20}{'before ops/s':>14}{'after ops/s':>14}{'speedup':>10}")
+    for name in before:
+        print(f"{name:<20}{before[name]:>14.0f}{after[name]:>14.0f}{after[name] / before[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,47 @@
+# Cold import time of the inventory modules, measured with
+# `python -X importtime` in fresh interpreters. Also checks that importing
+# creates no database file and does not load tkinter.
+#
+#   python -m benchmarks.bench_import_time [runs]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+MODULES = ('inventory_1', 'inventory_db', 'inventory_service')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time_us(module, cwd):
+    # importtime lines look like: "import time: self [us] | cumulative | name"
+    code = f"import sys; sys.path.insert(0, {ROOT!r}); import {module}; print('tkinter' in sys.modules)"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]), result.stdout.strip() == 'True'
+    raise RuntimeError(f"no importtime line for {module}")
+
+
+def main(runs=15):
+    ok = True
+    with tempfile.TemporaryDirectory() as cwd:
+        print(f"{'module':<20}{'median ms':>10}{'min ms':>10}  tkinter")
+        for module in MODULES:
+            samples = [import_time_us(module, cwd) for _ in range(runs)]
+            times = [us for us, _ in samples]
+            loaded_tk = any(tk for _, tk in samples)
+            ok = ok and not loaded_tk
+            print(f"{module:<20}{statistics.median(times) / 1000:>10.2f}{min(times) / 1000:>10.2f}  "
+                  f"{'loaded' if loaded_tk else 'no'}")
+        leftovers = os.listdir(cwd)
+    if leftovers:
+        print(f"FAIL: importing created {leftovers}")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 15))
@@ -0,0 +1,109 @@
+# ATM transaction journal at scale: builds a journal of 100M entries by
+# default (100 per account, spread over a year), then times "last 10"
+# and one-month statement queries for random accounts, reports the bytes
+# each entry takes on disk, checks both queries are primary key searches
+# and measures how fast Journal.add() takes new entries in the batches the
+# ledger hands it after each commit.
+#
+#   python -m benchmarks.bench_journal [entries]
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import atm_journal
+from atm_journal import Journal, new_entry
+
+PER_ACCOUNT = 100
+YEAR_US = 365 * 86400 * 1000000
+START_US = 1704067200 * 1000000      # 2024-01-01 UTC
+CHUNK = 1000000
+
+
+def generate(conn, entries):
+    # Written in primary key order, account by account, as the table
+    # would look after a year of traffic
+    step = YEAR_US // PER_ACCOUNT
+    for offset in range(0, entries, CHUNK):
+        count = min(CHUNK, entries - offset)
+        with conn:
+            conn.execute(
+                "WITH RECURSIVE n(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+                "INSERT INTO journal (account, at, kind, amount, balance) "
+                "SELECT printf('%010d', i / ?), ? + (i % ?) * ? + i % 997, "
+                "CASE i % ? WHEN 0 THEN 'C' WHEN 1 THEN 'D' ELSE substr('DWIO', i % 4 + 1, 1) END, "
+                "i % 50000 + 100, i % 1000000 FROM n",
+                (offset, offset + count - 1, PER_ACCOUNT, START_US, PER_ACCOUNT, step, PER_ACCOUNT))
+        print(f"  generated {offset + count} entries", end='\r', file=sys.stderr)
+    print(file=sys.stderr)
+
+
+def latencies(query, accounts, samples):
+    rng = random.Random(1)
+    times = []
+    rows = 0
+    for _ in range(samples):
+        account = f"{rng.randrange(accounts):010d}"
+        start = time.perf_counter()
+        rows += len(query(account))
+        times.append((time.perf_counter() - start) * 1000000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)], rows / samples
+
+
+def add_rate(path, batch, records=1000000):
+    journal = Journal(path)
+    start = time.perf_counter()
+    for offset in range(0, records, batch):
+        journal.add([new_entry(f"{i % 10000:010d}", 'D', 100, i) for i in range(offset, offset + batch)],
+                    (1, offset + batch))
+    journal.flush()
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return records / elapsed
+
+
+def main(entries=100000000, samples=2000):
+    ok = True
+    accounts = max(entries // PER_ACCOUNT, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'journal.db')
+        journal = Journal(path)
+        conn = journal._conn
+        begin = time.perf_counter()
+        generate(conn, entries)
+        # WAL mode: move everything into the main file before measuring it
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(path)
+        print(f"generated {entries} entries for {accounts} accounts in {time.perf_counter() - begin:.1f}s, "
+              f"{size / entries:.1f} bytes/entry")
+
+        for label, sql in (("last 10", atm_journal.LAST), ("statement", atm_journal.RANGE)):
+            plan = ' | '.join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, (0,) * sql.count('?')))
+            good = 'SEARCH journal USING PRIMARY KEY' in plan
+            ok = ok and good
+            print(f"{'ok  ' if good else 'FAIL'} {label}: {plan}")
+
+        month = 30 * 86400 * 1000000
+        queries = (
+            ("last 10", lambda account: journal.last(account, 10)),
+            ("one-month statement", lambda account: journal.statement(account, START_US + month,
+                                                                      START_US + 2 * month)),
+            ("full-year statement", lambda account: journal.statement(account)),
+        )
+        print(f"{'query':<22}{'median us':>10}{'p99 us':>10}{'rows':>8}")
+        for label, query in queries:
+            median, p99, rows = latencies(query, accounts, samples)
+            print(f"{label:<22}{median:>10.0f}{p99:>10.0f}{rows:>8.1f}")
+        journal.close()
+
+        for batch in (1, 10, 100):
+            rate = add_rate(os.path.join(tmp, f"add-{batch}.db"), batch)
+            print(f"Journal.add, {batch:>3} entries per call: {rate:.0f} entries/s")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000000))
@@ -0,0 +1,85 @@
+# ATM ledger throughput and restart time.
+#
+#  1. group commit: many threads doing durable deposits at once
+#  2. bulk append of N logged transactions (default 10M)
+#  3. restart time replaying the whole log, then restart time from the
+#     snapshot that compaction produces
+#
+#   python -m benchmarks.bench_ledger_recovery [transactions] [accounts]
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from atm_ledger import Ledger
+
+
+def group_commit(path, threads=32, per_thread=500):
+    ledger = Ledger(path)
+    ledger.open()
+    for t in range(threads):
+        ledger.create(f"gc{t}", '0000', 0, wait=False)
+    ledger.wait()
+
+    def worker(t):
+        for _ in range(per_thread):
+            ledger.deposit(f"gc{t}", 100)   # waits for its fsync
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    ledger.close()
+    return threads * per_thread / elapsed
+
+
+def main(transactions=10000000, accounts=100000):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"group commit: {group_commit(os.path.join(tmp, 'gc')):.0f} durable deposits/s (32 threads)")
+
+        path = os.path.join(tmp, 'ledger')
+        rng = random.Random(1)
+        ledger = Ledger(path, segment_records=transactions + accounts + 1)   # no rotation
+        ledger.open()
+        start = time.perf_counter()
+        for i in range(accounts):
+            ledger.create(f"{i:08d}", '1234', 10000, wait=False)
+        numbers = [f"{rng.randrange(accounts):08d}" for _ in range(1000)]
+        for i in range(transactions):
+            if i & 1:
+                ledger.deposit(numbers[i % 1000], 500, wait=False)
+            else:
+                ledger.withdraw(numbers[i % 1000], 250, wait=False)
+        ledger.wait()
+        elapsed = time.perf_counter() - start
+        ledger.close()
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        print(f"appended {transactions + accounts} records in {elapsed:.1f}s "
+              f"({(transactions + accounts) / elapsed:.0f}/s, {size / 2 ** 20:.0f} MB)")
+
+        # Restart replaying every record; open() then compacts in the background
+        ledger = Ledger(path)
+        start = time.perf_counter()
+        state = ledger.open()
+        print(f"restart from full log: {time.perf_counter() - start:.2f}s, {len(state)} accounts")
+        ledger.close()
+
+        ledger = Ledger(path)
+        start = time.perf_counter()
+        snapshot_state = ledger.open()
+        print(f"restart from snapshot: {time.perf_counter() - start:.2f}s")
+        ledger.close()
+        if snapshot_state != state:
+            print("FAIL: snapshot state differs from replayed state")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*args))
@@ -0,0 +1,67 @@
+# Cost of the metrics layer per call: a trivial function called bare,
+# through @timed with collection off and on, and with the sampling profiler
+# running. Fails if a wrapped call costs 1us or more over the bare call
+# while collection is off.
+#
+#   python -m benchmarks.bench_metrics [calls]
+import sys
+import time
+
+import metrics
+
+
+def work(x):
+    return x + 1
+
+
+timed_work = metrics.timed('bench.work')(work)
+
+
+def measured_work(x):
+    with metrics.measure('bench.block'):
+        return x + 1
+
+
+def per_call_ns(func, calls):
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for i in range(calls):
+            func(i)
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e9
+
+
+def main(calls=1000000):
+    ok = True
+    metrics.disable()
+    bare = per_call_ns(work, calls)
+    rows = [('bare call', bare)]
+    rows.append(('@timed, off', per_call_ns(timed_work, calls)))
+    rows.append(('measure(), off', per_call_ns(measured_work, calls)))
+    off_overhead = max(ns for _, ns in rows[1:]) - bare
+
+    metrics.enable()
+    rows.append(('@timed, on', per_call_ns(timed_work, calls)))
+    rows.append(('measure(), on', per_call_ns(measured_work, calls)))
+    metrics.set_profiling(100)
+    rows.append(('@timed, on, profile 1/100', per_call_ns(timed_work, calls)))
+    metrics.set_profiling(0)
+    metrics.disable()
+
+    print(f"{'':<28}{'ns/call':>10}{'overhead':>10}")
+    for label, ns in rows:
+        print(f"{label:<28}{ns:>10.0f}{ns - bare:>10.0f}")
+    count = metrics.histogram('bench.work').count
+    print(f"recorded {count} calls of bench.work")
+    if off_overhead >= 1000:
+        print(f"FAIL: {off_overhead:.0f}ns per call with metrics off")
+        ok = False
+    if 'app_operation_seconds_count{op="bench.work",layer="core"}' not in metrics.render():
+        print("FAIL: bench.work missing from the exported metrics")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000))
@@ -0,0 +1,57 @@
+# Money arithmetic: integer-cent Money against Decimal and float. Sums the
+# same random amounts each way, reports operations/sec, and shows the drift
+# float accumulates over the run. "cents" is the plain int arithmetic
+# AccountStore does on its balances; Money objects only wrap amounts at the
+# API boundary, and each Money operation is a Python-level call, so they
+# are slower than C-implemented Decimal.
+#
+#   python -m benchmarks.bench_money [operations]
+import random
+import sys
+import time
+from decimal import Decimal
+
+from money import Money, ZERO
+
+
+def timed(label, amounts, start, baseline=None):
+    begin = time.perf_counter()
+    total = start
+    for amount in amounts:
+        total = total + amount
+        total = total - amount
+        total = total + amount
+    elapsed = time.perf_counter() - begin
+    rate = 3 * len(amounts) / elapsed
+    note = "".join(f"  ({rate / base:.2f}x {name})" for name, base in baseline or ())
+    print(f"{label:>8}{rate:>14.0f} ops/s{note}")
+    return total, rate
+
+
+def main(operations=1000000):
+    rng = random.Random(1)
+    cents = [rng.randint(1, 100000) for _ in range(operations)]
+    texts = [f"{c // 100}.{c % 100:02d}" for c in cents]
+
+    begin = time.perf_counter()
+    money = [Money.parse(t) for t in texts]
+    print(f"parse: {operations / (time.perf_counter() - begin):.0f} amounts/s")
+
+    float_total, float_rate = timed('float', [float(t) for t in texts], 0.0)
+    decimal_total, decimal_rate = timed('Decimal', [Decimal(t) for t in texts], Decimal(0),
+                                        [('float', float_rate)])
+    baseline = [('float', float_rate), ('Decimal', decimal_rate)]
+    cents_total, _ = timed('cents', [m.cents for m in money], 0, baseline)
+    money_total, _ = timed('Money', money, ZERO, baseline)
+
+    exact = sum(cents)
+    print(f"exact total {Money(exact)}, float off by {abs(float_total * 100 - exact):.6f} cents")
+    if money_total.cents != exact or cents_total != exact or decimal_total * 100 != exact:
+        print("FAIL: Money, cents or Decimal total is not exact")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:2]]
+    sys.exit(main(*args))
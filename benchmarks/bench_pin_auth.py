@@ -0,0 +1,119 @@
+# PIN guessing against the ATM core: a scripted client tries every PIN on
+# one account, then one PIN on many accounts, while a legitimate user keeps
+# logging in from another terminal. Reports how many guesses were actually
+# checked, the legitimate login latency, that the lockout survives a
+# restart, and the rate limiter's memory per key.
+#
+#   python -m benchmarks.bench_pin_auth [attempts]
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import auth
+import atm_core
+from atm_core import ATMCore, TooManyAttempts, open_store
+from money import Money
+
+
+def timed_login(core, number, pin, source):
+    start = time.perf_counter()
+    account = core.authenticate(number, pin, source)
+    return account, (time.perf_counter() - start) * 1000
+
+
+def guess(core, number, pins, source):
+    # Returns (guesses checked, guesses throttled, whether one got in)
+    checked = throttled = 0
+    for pin in pins:
+        try:
+            if core.authenticate(number, pin, source) is not None:
+                return checked + 1, throttled, True
+            checked += 1
+        except TooManyAttempts:
+            throttled += 1
+    return checked, throttled, False
+
+
+def limiter_memory(keys=100000):
+    limiter = auth.RateLimiter(5, 1 / 60)
+    tracemalloc.start()
+    for i in range(keys):
+        limiter.consume(f"key{i}")
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Buckets that have refilled are dropped on the next update
+    quick = auth.RateLimiter(1, 1000)
+    for i in range(keys // 10):
+        quick.consume(f"key{i}")
+    time.sleep(0.01)
+    quick.consume('late')
+    return size / keys, len(quick)
+
+
+def main(attempts=10000):
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        config = f"log:{os.path.join(tmp, 'ledger')}"
+        core = ATMCore(open_store(config))
+        core.create_account('victim', '7391', Money(100000))
+        core.create_account('alice', '2468', Money(5000))
+        for i in range(50):
+            core.create_account(f"acct{i}", f"{1000 + i * 37:04d}")
+
+        baseline = [timed_login(core, 'alice', '2468', 'alice-terminal')[1] for _ in range(5)]
+        print(f"scrypt n={auth.SCRYPT_N}: legitimate login {statistics.median(baseline):.1f} ms")
+
+        # Every PIN against one account, interleaved with alice's logins
+        pins = [f"{i:04d}" for i in range(attempts)]
+        latencies = []
+        checked = throttled = 0
+        start = time.perf_counter()
+        for batch in range(10):
+            part = pins[batch::10]
+            c, t, got_in = guess(core, 'victim', part, 'bot')
+            checked, throttled = checked + c, throttled + t
+            ok = ok and not got_in
+            account, latency = timed_login(core, 'alice', '2468', 'alice-terminal')
+            ok = ok and account is not None
+            latencies.append(latency)
+        elapsed = time.perf_counter() - start
+        days = 10000 / atm_core.ACCOUNT_ATTEMPTS * atm_core.ACCOUNT_REFILL / 86400
+        print(f"single-account attack: {checked + throttled} guesses in {elapsed:.2f}s, "
+              f"{checked} checked, {throttled} throttled "
+              f"(all 10000 PINs would take ~{days:.1f} days)")
+        print(f"legitimate login during attack: p50 {statistics.median(latencies):.1f} ms, "
+              f"max {max(latencies):.1f} ms")
+
+        # One guess on each of many accounts from a fresh source
+        sprayed = [0, 0]
+        for i in range(50):
+            c, t, _ = guess(core, f"acct{i}", ['0000'], 'spray-bot')
+            sprayed[0] += c
+            sprayed[1] += t
+        print(f"spray attack over 50 accounts: {sprayed[0]} checked, {sprayed[1]} throttled")
+        ok = ok and sprayed[0] <= atm_core.SOURCE_ATTEMPTS
+        core.close()
+
+        # The lockout is stored with the account, so a restart keeps it
+        core = ATMCore(open_store(config))
+        try:
+            core.authenticate('victim', '7391', 'bot')
+            print("FAIL: lockout lost on restart")
+            ok = False
+        except TooManyAttempts as e:
+            print(f"after restart: victim still locked ({e.retry_after:.0f}s left)")
+        core.close()
+
+    per_key, left = limiter_memory()
+    print(f"rate limiter: {per_key:.0f} bytes per active key, {left} of 10000 keys left after refill")
+    ok = ok and left <= 1
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:2]]
+    sys.exit(main(*args))
@@ -0,0 +1,84 @@
+# Product lookups by ID with and without the in-process product cache.
+# Builds a catalog, then looks products up in a Zipf pattern (a few hundred
+# hot SKUs take most of the scans) and reports the median and p99 latency
+# and the hit rate:
+#
+#   - sql: the plain SELECT by primary key
+#   - uncached: get_product with the cache turned off
+#   - cached: get_product with the cache on, nothing else writing
+#   - cached+writer: the same while another connection records a sale every
+#     millisecond, so the cache keeps being invalidated through data_version
+#
+#   python -m benchmarks.bench_product_cache [products] [lookups]
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import inventory_db as db
+from benchmarks import datagen
+
+
+def latencies(lookup, ids):
+    times = []
+    for product_id in ids:
+        start = time.perf_counter()
+        lookup(product_id)
+        times.append((time.perf_counter() - start) * 1000000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)]
+
+
+def writer(path, product_count, stop):
+    # Another terminal: sells a hot product every millisecond
+    conn = db.connect(path)
+    pick = datagen.Zipf(product_count)
+    while not stop.is_set():
+        with conn:
+            conn.execute("UPDATE products SET quantity = quantity + 1 WHERE id = ?", (pick(),))
+        time.sleep(0.001)
+    conn.close()
+
+
+def main(product_count=100000, lookups=200000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        db.configure(path)
+        conn = db.get_connection()
+        with conn:
+            conn.executemany("INSERT INTO products (name, quantity, price, reorder_point) VALUES (?, ?, ?, ?)",
+                             datagen.products(product_count))
+        pick = datagen.Zipf(product_count)
+        ids = [pick() for _ in range(lookups)]
+        print(f"{product_count} products, {lookups} lookups, {len(set(ids))} distinct, "
+              f"cache size {db.PRODUCT_CACHE_SIZE}")
+
+        print(f"{'mode':<16}{'median us':>10}{'p99 us':>10}{'hit rate':>10}")
+        median, p99 = latencies(lambda product_id: conn.execute(db.PRODUCT_BY_ID, (product_id,)).fetchone(), ids)
+        print(f"{'sql':<16}{median:>10.2f}{p99:>10.2f}{'':>10}")
+
+        maxsize = db.product_cache.maxsize
+        for label, size, write in (("uncached", 0, False), ("cached", maxsize, False),
+                                   ("cached+writer", maxsize, True)):
+            db.product_cache.maxsize = size
+            db.product_cache.reset(None, 0)
+            stop = threading.Event()
+            thread = threading.Thread(target=writer, args=(path, product_count, stop))
+            if write:
+                thread.start()
+            try:
+                median, p99 = latencies(db.get_product, ids)
+            finally:
+                stop.set()
+                if write:
+                    thread.join()
+            stats = db.product_cache.stats()
+            print(f"{label:<16}{median:>10.2f}{p99:>10.2f}{stats['hit_rate']:>10.1%}")
+        db.close_connection()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:3])))
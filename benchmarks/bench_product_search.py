@@ -0,0 +1,107 @@
+# Product search latency on a large catalog. Builds 500k products by
+# default, named from a few thousand made-up words (common words used far
+# more than rare ones, plus a model number), then replays typing: every
+# prefix of a product's name as it would be typed, the same names with a
+# typo, and single common words that match a large part of the catalog.
+# Reports median and p99 milliseconds per keystroke and compares them with
+# the LIKE '%text%' scan the inventory filter used before. Keystrokes must
+# stay under TARGET_MS at p99; a typo runs the search twice (the miss, then
+# the corrected query), so it gets TYPO_TARGET_MS.
+#
+#   python -m benchmarks.bench_product_search [products] [queries]
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import inventory_db as db
+import inventory_search
+from benchmarks import datagen
+
+SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'te', 'vo', 'chi', 'dra', 'fen', 'gor', 'hul', 'jin', 'kel',
+             'mar', 'pel', 'quo', 'ris', 'tor', 'ul', 'ven', 'wex', 'yar', 'zen', 'bri', 'cla', 'sto')
+TARGET_MS = 10.0
+TYPO_TARGET_MS = 20.0
+
+
+def vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def names(count, words, rng):
+    pick = datagen.Zipf(len(words), 1.0, rng)
+    for i in range(count):
+        yield (' '.join(words[pick() - 1] for _ in range(rng.randint(2, 4))).title() + f" {i % 1000}",)
+
+
+def typo(word, rng):
+    i = rng.randrange(len(word) - 1)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]           # swapped letters
+    return word[:i] + rng.choice('aeiouklmnrst') + word[i + 1:]           # wrong letter
+
+
+def timings(queries, run):
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)], times[-1]
+
+
+def main(product_count=500000, samples=300):
+    rng = random.Random(7)
+    words = vocabulary(5000, rng)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, 'search.db'))
+        conn = db.get_connection()
+        begin = time.perf_counter()
+        with conn:
+            conn.executemany("INSERT INTO products (name, quantity, price) VALUES (?, 10, 100)",
+                             names(product_count, words, rng))
+        print(f"inserted {product_count} products (search index kept by triggers) "
+              f"in {time.perf_counter() - begin:.1f}s")
+        begin = time.perf_counter()
+        inventory_search.vocabulary.refresh(conn)
+        print(f"vocabulary of {len(inventory_search.vocabulary.frequency)} words loaded "
+              f"in {(time.perf_counter() - begin) * 1000:.0f} ms")
+
+        targets = [name for (name,) in conn.execute("SELECT name FROM products ORDER BY random() LIMIT ?",
+                                                    (samples,))]
+        typing = [name[:n] for name in targets for n in range(2, len(name) + 1)]
+        typos = []
+        for name in targets:
+            first, *rest = name.lower().split()
+            typos.append(' '.join([typo(first, rng)] + rest[:1]))
+        common = words[:samples]
+
+        like = "SELECT id, name FROM products WHERE name LIKE ? ESCAPE '\\' LIMIT 10"
+        print(f"{'queries':<26}{'count':>7}{'median ms':>11}{'p99 ms':>9}{'max ms':>9}{'found':>8}")
+        for label, queries, run, target in (
+                ("as you type", typing, inventory_search.search, TARGET_MS),
+                ("with a typo", typos, inventory_search.search, TYPO_TARGET_MS),
+                ("one common word", common, inventory_search.search, TARGET_MS),
+                ("LIKE scan (before)", typing[::100], lambda text: conn.execute(like, (f"%{text}%",)).fetchall(),
+                 None),
+        ):
+            found = sum(bool(run(query)) for query in queries[:50]) / min(len(queries), 50)
+            median, p99, worst = timings(queries, run)
+            if target is not None:
+                ok = ok and p99 < target
+            print(f"{label:<26}{len(queries):>7}{median:>11.2f}{p99:>9.2f}{worst:>9.2f}{found:>8.0%}")
+        db.close_connection()
+    print(f"{'ok' if ok else 'FAIL'}: p99 {'under' if ok else 'over'} {TARGET_MS:.0f} ms "
+          f"({TYPO_TARGET_MS:.0f} ms with a typo)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:3])))
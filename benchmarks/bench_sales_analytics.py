@@ -0,0 +1,88 @@
+# Sales analytics over a generated sales table (10M rows by default): a
+# year of sales across 1000 products. Times each inventory_analytics query
+# and, for the daily series, the same aggregation done in Python over the
+# raw rows, and checks that both give the same answer.
+#
+#   python -m benchmarks.bench_sales_analytics [rows]
+import os
+import sys
+import tempfile
+import time
+
+import inventory_analytics as analytics
+import inventory_db as db
+
+PRODUCTS = 1000
+CHUNK = 1000000
+START = '2024-01-01'
+
+
+def generate(conn, rows):
+    with conn:
+        conn.executemany("INSERT INTO products (name, quantity, price) VALUES (?, ?, ?)",
+                         [(f"product{i}", 10 ** 9, 100 + i) for i in range(PRODUCTS)])
+    # Spread the sales evenly over a year, about one every three seconds at 10M
+    spacing = 365 * 86400 / rows
+    for offset in range(0, rows, CHUNK):
+        count = min(CHUNK, rows - offset)
+        with conn:
+            conn.execute(
+                "WITH RECURSIVE n(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+                "INSERT INTO sales (product_id, quantity, total_price, date) "
+                "SELECT (i * 7919) % ? + 1, i % 5 + 1, (i % 5 + 1) * (100 + (i * 7919) % ?), "
+                "datetime(?, '+' || CAST(i * ? AS INTEGER) || ' seconds') FROM n",
+                (offset, offset + count - 1, PRODUCTS, PRODUCTS, START, spacing))
+        print(f"  generated {offset + count} rows", end='\r', file=sys.stderr)
+    print(file=sys.stderr)
+    conn.execute("ANALYZE")
+
+
+def timed(label, func, *args):
+    begin = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<40}{(time.perf_counter() - begin) * 1000:>10.1f} ms")
+    return result
+
+
+def python_daily(conn, start, end):
+    # The baseline: pull every raw row into Python and group it there
+    days = {}
+    for date, quantity, total in conn.execute(
+            "SELECT date, quantity, total_price FROM sales WHERE date >= ? AND date < ?", (start, end)):
+        day = date[:10]
+        units, revenue = days.get(day, (0, 0))
+        days[day] = (units + quantity, revenue + total)
+    return sorted((day, units, revenue) for day, (units, revenue) in days.items())
+
+
+def main(rows=10000000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, 'analytics.db'))
+        conn = db.get_connection()
+        begin = time.perf_counter()
+        generate(conn, rows)
+        print(f"generated {rows} sales in {time.perf_counter() - begin:.1f}s")
+
+        quarter = ('2024-04-01', '2024-07-01')
+        daily = timed("daily series, one quarter", analytics.series, 'day', *quarter)
+        timed("weekly series, whole year", analytics.series, 'week')
+        timed("hourly series, one week", analytics.series, 'hour', '2024-05-06', '2024-05-13')
+        timed("hourly series, one quarter", analytics.series, 'hour', *quarter)
+        timed("7-day moving average, whole year", analytics.moving_average, 'day', 7)
+        timed("top 10 products, all time", analytics.top_products)
+        timed("top 10 products, one quarter", analytics.top_products, *quarter)
+        timed("top 10 products, mid-day range", analytics.top_products,
+              '2024-04-01 12:00', '2024-04-08 12:00')
+        timed("one product, daily, one quarter", analytics.series, 'day', *quarter, 42)
+        timed("quarter over quarter", analytics.compare_periods, *quarter)
+        baseline = timed("daily series in Python, one quarter", python_daily, conn, *quarter)
+        db.close_connection()
+
+    if daily != baseline:
+        print("FAIL: daily series differs from the raw rows")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000000))
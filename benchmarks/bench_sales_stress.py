@@ -0,0 +1,72 @@
+# Several processes hammer record_sales() on a handful of products with
+# limited stock. Afterwards stock must never be negative and every unit
+# sold must be accounted for in the sales table.
+#
+#   python -m benchmarks.bench_sales_stress [processes] [baskets_per_process]
+import os
+import random
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+import inventory_db as db
+
+PRODUCTS = 20
+INITIAL_STOCK = 1000
+
+
+def worker(args):
+    path, seed, baskets = args
+    db.configure(path)
+    rng = random.Random(seed)
+    sold = failed = 0
+    for _ in range(baskets):
+        items = [(rng.randint(1, PRODUCTS), rng.randint(1, 3)) for _ in range(rng.randint(1, 4))]
+        if db.record_sales(items) is None:
+            sold += 1
+        else:
+            failed += 1
+    db.close_connection()
+    return sold, failed
+
+
+def main(processes=8, baskets=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stress.db')
+        db.configure(path)
+        db.setup_database()
+        for i in range(PRODUCTS):
+            db.add_product(f"product{i}", INITIAL_STOCK, 125)
+        db.close_connection()
+
+        start = time.perf_counter()
+        with Pool(processes) as pool:
+            results = pool.map(worker, [(path, seed, baskets) for seed in range(processes)])
+        elapsed = time.perf_counter() - start
+
+        conn = db.connect(path)
+        negative = conn.execute("SELECT COUNT(*) FROM products WHERE quantity < 0").fetchone()[0]
+        remaining = conn.execute("SELECT SUM(quantity) FROM products").fetchone()[0]
+        units_sold = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM sales").fetchone()[0]
+        conn.close()
+        db.configure(path)
+        rollup_mismatches = len(db.check_rollups())
+        db.close_connection()
+
+    sold = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    print(f"{processes} processes, {sold} baskets sold, {failed} rejected, "
+          f"{(sold + failed) / elapsed:.0f} baskets/s")
+    print(f"units sold {units_sold}, remaining {remaining}, negative rows {negative}")
+    print(f"rollup mismatches {rollup_mismatches}")
+    if negative or units_sold + remaining != PRODUCTS * INITIAL_STOCK or rollup_mismatches:
+        print("FAIL: stock oversold or lost, or rollups out of date")
+        return 1
+    print("OK: no oversell")
+    return 0
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*args))
@@ -0,0 +1,93 @@
+# Screen transition latency in the two Tk front ends. Walks each app
+# through its usual navigation loop, timing every switch up to the point
+# Tk has laid the screen out, with the cached screens and again with each
+# screen destroyed and rebuilt before it is shown (the old clear_screen
+# behaviour). Also checks that the cached loop creates no new widgets.
+# Needs a display; on a headless machine run it under Xvfb:
+#
+#   xvfb-run -a python -m benchmarks.bench_screen_switch [rounds]
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+from ATM_interface_with_tinker import ATM
+from atm_core import ATMCore
+from inventory_gui import InventoryApp
+from inventory_service import InventoryService
+from money import Money
+
+ATM_LOOP = ('account_menu', 'deposit', 'account_menu', 'withdraw', 'account_menu', 'login')
+INVENTORY_LOOP = ('main', 'add_product', 'main', 'edit_product', 'main', 'record_sale',
+                  'main', 'inventory', 'main', 'sales_summary', 'main', 'login')
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def switch_ms(root, screens, name, rebuild):
+    start = time.perf_counter()
+    if rebuild and name in screens.frames:
+        screens.frames.pop(name).destroy()
+    screens.show(name)
+    root.update_idletasks()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_loop(root, screens, loop, rounds, rebuild):
+    # The first round builds every screen, so it is left out
+    for name in loop:
+        switch_ms(root, screens, name, rebuild)
+    before = count_widgets(root)
+    samples = [switch_ms(root, screens, name, rebuild) for _ in range(rounds) for name in loop]
+    root.update()
+    return samples, count_widgets(root) - before
+
+
+def report(label, samples, grown):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95)]
+    print(f"{label:<22}{statistics.median(samples):>10.3f}{p95:>10.3f}{samples[-1]:>10.3f}{grown:>8}")
+    return statistics.median(samples)
+
+
+def main(rounds=200):
+    ok = True
+    root = tk.Tk()
+    try:
+        print(f"{'':<22}{'median ms':>10}{'p95 ms':>10}{'max ms':>10}{'widgets':>8}")
+
+        core = ATMCore(hash_pin=lambda pin: pin)
+        core.create_account('1001', '1234', Money.parse('100'))
+        atm = ATM(root, core)
+        atm.current_account = core.accounts.get('1001')
+        results = {}
+        for rebuild in (False, True):
+            samples, grown = run_loop(root, atm.screens, ATM_LOOP, rounds, rebuild)
+            results[rebuild] = report(f"atm {'rebuild' if rebuild else 'cached'}", samples, grown)
+            ok = ok and (rebuild or grown == 0)
+        print(f"atm speedup {results[True] / results[False]:.1f}x")
+        atm.screens.container.destroy()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            service = InventoryService(os.path.join(tmp, 'inventory.db'))
+            app = InventoryApp(root, service)
+            for rebuild in (False, True):
+                samples, grown = run_loop(root, app.screens, INVENTORY_LOOP, rounds // 4, rebuild)
+                results[rebuild] = report(f"inventory {'rebuild' if rebuild else 'cached'}", samples, grown)
+                ok = ok and (rebuild or grown == 0)
+            print(f"inventory speedup {results[True] / results[False]:.1f}x")
+            app.tasks.executor.shutdown(wait=True)
+    finally:
+        root.destroy()
+
+    if not ok:
+        print("FAIL: cached screens created new widgets")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,95 @@
+# Load test for inventory_server.py: starts a server on a scratch database
+# and drives it from several client processes with a mix of report page
+# reads and basket sales. Reports requests/sec and latency percentiles.
+#
+#   python -m benchmarks.bench_server_load [clients] [seconds]
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from inventory_server import InventoryClient
+
+PRODUCTS = 2000
+USER, PASSWORD = 'loadtest', 'loadtest'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(url, timeout=10):
+    # Registers the load test's user once the server answers
+    client = InventoryClient(url)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return client.register_user(USER, PASSWORD)
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def client_worker(args):
+    url, seed, seconds = args
+    rng = random.Random(seed)
+    client = InventoryClient(url)
+    client.authenticate_user(USER, PASSWORD)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if rng.random() < 0.7:
+                client.fetch_report('products', (rng.randint(1, PRODUCTS),) * 2, limit=50)
+            else:
+                client.record_sales([(rng.randint(1, PRODUCTS), 1) for _ in range(rng.randint(1, 3))])
+        except (OSError, ValueError):
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main(clients=16, seconds=5.0):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'load.db')
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen([sys.executable, 'inventory_server.py', '--port', str(port), '--db', db_path],
+                                  stdout=subprocess.DEVNULL)
+        try:
+            wait_for_server(url)
+            seed_client = InventoryClient(url)
+            seed_client.authenticate_user(USER, PASSWORD)
+            for i in range(PRODUCTS):
+                seed_client.add_product(f"product{i}", 10 ** 6, 2.5)
+
+            with Pool(clients) as pool:
+                results = pool.map(client_worker, [(url, seed, seconds) for seed in range(clients)])
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    print(f"{clients} clients, {len(latencies)} requests in {seconds:.0f}s: "
+          f"{len(latencies) / seconds:.0f} req/s, {errors} errors")
+    print(f"latency p50 {percentile(latencies, 0.50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:3]
+    main(int(args[0]) if args else 16, float(args[1]) if len(args) > 1 else 5.0)
@@ -0,0 +1,132 @@
+# Seeded synthetic data for the benchmarks: products, users, sales whose
+# products follow a Zipf distribution (a few best sellers, a long tail),
+# ATM accounts and ATM transaction streams. The same seed always gives the
+# same data, so two benchmark runs see identical inputs.
+#
+# From the command line it writes files the import tools read:
+#
+#   python -m benchmarks.datagen products 10000 > products.csv    (inventory_bulk.py)
+#   python -m benchmarks.datagen sales 1000000 --products 10000 > sales.csv
+#   python -m benchmarks.datagen atm-ops 100000 --accounts 1000 > ops.txt    (atm_batch.py)
+import argparse
+import csv
+import random
+import sys
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from money import format_cents
+
+WORDS = ('red', 'blue', 'steel', 'oak', 'mini', 'pro', 'eco', 'max', 'soft', 'dry',
+         'lamp', 'chair', 'cable', 'mug', 'shelf', 'drill', 'towel', 'pen', 'bag', 'fan')
+START = datetime(2024, 1, 1)
+
+
+class Zipf:
+    # Draws 1..n with P(k) proportional to 1 / k**s
+    def __init__(self, n, s=1.1, rng=None):
+        self.rng = rng or random.Random(0)
+        self.cumulative = list(accumulate(1 / k ** s for k in range(1, n + 1)))
+        self.total = self.cumulative[-1]
+
+    def __call__(self):
+        return bisect(self.cumulative, self.rng.random() * self.total) + 1
+
+
+def products(n, seed=1):
+    # (name, quantity, price in cents, reorder point)
+    rng = random.Random(seed)
+    for i in range(n):
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+        yield name, rng.randint(0, 500), rng.randint(50, 50000), rng.choice((2, 5, 5, 10, 20))
+
+
+def users(m, seed=2, passwords=10):
+    # (username, password); drawn from a small pool of passwords so callers
+    # can hash each distinct one once
+    rng = random.Random(seed)
+    pool = [f"pw-{i}-{rng.getrandbits(32):08x}" for i in range(passwords)]
+    for i in range(m):
+        yield f"user{i}", rng.choice(pool)
+
+
+def sales(k, product_count, days=365, s=1.1, seed=3):
+    # (product id, quantity, timestamp) in time order, product ids 1..product_count
+    rng = random.Random(seed)
+    pick = Zipf(product_count, s, rng)
+    step = days * 86400 / max(k, 1)
+    for i in range(k):
+        quantity = 1 if rng.random() < 0.7 else rng.randint(2, 6)
+        when = START + timedelta(seconds=int(i * step))
+        yield pick(), quantity, when.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def baskets(k, product_count, s=1.1, seed=3):
+    # Lists of (product id, quantity) lines, 1-4 lines each, k baskets
+    rng = random.Random(seed)
+    pick = Zipf(product_count, s, rng)
+    for _ in range(k):
+        yield [(pick(), 1 if rng.random() < 0.7 else rng.randint(2, 4)) for _ in range(rng.randint(1, 4))]
+
+
+def atm_accounts(n, seed=4):
+    # (account number, PIN, opening balance in cents)
+    rng = random.Random(seed)
+    for i in range(n):
+        yield f"{i:010d}", f"{rng.randint(0, 9999):04d}", rng.randint(0, 500000)
+
+
+def atm_operations(k, account_count, seed=5, s=1.05):
+    # (kind, account, amount in cents) or ('transfer', from, to, cents).
+    # Busy accounts follow a Zipf distribution too.
+    rng = random.Random(seed)
+    pick = Zipf(account_count, s, rng)
+    for _ in range(k):
+        roll = rng.random()
+        account = f"{pick() - 1:010d}"
+        amount = rng.choice((2000, 5000, 10000, 20000)) if roll < 0.8 else rng.randint(1, 100000)
+        if roll < 0.45:
+            yield 'deposit', account, amount
+        elif roll < 0.9:
+            yield 'withdraw', account, amount
+        else:
+            yield 'transfer', account, f"{rng.randrange(account_count):010d}", amount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic benchmark data")
+    parser.add_argument('kind', choices=('products', 'users', 'sales', 'atm-accounts', 'atm-ops'))
+    parser.add_argument('count', type=int)
+    parser.add_argument('--products', type=int, default=1000, help="product count for sales")
+    parser.add_argument('--accounts', type=int, default=1000, help="account count for atm-ops")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    seed = {} if args.seed is None else {'seed': args.seed}
+    out = sys.stdout
+
+    if args.kind == 'products':
+        writer = csv.writer(out)
+        writer.writerow(('name', 'quantity', 'price'))
+        writer.writerows((name, quantity, format_cents(price))
+                         for name, quantity, price, _ in products(args.count, **seed))
+    elif args.kind == 'users':
+        writer = csv.writer(out)
+        writer.writerow(('username', 'password'))
+        writer.writerows(users(args.count, **seed))
+    elif args.kind == 'sales':
+        # Priced at a flat 1.00 a unit; the import takes totals as given
+        writer = csv.writer(out)
+        writer.writerow(('product_id', 'quantity', 'total_price', 'date'))
+        writer.writerows((product_id, quantity, format_cents(quantity * 100), when)
+                         for product_id, quantity, when in sales(args.count, args.products, **seed))
+    elif args.kind == 'atm-accounts':
+        for number, pin, balance in atm_accounts(args.count, **seed):
+            out.write(f"create {number} {pin} {format_cents(balance)}\n")
+    else:
+        for op in atm_operations(args.count, args.accounts, **seed):
+            out.write(' '.join(op[:-1]) + f" {format_cents(op[-1])}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+# Repeatable benchmark suite for the inventory and ATM hot paths. Builds a
+# seeded synthetic dataset (see datagen), runs each benchmark several times
+# and writes per-operation timings as JSON; compare mode reads two result
+# files and flags operations that got slower.
+#
+#   python -m benchmarks.suite run -o before.json [--scale small|medium|large] [--only NAME ...]
+#   python -m benchmarks.suite run -o after.json
+#   python -m benchmarks.suite compare before.json after.json [--threshold 0.10]
+#   python -m benchmarks.suite list
+#
+# Micro benchmarks time one call at a time on the prepared dataset; macro
+# benchmarks replay a day's worth of mixed traffic. Times are seconds per
+# operation; the median over the repeats is what compare looks at.
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import auth
+import inventory_db as db
+from atm_accounts import AccountStore
+from atm_core import ATMCore, open_store
+from benchmarks import datagen
+from inventory_service import InventoryService
+from money import Money
+
+SCALES = {
+    'small': {'products': 1000, 'users': 50, 'sales': 20000, 'accounts': 10000, 'atm_ops': 20000, 'repeat': 5},
+    'medium': {'products': 10000, 'users': 200, 'sales': 200000, 'accounts': 100000, 'atm_ops': 200000, 'repeat': 5},
+    'large': {'products': 100000, 'users': 1000, 'sales': 2000000, 'accounts': 1000000, 'atm_ops': 1000000,
+              'repeat': 3},
+}
+LOGIN_SAMPLE = 10         # full-cost hashes are slow; this many accounts/users get one
+BENCHMARKS = {}           # name -> (kind, function)
+
+
+def benchmark(name, kind='micro'):
+    # A benchmark takes the Dataset and returns (operations, seconds) for one run
+    def register(func):
+        BENCHMARKS[name] = (kind, func)
+        return func
+    return register
+
+
+class Dataset:
+    def __init__(self, tmp, scale, seed=0):
+        self.tmp = tmp
+        self.scale = scale
+        self.seed = seed
+        self.path = os.path.join(tmp, 'inventory.db')
+        self.runs = 0
+
+        db.configure(self.path)
+        conn = db.get_connection()
+        sizes = SCALES[scale]
+        self.product_count = sizes['products']
+        hashes = {}
+        self.users = list(datagen.users(sizes['users'], seed + 2))
+        with conn:
+            conn.executemany("INSERT INTO products (name, quantity, price, reorder_point) VALUES (?, ?, ?, ?)",
+                             datagen.products(self.product_count, seed + 1))
+            for _, password in self.users:
+                if password not in hashes:
+                    hashes[password] = auth.hash_password(password)
+            conn.executemany("INSERT INTO users (username, password) VALUES (?, ?)",
+                             [(name, hashes[password]) for name, password in self.users])
+            conn.executemany("INSERT INTO sales (product_id, quantity, total_price, date) "
+                             "SELECT id, ?, ? * price, ? FROM products WHERE id = ?",
+                             ((quantity, quantity, when, product_id) for product_id, quantity, when
+                              in datagen.sales(sizes['sales'], self.product_count, seed=seed + 3)))
+        conn.execute("ANALYZE")
+        self.service = InventoryService()
+
+        # ATM accounts: the first few get login-strength PIN hashes for the
+        # authenticate benchmark, the rest the cheapest scrypt
+        self.accounts = list(datagen.atm_accounts(sizes['accounts'], seed + 4))
+        self.atm_ops = sizes['atm_ops']
+
+    def atm(self, config='memory', hashed=0):
+        store = AccountStore() if config == 'bare' else open_store(self.atm_config(config))
+        core = ATMCore(store, hash_pin=lambda pin: auth.hash_password(pin, n=2))
+        for i, (number, pin, balance) in enumerate(self.accounts):
+            pin_hash = auth.hash_password(pin) if i < hashed else auth.hash_password(pin, n=2)
+            store.create(number, pin_hash, Money(balance))
+        return core
+
+    def atm_config(self, config):
+        if config == 'memory':
+            return 'memory'
+        self.runs += 1
+        return f"{config}:{os.path.join(self.tmp, f'atm-{self.runs}')}"
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+# Micro benchmarks
+@benchmark('setup_database')
+def bench_setup_database(data):
+    # Cold start on a new file: create the schema and run every migration
+    data.runs += 1
+    db.configure(os.path.join(data.tmp, f'setup-{data.runs}.db'))
+    try:
+        return 1, timed(db.setup_database)
+    finally:
+        db.close_connection()
+        db.configure(data.path)
+
+
+@benchmark('record_sale')
+def bench_record_sale(data, calls=1000):
+    sales = [(product_id, quantity) for product_id, quantity, _
+             in datagen.sales(calls, data.product_count, seed=data.seed + data.runs)]
+    data.runs += 1
+    conn = db.get_connection()
+    with conn:
+        # Enough stock that every sale goes through
+        conn.executemany("UPDATE products SET quantity = quantity + ? WHERE id = ?",
+                         [(quantity, product_id) for product_id, quantity in sales])
+
+    def run():
+        for product_id, quantity in sales:
+            if db.record_sale(product_id, quantity) is not None:
+                raise RuntimeError("sale rejected")
+    return calls, timed(run)
+
+
+@benchmark('get_product')
+def bench_get_product(data, calls=10000):
+    pick = datagen.Zipf(data.product_count)
+    ids = [pick() for _ in range(calls)]
+
+    def run():
+        for product_id in ids:
+            db.get_product(product_id)
+    return calls, timed(run)
+
+
+@benchmark('sales_summary')
+def bench_sales_summary(data, calls=50):
+    def run():
+        for _ in range(calls):
+            data.service.fetch_report('sales_by_product')
+            data.service.fetch_report('sales_by_day')
+    return calls, timed(run)
+
+
+@benchmark('low_stock_report')
+def bench_low_stock_report(data, calls=200):
+    def run():
+        for _ in range(calls):
+            data.service.fetch_report('low_stock')
+    return calls, timed(run)
+
+
+@benchmark('authenticate_user')
+def bench_authenticate_user(data):
+    # First logins: full password hash verification
+    db._verified = auth.VerifiedCache()
+    users = data.users[:LOGIN_SAMPLE]
+
+    def run():
+        for name, password in users:
+            if not db.authenticate_user(name, password):
+                raise RuntimeError("login failed")
+    return len(users), timed(run)
+
+
+@benchmark('authenticate_user_cached')
+def bench_authenticate_user_cached(data, calls=2000):
+    name, password = data.users[0]
+    db.authenticate_user(name, password)
+
+    def run():
+        for _ in range(calls):
+            db.authenticate_user(name, password)
+    return calls, timed(run)
+
+
+@benchmark('atm_authenticate')
+def bench_atm_authenticate(data):
+    if not hasattr(data, 'login_atm'):
+        data.login_atm = data.atm('bare', hashed=LOGIN_SAMPLE)
+    accounts = data.accounts[:LOGIN_SAMPLE]
+
+    def run():
+        for number, pin, _ in accounts:
+            if data.login_atm.authenticate(number, pin, source='bench') is None:
+                raise RuntimeError("login failed")
+    return len(accounts), timed(run)
+
+
+def _atm_ops(data, config, method, calls):
+    core = data.atm(config)
+    try:
+        accounts = [core.accounts[number] for number, _, _ in data.accounts[:calls]]
+        amount = Money(100)
+
+        def run():
+            for account in accounts:
+                getattr(account, method)(amount)
+        return len(accounts), timed(run)
+    finally:
+        core.close()
+
+
+for _config, _calls in (('memory', 10000), ('log', 2000), ('sqlite', 2000)):
+    for _method in ('deposit', 'withdraw'):
+        benchmark(f'atm_{_method}[{_config}]')(
+            lambda data, config=_config, method=_method, calls=_calls: _atm_ops(data, config, method, calls))
+
+
+# Macro benchmarks
+@benchmark('inventory_day', 'macro')
+def bench_inventory_day(data):
+    # Baskets through record_sales, with a summary and a low stock check
+    # every 100 baskets, as a few tills and a back office would
+    baskets = list(datagen.baskets(SCALES[data.scale]['sales'] // 20, data.product_count,
+                                   seed=data.seed + 10 + data.runs))
+    data.runs += 1
+    conn = db.get_connection()
+    with conn:
+        conn.executemany("UPDATE products SET quantity = quantity + ? WHERE id = ?",
+                         [(quantity, product_id) for basket in baskets for product_id, quantity in basket])
+
+    def run():
+        for i, basket in enumerate(baskets):
+            db.record_sales(basket)
+            if i % 100 == 0:
+                data.service.fetch_report('sales_by_product')
+                data.service.fetch_report('low_stock')
+    return len(baskets), timed(run)
+
+
+@benchmark('atm_stream', 'macro')
+def bench_atm_stream(data):
+    core = data.atm('memory')
+    ops = list(datagen.atm_operations(data.atm_ops, len(data.accounts), seed=data.seed + 5))
+    accounts = core.accounts
+
+    def run():
+        for op in ops:
+            if op[0] == 'transfer':
+                core.transfer(op[1], op[2], Money(op[3]))
+            else:
+                getattr(accounts[op[1]], op[0])(Money(op[2]))
+    try:
+        return len(ops), timed(run)
+    finally:
+        core.close()
+
+
+def metadata(scale, seed):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'scale': scale, 'seed': seed, 'commit': commit or None,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version, 'platform': platform.platform()}
+
+
+def run(scale='small', seed=0, only=None, repeat=None):
+    names = only or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}")
+    repeat = repeat or SCALES[scale]['repeat']
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        begin = time.perf_counter()
+        data = Dataset(tmp, scale, seed)
+        print(f"dataset ({scale}) built in {time.perf_counter() - begin:.1f}s", file=sys.stderr)
+        print(f"{'benchmark':<28}{'kind':<7}{'median us/op':>14}{'min us/op':>12}{'ops/s':>12}", file=sys.stderr)
+        for name in names:
+            kind, func = BENCHMARKS[name]
+            samples = []
+            for _ in range(repeat):
+                ops, seconds = func(data)
+                samples.append(seconds / ops)
+            median = statistics.median(samples)
+            results[name] = {'kind': kind, 'ops': ops, 'repeat': repeat, 'median': median,
+                             'min': min(samples), 'max': max(samples), 'ops_per_second': 1 / median}
+            print(f"{name:<28}{kind:<7}{median * 1e6:>14.1f}{min(samples) * 1e6:>12.1f}{1 / median:>12.0f}",
+                  file=sys.stderr)
+        db.close_connection()
+    return {'meta': metadata(scale, seed), 'results': results}
+
+
+def compare(base, new, threshold=0.10):
+    # Returns the names of benchmarks whose median got slower by more than threshold
+    regressions = []
+    if base['meta'].get('scale') != new['meta'].get('scale'):
+        print(f"warning: comparing scale {base['meta'].get('scale')} with {new['meta'].get('scale')}")
+    print(f"{'benchmark':<28}{'base us/op':>12}{'new us/op':>12}{'change':>9}")
+    for name in sorted(base['results'].keys() | new['results'].keys()):
+        old, now = base['results'].get(name), new['results'].get(name)
+        if old is None or now is None:
+            print(f"{name:<28}{'only in ' + ('new' if old is None else 'base'):>33}")
+            continue
+        change = now['median'] / old['median'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{name:<28}{old['median'] * 1e6:>12.1f}{now['median'] * 1e6:>12.1f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inventory and ATM benchmark suite")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the benchmarks and write JSON results")
+    run_parser.add_argument('-o', '--output', help="results file (default: stdout)")
+    run_parser.add_argument('--scale', choices=tuple(SCALES), default='small')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int)
+    run_parser.add_argument('--only', nargs='+', metavar='NAME')
+    compare_parser = commands.add_parser('compare', help="flag regressions between two result files")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help="slowdown that counts as a regression (default: %(default)s)")
+    commands.add_parser('list', help="list the benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for name, (kind, _) in BENCHMARKS.items():
+            print(f"{name:<28}{kind}")
+        return 0
+    if args.command == 'compare':
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        regressions = compare(base, new, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            return 1
+        return 0
+
+    try:
+        results = run(args.scale, args.seed, args.only, args.repeat)
+    except ValueError as e:
+        parser.error(str(e))
+    text = json.dumps(results, indent=2) + '\n'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import argparse
+import csv
+import sys
+import time
+from datetime import datetime, timedelta
+
+from inventory_service import InventoryService
+
+# Low stock notifier. Reads only the pending alerts that the database
+# triggers raise when a product drops below its reorder point, never the
+# products table, so a poll costs the same however big the catalogue is.
+#
+#   python inventory_alerts.py                    list pending alerts
+#   python inventory_alerts.py --take             reorder list; marks alerts notified
+#   python inventory_alerts.py --watch 30         print new alerts as they are raised
+#   python inventory_alerts.py --daily 07:00      one batched reorder list a day
+#
+# Each alert is taken once: a product shows up again only after it has
+# been restocked to its reorder point and then runs low again.
+
+FIELDS = ('id', 'name', 'quantity', 'reorder_point', 'order_quantity', 'raised')
+
+
+def write_alerts(alerts, out):
+    writer = csv.DictWriter(out, FIELDS)
+    writer.writeheader()
+    writer.writerows(alerts)
+    out.flush()
+
+
+def watch(service, interval, out):
+    while True:
+        alerts = service.stock_alerts(take=True)
+        if alerts:
+            write_alerts(alerts, out)
+        time.sleep(interval)
+
+
+def seconds_until(at, now=None):
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def daily(service, at, out):
+    while True:
+        time.sleep(seconds_until(at))
+        alerts = service.stock_alerts(take=True)
+        print(f"# reorder list {datetime.now():%Y-%m-%d}: {len(alerts)} products", file=out)
+        write_alerts(alerts, out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Low stock alerts and reorder lists")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--take', action='store_true', help="mark the listed alerts as notified")
+    mode.add_argument('--watch', type=float, metavar='SECONDS', help="poll for new alerts")
+    mode.add_argument('--daily', metavar='HH:MM', help="print a reorder list every day at this time")
+    parser.add_argument('--db', help="database file (default: inventory.db)")
+    args = parser.parse_args(argv)
+
+    if args.daily:
+        try:
+            seconds_until(args.daily)
+        except ValueError:
+            parser.error("--daily expects a time as HH:MM")
+
+    service = InventoryService(args.db)
+    try:
+        if args.watch:
+            watch(service, args.watch, sys.stdout)
+        elif args.daily:
+            daily(service, args.daily, sys.stdout)
+        else:
+            write_alerts(service.stock_alerts(take=args.take), sys.stdout)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
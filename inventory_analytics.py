@@ -0,0 +1,168 @@
+from datetime import date, datetime, timedelta
+
+import inventory_db as db
+from metrics import timed
+
+# Sales analytics over date ranges. Every aggregate is a GROUP BY pushed
+# down into SQLite, so no individual sale passes through Python. Ranges
+# made of whole days are answered from the daily_product_sales rollup (one
+# row per product per day); hourly buckets and ranges that start or end
+# mid-day read the sales table through its covering date index.
+#
+# start is inclusive and end exclusive; either may be None for an open
+# range. Both are ISO strings or date/datetime objects. Money is integer
+# cents.
+
+# SQL for the start of the bucket a timestamp falls in; weeks start on Monday
+BUCKETS = {
+    'hour': "strftime('%Y-%m-%d %H:00', {0})",
+    'day': "date({0})",
+    'week': "date({0}, 'weekday 0', '-6 days')",
+}
+STEPS = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+FORMATS = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d', 'week': '%Y-%m-%d'}
+RANKINGS = ('revenue', 'units')
+
+
+@timed('analytics.series', 'sqlite')
+def series(bucket='day', start=None, end=None, product_id=None, fill=True):
+    # Returns [(bucket start, units, revenue)] in time order. With fill,
+    # buckets without sales between the first and last one are included as
+    # zeros, so consecutive rows are always one bucket apart.
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}; expected one of {', '.join(BUCKETS)}")
+    start, end = _iso(start), _iso(end)
+    table, column, units, revenue = _source(start, end, hourly=bucket == 'hour')
+    where, params = _range(column, start, end, product_id)
+    # Rollup days are already bucketed; grouping on the bare column lets
+    # SQLite group in index order instead of sorting
+    key = column if (table, bucket) == ('daily_product_sales', 'day') else BUCKETS[bucket].format(column)
+    rows = db.get_connection().execute(
+        f"SELECT {key} AS bucket, SUM({units}), SUM({revenue}) FROM {table}{where} "
+        f"GROUP BY bucket ORDER BY bucket", params).fetchall()
+    return _fill(rows, bucket) if fill else rows
+
+
+def moving_average(bucket='day', window=7, start=None, end=None, product_id=None):
+    # Trailing average over the last `window` buckets, gaps counted as zero.
+    # Returns [(bucket start, units, revenue)]; revenue is rounded to cents.
+    if window < 1:
+        raise ValueError("Window must be at least 1")
+    rows = series(bucket, start, end, product_id)
+    averages = []
+    units_sum = revenue_sum = 0
+    for i, (key, units, revenue) in enumerate(rows):
+        units_sum += units
+        revenue_sum += revenue
+        if i >= window:
+            units_sum -= rows[i - window][1]
+            revenue_sum -= rows[i - window][2]
+        count = min(i + 1, window)
+        averages.append((key, units_sum / count, round(revenue_sum / count)))
+    return averages
+
+
+@timed('analytics.top_products', 'sqlite')
+def top_products(start=None, end=None, n=10, by='revenue'):
+    # Returns [(product_id, name, units, revenue)], best first. The name is
+    # None for products that have since been deleted.
+    if by not in RANKINGS:
+        raise ValueError(f"Cannot rank products by {by!r}; expected one of {', '.join(RANKINGS)}")
+    start, end = _iso(start), _iso(end)
+    if start is None and end is None:
+        totals = "SELECT product_id, units, revenue FROM product_sales_totals"
+        params = []
+    else:
+        table, column, units, revenue = _source(start, end)
+        where, params = _range(column, start, end)
+        totals = (f"SELECT product_id, SUM({units}) AS units, SUM({revenue}) AS revenue "
+                  f"FROM {table}{where} GROUP BY product_id")
+    # Rank first, then look up names for the n winners only
+    return db.get_connection().execute(
+        f"SELECT t.product_id, p.name, t.units, t.revenue "
+        f"FROM (SELECT * FROM ({totals}) ORDER BY {by} DESC, product_id LIMIT ?) t "
+        f"LEFT JOIN products p ON p.id = t.product_id ORDER BY t.{by} DESC, t.product_id",
+        params + [int(n)]).fetchall()
+
+
+@timed('analytics.totals', 'sqlite')
+def totals(start=None, end=None, product_id=None):
+    # Returns (units, revenue) for the range
+    start, end = _iso(start), _iso(end)
+    table, column, units, revenue = _source(start, end)
+    where, params = _range(column, start, end, product_id)
+    row = db.get_connection().execute(
+        f"SELECT COALESCE(SUM({units}), 0), COALESCE(SUM({revenue}), 0) FROM {table}{where}",
+        params).fetchone()
+    return row[0], row[1]
+
+
+def compare_periods(start, end, product_id=None):
+    # Compares [start, end) with the period of the same length just before
+    # it. Returns {'current': (units, revenue), 'previous': (units, revenue),
+    # 'units_change': fraction or None, 'revenue_change': fraction or None}.
+    start, end = _iso(start), _iso(end)
+    if start is None or end is None:
+        raise ValueError("Comparing periods needs both a start and an end")
+    begin, finish = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    if finish <= begin:
+        raise ValueError("End must be after start")
+    previous_start = _iso(begin - (finish - begin))
+    current = totals(start, end, product_id)
+    previous = totals(previous_start, start, product_id)
+    change = [(now - before) / before if before else None for now, before in zip(current, previous)]
+    return {'current': current, 'previous': previous,
+            'units_change': change[0], 'revenue_change': change[1]}
+
+
+def _iso(value):
+    # Midnight datetimes become plain dates so they can use the daily rollup
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.time() == datetime.min.time():
+            return value.date().isoformat()
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    raise ValueError(f"Invalid date {value!r}")
+
+
+def _source(start, end, hourly=False):
+    # Returns (table, date column, units column, revenue column)
+    whole_days = all(value is None or len(value) == 10 for value in (start, end))
+    if whole_days and not hourly:
+        return 'daily_product_sales', 'day', 'units', 'revenue'
+    return 'sales', 'date', 'quantity', 'total_price'
+
+
+def _range(column, start, end, product_id=None):
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{column} < ?")
+        params.append(end)
+    if product_id is not None:
+        conditions.append("product_id = ?")
+        params.append(int(product_id))
+    return (f" WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def _fill(rows, bucket):
+    if not rows:
+        return rows
+    step, fmt = STEPS[bucket], FORMATS[bucket]
+    found = {key: (units, revenue) for key, units, revenue in rows}
+    filled = []
+    current = datetime.strptime(rows[0][0], fmt)
+    last = datetime.strptime(rows[-1][0], fmt)
+    while current <= last:
+        key = current.strftime(fmt)
+        units, revenue = found.get(key, (0, 0))
+        filled.append((key, units, revenue))
+        current += step
+    return filled
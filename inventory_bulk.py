@@ -0,0 +1,188 @@
+import argparse
+import contextlib
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+import inventory_db as db
+from money import Money, format_cents
+
+# Bulk import/export for the inventory database. Files are streamed row by
+# row and written in fixed-size chunks, so memory use does not grow with
+# the size of the file.
+#
+#   python inventory_bulk.py import products catalogue.csv
+#   python inventory_bulk.py import sales history.jsonl
+#   python inventory_bulk.py export products - --format jsonl
+
+COLUMNS = {
+    'products': ('id', 'name', 'quantity', 'price', 'reorder_point'),
+    'sales': ('id', 'product_id', 'quantity', 'total_price', 'date'),
+}
+# Stored as integer cents, written to files as "12.34"
+MONEY_COLUMNS = {'products': 'price', 'sales': 'total_price'}
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith('.jsonl') or path.endswith('.ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def open_input(path):
+    # For use in a with block, which must not close stdin
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, newline='', encoding='utf-8')
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+def read_records(f, fmt):
+    if fmt == 'jsonl':
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(f)
+
+
+def product_rows(records):
+    # A missing or empty reorder_point is None: existing products keep
+    # theirs, new ones get the default
+    for record in records:
+        reorder_point = record.get('reorder_point')
+        yield (record['name'], int(record['quantity']), Money.parse(record['price']).cents,
+               None if reorder_point in (None, '') else int(reorder_point))
+
+
+def sale_rows(records):
+    for record in records:
+        yield (int(record['product_id']), int(record['quantity']),
+               Money.parse(record['total_price']).cents,
+               record.get('date') or time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()))
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_products(rows, batch_size=50000, add_quantity=False):
+    # Upsert by name: existing products get the new quantity, price and
+    # reorder point (or have the quantity added), unknown names are inserted
+    conn = db.get_connection()
+    conn.execute('''CREATE TEMP TABLE IF NOT EXISTS import_products (
+                    name TEXT PRIMARY KEY,
+                    quantity INTEGER NOT NULL,
+                    price INTEGER NOT NULL,
+                    reorder_point INTEGER)''')
+    quantity_expr = 'products.quantity + i.quantity' if add_quantity else 'i.quantity'
+    total = 0
+    for chunk in chunks(rows, batch_size):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM import_products")
+            # Later rows for the same name win within a chunk
+            conn.executemany("INSERT OR REPLACE INTO import_products (name, quantity, price, reorder_point) "
+                             "VALUES (?, ?, ?, ?)", chunk)
+            conn.execute(f"UPDATE products SET quantity = {quantity_expr}, price = i.price, "
+                         "reorder_point = COALESCE(i.reorder_point, products.reorder_point) "
+                         "FROM import_products i WHERE products.name = i.name")
+            conn.execute("INSERT INTO products (name, quantity, price, reorder_point) "
+                         "SELECT name, quantity, price, COALESCE(reorder_point, ?) FROM import_products i "
+                         "WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.name = i.name)",
+                         (db.DEFAULT_REORDER_POINT,))
+            changed = [product_id for (product_id,) in conn.execute(
+                "SELECT p.id FROM products p JOIN import_products i ON p.name = i.name")]
+        # As for add_product and update_product: this process's cached rows
+        # go now, without waiting for the data_version poll
+        db.product_cache.invalidate(changed)
+        total += len(chunk)
+    return total
+
+
+def import_sales(rows, batch_size=50000):
+    # Historical sales are appended as-is; stock levels are not touched
+    conn = db.get_connection()
+    total = 0
+    for chunk in chunks(rows, batch_size):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT INTO sales (product_id, quantity, total_price, date) VALUES (?, ?, ?, ?)",
+                             chunk)
+        total += len(chunk)
+    return total
+
+
+def export_table(table, f, fmt, batch_size=10000):
+    columns = COLUMNS[table]
+    money = columns.index(MONEY_COLUMNS[table])
+    cursor = db.get_connection().execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(columns)
+    total = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        rows = [row[:money] + (format_cents(row[money]),) + row[money + 1:] for row in rows]
+        if fmt == 'csv':
+            writer.writerows(rows)
+        else:
+            f.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+        total += len(rows)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export of inventory products and sales")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('table', choices=tuple(COLUMNS))
+    parser.add_argument('path', help="CSV or JSONL file, or - for stdin/stdout")
+    parser.add_argument('--format', choices=('csv', 'jsonl'))
+    parser.add_argument('--db', default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--add-quantity', action='store_true',
+                        help="add imported quantities to existing stock instead of replacing it")
+    args = parser.parse_args(argv)
+
+    db.configure(args.db)
+    db.setup_database()
+    fmt = detect_format(args.path, args.format)
+    start = time.perf_counter()
+
+    if args.action == 'import':
+        with open_input(args.path) as f:
+            records = read_records(f, fmt)
+            if args.table == 'products':
+                count = import_products(product_rows(records), args.batch_size, args.add_quantity)
+            else:
+                count = import_sales(sale_rows(records), args.batch_size)
+    else:
+        f = open_output(args.path)
+        try:
+            count = export_table(args.table, f, fmt)
+        finally:
+            if f is not sys.stdout:
+                f.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{args.action}ed {count} {args.table} rows in {elapsed:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
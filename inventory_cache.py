@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+# In-process cache of product rows, keyed by products.id, with a secondary
+# index from product name to id. Point-of-sale terminals look up the same
+# few hundred products over and over; a hit costs a dict lookup instead of
+# a SQLite query.
+#
+# inventory_db keeps it coherent. Its own writes invalidate the rows they
+# touch as soon as they commit. Writes from other connections (other
+# threads, other processes on the same inventory.db, bulk imports) are
+# noticed by polling PRAGMA data_version, which changes whenever another
+# connection commits; the product_changes table, kept by triggers, then
+# says which products changed so only those rows are dropped.
+#
+# A row read from the database is only stored if nothing was invalidated
+# while it was being read, so an old row can't land after the invalidation
+# that should have removed it.
+
+
+class ProductCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.path = None          # database the cached rows came from
+        self.seen = 0             # newest product_changes version applied
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._rows = OrderedDict()   # product id -> row, least recently used first
+        self._names = {}             # name -> product id
+        self._epoch = 0              # bumped by every invalidation
+        self._lock = threading.Lock()
+
+    def reset(self, path, seen):
+        # Empties the cache and its counters, for a newly opened database
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+            self._rows.clear()
+            self._names.clear()
+            self._epoch += 1
+            self.path = path
+            self.seen = seen
+
+    def get(self, product_id):
+        # Returns (row or None, epoch); pass the epoch to put() with the row
+        # read after a miss
+        with self._lock:
+            row = self._rows.get(product_id)
+            if row is None:
+                self.misses += 1
+                return None, self._epoch
+            self._rows.move_to_end(product_id)
+            self.hits += 1
+            return row, self._epoch
+
+    def get_id(self, name):
+        # Returns (product id or None, epoch)
+        with self._lock:
+            product_id = self._names.get(name)
+            if product_id is None:
+                self.misses += 1
+            return product_id, self._epoch
+
+    def put(self, row, epoch, named=False):
+        # row starts with (id, name, ...); named=True also indexes its name,
+        # for rows that were looked up by name
+        with self._lock:
+            if epoch != self._epoch or not self.maxsize:
+                return
+            self._rows[row[0]] = row
+            self._rows.move_to_end(row[0])
+            if named:
+                self._names[row[1]] = row[0]
+            while len(self._rows) > self.maxsize:
+                _, old = self._rows.popitem(last=False)
+                self._forget_name(old)
+                self.evictions += 1
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            self._epoch += 1
+            for product_id in product_ids:
+                row = self._rows.pop(product_id, None)
+                if row is not None:
+                    self._forget_name(row)
+                    self.invalidations += 1
+
+    def invalidate_name(self, name):
+        with self._lock:
+            self._epoch += 1
+            self._names.pop(name, None)
+
+    def apply(self, changes):
+        # changes: (product id, version) rows from product_changes
+        if not changes:
+            return
+        self.invalidate([product_id for product_id, _ in changes])
+        with self._lock:
+            self.seen = max(self.seen, max(version for _, version in changes))
+
+    def _forget_name(self, row):
+        if self._names.get(row[1]) == row[0]:
+            del self._names[row[1]]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._rows), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0, 'evictions': self.evictions,
+                    'invalidations': self.invalidations}
@@ -0,0 +1,786 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import auth
+from inventory_cache import ProductCache
+from metrics import timed
+from money import format_cents
+
+# Nothing touches the database at import time. The file is opened, and the
+# schema created and migrated, the first time a connection is needed.
+DB_PATH = os.environ.get('INVENTORY_DB', 'inventory.db')
+
+# One long-lived connection per thread; sqlite3 keeps a per-connection
+# cache of prepared statements, so reusing the connection reuses them too.
+_local = threading.local()
+_connections = {}   # thread ident -> connection, so other threads can interrupt them
+_connections_lock = threading.Lock()
+_initialized = set()   # database paths whose schema is known to be current
+
+# Reorder point given to products that don't set their own
+DEFAULT_REORDER_POINT = 5
+
+# Products kept in the in-process cache; 0 turns the cache off
+PRODUCT_CACHE_SIZE = int(os.environ.get('PRODUCT_CACHE_SIZE', 4096))
+# Seconds between checks for writes by other connections, so a cached row
+# can be this much behind another process's write (this process's own
+# writes invalidate it at once)
+PRODUCT_CACHE_POLL = 0.05
+product_cache = ProductCache(PRODUCT_CACHE_SIZE)
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or DB_PATH, timeout=5.0, cached_statements=256,
+                           check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def configure(path):
+    global DB_PATH
+    DB_PATH = path
+
+
+def get_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path != DB_PATH:
+        close_connection()  # DB_PATH was changed; don't keep using the old file
+        conn = None
+    if conn is None:
+        path = DB_PATH
+        conn = connect(path)
+        _local.conn, _local.path = conn, path
+        _local.data_version = None
+        _local.next_poll = 0.0
+        if path not in _initialized:
+            _create_schema(conn)
+            _initialized.add(path)
+        with _connections_lock:
+            # Drop connections left behind by threads that have exited
+            alive = {thread.ident for thread in threading.enumerate()}
+            for ident in [ident for ident in _connections if ident not in alive]:
+                _connections.pop(ident).close()
+            _connections[threading.get_ident()] = conn
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        with _connections_lock:
+            _connections.pop(threading.get_ident(), None)
+        conn.close()
+        _local.conn = None
+
+
+def interrupt_all():
+    # Abort whatever query each open connection is running
+    with _connections_lock:
+        for conn in _connections.values():
+            conn.interrupt()
+
+
+# Setup the database. Called automatically on first use; calling it
+# explicitly just opens the connection early.
+def setup_database():
+    get_connection()
+
+
+def _create_schema(conn):
+    c = conn.cursor()
+
+    # Create products table
+    c.execute('''CREATE TABLE IF NOT EXISTS products (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 name TEXT NOT NULL,
+                 quantity INTEGER NOT NULL,
+                 price REAL NOT NULL)''')
+
+    # Create users table
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 username TEXT NOT NULL UNIQUE,
+                 password TEXT NOT NULL)''')
+
+    # Create sales table
+    c.execute('''CREATE TABLE IF NOT EXISTS sales (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 product_id INTEGER,
+                 quantity INTEGER,
+                 total_price REAL,
+                 date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                 FOREIGN KEY (product_id) REFERENCES products (id))''')
+
+    conn.commit()
+    migrate(conn)
+
+
+# Recomputes the sales rollups from the raw sales table
+ROLLUP_BACKFILL = (
+    "DELETE FROM product_sales_totals",
+    "DELETE FROM daily_product_sales",
+    "INSERT INTO product_sales_totals (product_id, units, revenue) "
+    "SELECT product_id, SUM(quantity), SUM(total_price) FROM sales GROUP BY product_id",
+    "INSERT INTO daily_product_sales (product_id, day, units, revenue) "
+    "SELECT product_id, date(date), SUM(quantity), SUM(total_price) FROM sales "
+    "GROUP BY product_id, date(date)",
+)
+
+
+# Keep the sales rollups in step with every insert, update and delete
+SALES_ROLLUP_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS sales_rollup_insert AFTER INSERT ON sales BEGIN
+       INSERT INTO product_sales_totals (product_id, units, revenue)
+       VALUES (NEW.product_id, NEW.quantity, NEW.total_price)
+       ON CONFLICT (product_id) DO UPDATE SET units = units + excluded.units,
+                                              revenue = revenue + excluded.revenue;
+       INSERT INTO daily_product_sales (product_id, day, units, revenue)
+       VALUES (NEW.product_id, date(NEW.date), NEW.quantity, NEW.total_price)
+       ON CONFLICT (product_id, day) DO UPDATE SET units = units + excluded.units,
+                                                   revenue = revenue + excluded.revenue;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS sales_rollup_delete AFTER DELETE ON sales BEGIN
+       UPDATE product_sales_totals SET units = units - OLD.quantity, revenue = revenue - OLD.total_price
+       WHERE product_id = OLD.product_id;
+       UPDATE daily_product_sales SET units = units - OLD.quantity, revenue = revenue - OLD.total_price
+       WHERE product_id = OLD.product_id AND day = date(OLD.date);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS sales_rollup_update
+       AFTER UPDATE OF product_id, quantity, total_price, date ON sales BEGIN
+       UPDATE product_sales_totals SET units = units - OLD.quantity, revenue = revenue - OLD.total_price
+       WHERE product_id = OLD.product_id;
+       UPDATE daily_product_sales SET units = units - OLD.quantity, revenue = revenue - OLD.total_price
+       WHERE product_id = OLD.product_id AND day = date(OLD.date);
+       INSERT INTO product_sales_totals (product_id, units, revenue)
+       VALUES (NEW.product_id, NEW.quantity, NEW.total_price)
+       ON CONFLICT (product_id) DO UPDATE SET units = units + excluded.units,
+                                              revenue = revenue + excluded.revenue;
+       INSERT INTO daily_product_sales (product_id, day, units, revenue)
+       VALUES (NEW.product_id, date(NEW.date), NEW.quantity, NEW.total_price)
+       ON CONFLICT (product_id, day) DO UPDATE SET units = units + excluded.units,
+                                                   revenue = revenue + excluded.revenue;
+       END''',
+)
+
+
+# Low stock alerts. A product is low when its quantity drops below its own
+# reorder point; these triggers keep one stock_alerts row per low product,
+# raised and cleared by whatever statement changes the quantity, so reports
+# and notifiers never have to scan the products table.
+STOCK_ALERT_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS stock_alert_insert AFTER INSERT ON products
+       WHEN NEW.quantity < NEW.reorder_point BEGIN
+       INSERT INTO stock_alerts (product_id, quantity, reorder_point)
+       VALUES (NEW.id, NEW.quantity, NEW.reorder_point);
+       END''',
+    # A product that is already low keeps its alert (and its notified
+    # state); only the figures are brought up to date
+    '''CREATE TRIGGER IF NOT EXISTS stock_alert_raise AFTER UPDATE OF quantity, reorder_point ON products
+       WHEN NEW.quantity < NEW.reorder_point BEGIN
+       INSERT INTO stock_alerts (product_id, quantity, reorder_point)
+       VALUES (NEW.id, NEW.quantity, NEW.reorder_point)
+       ON CONFLICT (product_id) DO UPDATE SET quantity = excluded.quantity,
+                                              reorder_point = excluded.reorder_point;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS stock_alert_clear AFTER UPDATE OF quantity, reorder_point ON products
+       WHEN NEW.quantity >= NEW.reorder_point AND OLD.quantity < OLD.reorder_point BEGIN
+       DELETE FROM stock_alerts WHERE product_id = NEW.id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS stock_alert_delete AFTER DELETE ON products BEGIN
+       DELETE FROM stock_alerts WHERE product_id = OLD.id;
+       END''',
+)
+
+
+# Every change to a product bumps its row here to a new, highest version,
+# so other connections can tell which products changed since they last
+# looked (one row per product, whatever the number of writes)
+PRODUCT_CHANGE_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS product_changes_update AFTER UPDATE ON products BEGIN
+       INSERT INTO product_changes (product_id, version)
+       VALUES (OLD.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM product_changes))
+       ON CONFLICT (product_id) DO UPDATE SET version = excluded.version;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_changes_delete AFTER DELETE ON products BEGIN
+       INSERT INTO product_changes (product_id, version)
+       VALUES (OLD.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM product_changes))
+       ON CONFLICT (product_id) DO UPDATE SET version = excluded.version;
+       END''',
+)
+
+
+# Longest word prefix product_search indexes
+SEARCH_PREFIX_LENGTH = 6
+
+# Full-text index of product names for search (see inventory_search). It
+# stores only the index and reads names from products, and these triggers
+# keep it in step with every insert, rename and delete.
+PRODUCT_SEARCH_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS product_search_insert AFTER INSERT ON products BEGIN
+       INSERT INTO product_search (rowid, name) VALUES (NEW.id, NEW.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_search_delete AFTER DELETE ON products BEGIN
+       INSERT INTO product_search (product_search, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS product_search_rename AFTER UPDATE OF name ON products BEGIN
+       INSERT INTO product_search (product_search, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+       INSERT INTO product_search (rowid, name) VALUES (NEW.id, NEW.name);
+       END''',
+)
+
+
+# Schema migrations, applied in order on top of the tables created above.
+# The last applied version is stored in the database's user_version, so
+# each step runs exactly once per database file.
+MIGRATIONS = [
+    (1, (
+        # Covers the sales summary join and per-product history lookups
+        "CREATE INDEX IF NOT EXISTS idx_sales_product_date "
+        "ON sales (product_id, date, quantity, total_price)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (date)",
+        # Low stock report range scan
+        "CREATE INDEX IF NOT EXISTS idx_products_quantity ON products (quantity)",
+    )),
+    (2, (
+        # Sales rollups for the summary screen, kept current by triggers so
+        # every writer (GUI, imports, other terminals) updates them in the
+        # same transaction as the sale itself
+        '''CREATE TABLE IF NOT EXISTS product_sales_totals (
+           product_id INTEGER PRIMARY KEY,
+           units INTEGER NOT NULL DEFAULT 0,
+           revenue REAL NOT NULL DEFAULT 0)''',
+        '''CREATE TABLE IF NOT EXISTS daily_product_sales (
+           id INTEGER PRIMARY KEY,
+           product_id INTEGER NOT NULL,
+           day TEXT NOT NULL,
+           units INTEGER NOT NULL DEFAULT 0,
+           revenue REAL NOT NULL DEFAULT 0,
+           UNIQUE (product_id, day))''',
+        "CREATE INDEX IF NOT EXISTS idx_daily_product_sales_day ON daily_product_sales (day)",
+    ) + SALES_ROLLUP_TRIGGERS + ROLLUP_BACKFILL),
+    (3, (
+        # Name lookups for bulk upserts
+        "CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)",
+    )),
+    (4, (
+        # Money is stored as integer cents instead of REAL. SQLite can't
+        # change a column's type, so the tables are rebuilt and refilled.
+        '''CREATE TABLE products_new (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           name TEXT NOT NULL,
+           quantity INTEGER NOT NULL,
+           price INTEGER NOT NULL)''',
+        "INSERT INTO products_new (id, name, quantity, price) "
+        "SELECT id, name, quantity, CAST(ROUND(price * 100) AS INTEGER) FROM products",
+        "DROP TABLE products",
+        "ALTER TABLE products_new RENAME TO products",
+        "CREATE INDEX idx_products_quantity ON products (quantity)",
+        "CREATE INDEX idx_products_name ON products (name)",
+        '''CREATE TABLE sales_new (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           product_id INTEGER,
+           quantity INTEGER,
+           total_price INTEGER,
+           date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           FOREIGN KEY (product_id) REFERENCES products (id))''',
+        "INSERT INTO sales_new (id, product_id, quantity, total_price, date) "
+        "SELECT id, product_id, quantity, CAST(ROUND(total_price * 100) AS INTEGER), date FROM sales",
+        "DROP TABLE sales",
+        "ALTER TABLE sales_new RENAME TO sales",
+        "CREATE INDEX idx_sales_product_date ON sales (product_id, date, quantity, total_price)",
+        "CREATE INDEX idx_sales_date ON sales (date)",
+        "DROP TABLE product_sales_totals",
+        "DROP TABLE daily_product_sales",
+        '''CREATE TABLE product_sales_totals (
+           product_id INTEGER PRIMARY KEY,
+           units INTEGER NOT NULL DEFAULT 0,
+           revenue INTEGER NOT NULL DEFAULT 0)''',
+        '''CREATE TABLE daily_product_sales (
+           id INTEGER PRIMARY KEY,
+           product_id INTEGER NOT NULL,
+           day TEXT NOT NULL,
+           units INTEGER NOT NULL DEFAULT 0,
+           revenue INTEGER NOT NULL DEFAULT 0,
+           UNIQUE (product_id, day))''',
+        "CREATE INDEX idx_daily_product_sales_day ON daily_product_sales (day)",
+    ) + SALES_ROLLUP_TRIGGERS + ROLLUP_BACKFILL),
+    (5, (
+        # Per-product reorder points replace the fixed low stock threshold
+        f"ALTER TABLE products ADD COLUMN reorder_point INTEGER NOT NULL DEFAULT {DEFAULT_REORDER_POINT}",
+        '''CREATE TABLE stock_alerts (
+           product_id INTEGER PRIMARY KEY,
+           quantity INTEGER NOT NULL,
+           reorder_point INTEGER NOT NULL,
+           raised TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           notified TIMESTAMP)''',
+        # Alerts no notifier has picked up yet, oldest first
+        "CREATE INDEX idx_stock_alerts_pending ON stock_alerts (raised) WHERE notified IS NULL",
+        "INSERT INTO stock_alerts (product_id, quantity, reorder_point) "
+        "SELECT id, quantity, reorder_point FROM products WHERE quantity < reorder_point",
+    ) + STOCK_ALERT_TRIGGERS),
+    (6, (
+        # Date range aggregation (hourly analytics) reads only the index
+        "DROP INDEX IF EXISTS idx_sales_date",
+        "CREATE INDEX idx_sales_date ON sales (date, product_id, quantity, total_price)",
+        # Same for date ranges answered from the daily rollup
+        "DROP INDEX IF EXISTS idx_daily_product_sales_day",
+        "CREATE INDEX idx_daily_product_sales_day ON daily_product_sales (day, product_id, units, revenue)",
+    )),
+    (7, (
+        # Change log for the product cache
+        '''CREATE TABLE product_changes (
+           product_id INTEGER PRIMARY KEY,
+           version INTEGER NOT NULL)''',
+        "CREATE INDEX idx_product_changes_version ON product_changes (version)",
+    ) + PRODUCT_CHANGE_TRIGGERS),
+    (8, (
+        # Word index of product names. The prefix indexes answer the
+        # beginnings of words typed into a search box; without them "b"*
+        # merges the entries of every word starting with b.
+        "CREATE VIRTUAL TABLE product_search USING fts5(name, content='products', content_rowid='id', "
+        f"prefix='{' '.join(str(n) for n in range(1, SEARCH_PREFIX_LENGTH + 1))}')",
+        "INSERT INTO product_search (product_search) VALUES ('rebuild')",
+        # Its distinct words, for typo correction
+        "CREATE VIRTUAL TABLE product_search_vocab USING fts5vocab(product_search, 'row')",
+    ) + PRODUCT_SEARCH_TRIGGERS),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    for version, statements in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the lock
+            if version <= schema_version(conn):
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+    return schema_version(conn)
+
+
+def rebuild_rollups():
+    conn = get_connection()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for statement in ROLLUP_BACKFILL:
+            conn.execute(statement)
+
+
+def check_rollups():
+    # Compares the rollups with a fresh aggregation of the raw sales table
+    # and returns a list of (table, key, expected, actual) mismatches
+    conn = get_connection()
+    mismatches = []
+    checks = [
+        ('product_sales_totals',
+         "SELECT product_id, SUM(quantity), SUM(total_price) FROM sales GROUP BY product_id",
+         "SELECT product_id, units, revenue FROM product_sales_totals"),
+        ('daily_product_sales',
+         "SELECT product_id || ' ' || date(date), SUM(quantity), SUM(total_price) "
+         "FROM sales GROUP BY product_id, date(date)",
+         "SELECT product_id || ' ' || day, units, revenue FROM daily_product_sales"),
+    ]
+    with conn:
+        # One read transaction so both sides see the same snapshot
+        conn.execute("BEGIN")
+        for table, raw_sql, rollup_sql in checks:
+            expected = {key: (units, revenue) for key, units, revenue in conn.execute(raw_sql)}
+            actual = {key: (units, revenue) for key, units, revenue in conn.execute(rollup_sql)
+                      if units or revenue}
+            for key in expected.keys() | actual.keys():
+                want = expected.get(key, (0, 0))
+                got = actual.get(key, (0, 0))
+                if want != got:
+                    mismatches.append((table, key, want, got))
+    return mismatches
+
+
+# User authentication functions
+hash_password = auth.hash_password
+
+_verified = auth.VerifiedCache()
+
+
+@timed('inventory.register_user')
+def register_user(username, password):
+    hashed = auth.hash_password_async(password).result()
+    conn = get_connection()
+    try:
+        with conn:
+            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)",
+                         (username, hashed))
+    except sqlite3.IntegrityError:
+        return False  # Username already exists
+    return True
+
+
+def has_users():
+    return get_connection().execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None
+
+
+# Mostly password hashing, so counted as core rather than SQLite time
+@timed('inventory.authenticate_user')
+def authenticate_user(username, password):
+    conn = get_connection()
+    row = conn.execute("SELECT password FROM users WHERE username=?", (username,)).fetchone()
+    if not row:
+        return False
+    stored = row[0]
+    if _verified.check(username, password, stored):
+        return True
+    if not auth.verify_password_async(password, stored).result():
+        return False
+
+    if auth.needs_rehash(stored):
+        # Upgrade legacy SHA-256 (or cheaper) hashes now that we know the password
+        upgraded = auth.hash_password_async(password).result()
+        with conn:
+            conn.execute("UPDATE users SET password=? WHERE username=? AND password=?",
+                         (upgraded, username, stored))
+        stored = upgraded
+    _verified.add(username, password, stored)
+    return True
+
+
+# Product and sales queries. Prices and totals are integer cents.
+@timed('inventory.add_product', 'sqlite')
+def add_product(name, quantity, price, reorder_point=None):
+    conn = get_connection()
+    if reorder_point is None:
+        reorder_point = DEFAULT_REORDER_POINT
+    with conn:
+        cur = conn.execute("INSERT INTO products (name, quantity, price, reorder_point) VALUES (?, ?, ?, ?)",
+                           (name, quantity, price, reorder_point))
+    product_cache.invalidate_name(name)
+    return cur.lastrowid
+
+
+@timed('inventory.update_product', 'sqlite')
+def update_product(product_id, quantity, price, reorder_point=None):
+    # A reorder_point of None keeps the product's current one
+    conn = get_connection()
+    with conn:
+        cur = conn.execute("UPDATE products SET quantity=?, price=?, reorder_point=COALESCE(?, reorder_point) "
+                           "WHERE id=?", (quantity, price, reorder_point, product_id))
+    product_cache.invalidate((product_id,))
+    return cur.rowcount > 0
+
+
+@timed('inventory.delete_product', 'sqlite')
+def delete_product(product_id):
+    conn = get_connection()
+    with conn:
+        cur = conn.execute("DELETE FROM products WHERE id=?", (product_id,))
+    product_cache.invalidate((product_id,))
+    return cur.rowcount > 0
+
+
+def record_sale(product_id, quantity_sold):
+    # Returns None on success, otherwise an error message for the caller
+    return record_sales([(product_id, quantity_sold)])
+
+
+@timed('inventory.record_sales', 'sqlite')
+def record_sales(items):
+    # Sell a whole basket of (product_id, quantity) lines atomically: either
+    # every line has enough stock and is recorded, or nothing changes.
+    basket = {}
+    for product_id, quantity in items:
+        if quantity <= 0:
+            return "Invalid quantity"
+        basket[product_id] = basket.get(product_id, 0) + quantity
+    if not basket:
+        return None
+
+    conn = get_connection()
+    with conn:
+        # Take the write lock up front so two terminals can't interleave
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.executemany(
+            "UPDATE products SET quantity = quantity - ? WHERE id = ? AND quantity >= ?",
+            [(quantity, product_id, quantity) for product_id, quantity in basket.items()])
+        if cur.rowcount != len(basket):
+            conn.rollback()
+            return _sale_error(conn, basket)
+        conn.executemany(
+            "INSERT INTO sales (product_id, quantity, total_price) "
+            "SELECT id, ?, ? * price FROM products WHERE id = ?",
+            [(quantity, quantity, product_id) for product_id, quantity in basket.items()])
+    product_cache.invalidate(basket)
+    return None
+
+
+def _sale_error(conn, basket):
+    for product_id, quantity in basket.items():
+        row = conn.execute("SELECT quantity FROM products WHERE id=?", (product_id,)).fetchone()
+        if not row:
+            return "Product not found"
+        if row[0] < quantity:
+            return "Insufficient stock"
+    return "Sale could not be recorded"
+
+
+# Product lookups by id and by name, read through product_cache. Rows are
+# (id, name, quantity, price, reorder_point); names are matched exactly and
+# the oldest product wins if several share one.
+PRODUCT_BY_ID = "SELECT id, name, quantity, price, reorder_point FROM products WHERE id = ?"
+PRODUCT_BY_NAME = ("SELECT id, name, quantity, price, reorder_point FROM products "
+                   "WHERE name = ? ORDER BY id LIMIT 1")
+
+
+def _sync_cache(conn):
+    # Drops cached products that other connections have changed. data_version
+    # only moves when another connection commits, so a check is usually one
+    # PRAGMA; the change log is read only after something was written.
+    now = time.monotonic()
+    if now < _local.next_poll and product_cache.path == _local.path:
+        return
+    _local.next_poll = now + PRODUCT_CACHE_POLL
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if version == _local.data_version and product_cache.path == _local.path:
+        return
+    _local.data_version = version
+    if product_cache.path != _local.path:
+        latest = conn.execute("SELECT MAX(version) FROM product_changes").fetchone()[0]
+        product_cache.reset(_local.path, latest or 0)
+    else:
+        product_cache.apply(conn.execute("SELECT product_id, version FROM product_changes WHERE version > ?",
+                                         (product_cache.seen,)).fetchall())
+
+
+@timed('inventory.get_product', 'sqlite')
+def get_product(product_id):
+    # Returns the product row, or None if there is no such product
+    conn = get_connection()
+    _sync_cache(conn)
+    row, epoch = product_cache.get(product_id)
+    if row is None:
+        row = conn.execute(PRODUCT_BY_ID, (product_id,)).fetchone()
+        if row is not None:
+            product_cache.put(row, epoch)
+    return row
+
+
+@timed('inventory.product_by_name', 'sqlite')
+def product_by_name(name):
+    conn = get_connection()
+    _sync_cache(conn)
+    product_id, epoch = product_cache.get_id(name)
+    if product_id is not None:
+        row, epoch = product_cache.get(product_id)
+        if row is not None and row[1] == name:
+            return row
+    row = conn.execute(PRODUCT_BY_NAME, (name,)).fetchone()
+    if row is not None:
+        product_cache.put(row, epoch, named=True)
+    return row
+
+
+def search_terms(text):
+    # (word, prefix) for each word of text, split and lowercased as
+    # product_search indexes them; prefix says whether the word may match
+    # the beginning of a longer one. Words longer than the prefix indexes
+    # must match whole, unless they are still being typed (last, with no
+    # space after): a prefix the indexes don't cover merges every word it
+    # starts, which costs more than the rest of the search.
+    words = re.findall(r'[^\W_]+', text.lower())
+    typing = not text[-1:].isspace()
+    return [(word, len(word) <= SEARCH_PREFIX_LENGTH or typing and i == len(words) - 1)
+            for i, word in enumerate(words)]
+
+
+def prefix_query(text):
+    # FTS5 query for product_search matching names with a word starting
+    # with each word of text, in any order: "ext cab" -> "ext"* AND "cab"*.
+    # None if text has no words.
+    terms = (f'"{word}"' + ('*' if prefix else '') for word, prefix in search_terms(text))
+    return ' AND '.join(dict.fromkeys(terms)) or None
+
+
+def list_products():
+    return get_connection().execute("SELECT * FROM products").fetchall()
+
+
+def low_stock_products():
+    return get_connection().execute(
+        "SELECT p.* FROM stock_alerts a JOIN products p ON p.id = a.product_id").fetchall()
+
+
+# Pending alerts with a suggested order that brings the stock back up to
+# twice the reorder point
+PENDING_ALERTS = (
+    "SELECT p.id, p.name, p.quantity, p.reorder_point, MAX(2 * p.reorder_point - p.quantity, 0), a.raised "
+    "FROM stock_alerts a JOIN products p ON p.id = a.product_id "
+    "WHERE a.notified IS NULL ORDER BY a.raised, a.product_id")
+
+
+@timed('inventory.pending_alerts', 'sqlite')
+def pending_alerts():
+    # Returns (id, name, quantity, reorder_point, order_quantity, raised) rows
+    return get_connection().execute(PENDING_ALERTS).fetchall()
+
+
+@timed('inventory.take_alerts', 'sqlite')
+def take_alerts():
+    # Returns the pending alerts and marks them notified in the same
+    # transaction, so two notifiers never report the same alert. A product
+    # is alerted again only after it has been restocked and runs low again.
+    conn = get_connection()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(PENDING_ALERTS).fetchall()
+        conn.executemany("UPDATE stock_alerts SET notified = CURRENT_TIMESTAMP WHERE product_id = ?",
+                         [(row[0],) for row in rows])
+    return rows
+
+
+def list_sales():
+    return get_connection().execute(
+        "SELECT p.name, s.quantity, s.total_price, s.date "
+        "FROM sales s JOIN products p ON s.product_id = p.id").fetchall()
+
+
+# Keyset-paginated queries for the report screens. Instead of OFFSET, each
+# page continues after the (sort value, key) of the last row already shown,
+# so fetching page 1000 costs the same as fetching page 1.
+class PagedQuery:
+    def __init__(self, source, columns, key, name_column, where='', params=(), show_key=True,
+                 money=(), search_column=None):
+        self.source = source
+        self.columns = columns          # list of (heading, SQL expression)
+        self.key = key                  # unique column used as a tie-breaker
+        self.name_column = name_column
+        # Product id column; if set, name filters go through product_search
+        # (word prefixes) instead of a LIKE scan (substrings)
+        self.search_column = search_column
+        self.where = where
+        self.params = tuple(params)
+        self.headings = [heading for heading, _ in columns]
+        self.exprs = dict(columns)
+        self.visible_headings = [h for h in self.headings if show_key or h != key]
+        # Columns holding integer cents, shown as "12.34"
+        self.money_indexes = [self.headings.index(heading) for heading in money]
+
+    @timed('inventory.fetch_report', 'sqlite')
+    def fetch(self, after=None, limit=200, sort=None, descending=False, name_filter=''):
+        # Returns (rows, cursor); pass cursor back as `after` for the next page
+        sort = sort or self.key
+        sql, params = self.sql(after, limit, sort, descending, name_filter)
+        rows = get_connection().execute(sql, params).fetchall()
+
+        cursor = None
+        if rows:
+            last = rows[-1]
+            cursor = (last[self.headings.index(sort)], last[self.headings.index(self.key)])
+        if self.money_indexes:
+            rows = [self._format_money(row) for row in rows]
+        return rows, cursor
+
+    def sql(self, after=None, limit=200, sort=None, descending=False, name_filter=''):
+        # The (sql, params) fetch runs for one page
+        sort = sort or self.key
+        sort_expr = self.exprs[sort]
+        key_expr = self.exprs[self.key]
+        conditions = [self.where] if self.where else []
+        params = list(self.params)
+        if name_filter and self.search_column:
+            match = prefix_query(name_filter)
+            if match:
+                conditions.append(f"{self.search_column} IN "
+                                  "(SELECT rowid FROM product_search WHERE product_search MATCH ?)")
+                params.append(match)
+        elif name_filter:
+            escaped = name_filter.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append(f"{self.name_column} LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if after is not None:
+            if (not isinstance(after, (list, tuple)) or len(after) != 2
+                    or not all(value is None or isinstance(value, (int, float, str)) for value in after)):
+                raise ValueError("Cursor must be a [sort value, key] pair")
+            conditions.append(f"({sort_expr}, {key_expr}) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+
+        order = 'DESC' if descending else 'ASC'
+        sql = (f"SELECT {', '.join(self.exprs.values())} FROM {self.source}"
+               + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+               + f" ORDER BY {sort_expr} {order}, {key_expr} {order} LIMIT ?")
+        params.append(limit)
+        return sql, params
+
+    def _format_money(self, row):
+        row = list(row)
+        for i in self.money_indexes:
+            if row[i] is not None:
+                row[i] = format_cents(row[i])
+        return row
+
+
+PRODUCT_COLUMNS = [('ID', 'id'), ('Name', 'name'), ('Quantity', 'quantity'), ('Price', 'price')]
+
+
+def products_query():
+    return PagedQuery('products', PRODUCT_COLUMNS, 'ID', 'name', money=('Price',), search_column='id')
+
+
+def low_stock_query():
+    return PagedQuery('stock_alerts a JOIN products p ON p.id = a.product_id',
+                      [('ID', 'p.id'), ('Name', 'p.name'), ('Quantity', 'p.quantity'),
+                       ('Reorder Point', 'p.reorder_point'), ('Price', 'p.price'), ('Low Since', 'a.raised')],
+                      'ID', 'p.name', money=('Price',))
+
+
+def sales_query():
+    return PagedQuery('sales s JOIN products p ON s.product_id = p.id',
+                      [('Sale ID', 's.id'), ('Product', 'p.name'), ('Quantity Sold', 's.quantity'),
+                       ('Total Price', 's.total_price'), ('Date', 's.date')],
+                      'Sale ID', 'p.name', money=('Total Price',))
+
+
+def product_sales_query():
+    return PagedQuery('product_sales_totals t JOIN products p ON t.product_id = p.id',
+                      [('ID', 'p.id'), ('Product', 'p.name'), ('Units Sold', 't.units'),
+                       ('Revenue', 't.revenue')],
+                      'ID', 'p.name', money=('Revenue',))
+
+
+def daily_sales_query():
+    return PagedQuery('daily_product_sales d JOIN products p ON d.product_id = p.id',
+                      [('Row', 'd.id'), ('Day', 'd.day'), ('Product', 'p.name'),
+                       ('Units Sold', 'd.units'), ('Revenue', 'd.revenue')],
+                      'Row', 'p.name', show_key=False, money=('Revenue',))
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python inventory_db.py [rebuild-rollups | check-rollups]
+    setup_database()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check-rollups'
+    if command == 'rebuild-rollups':
+        rebuild_rollups()
+        print("Sales rollups rebuilt from the sales table")
+    mismatches = check_rollups()
+    for table, key, expected, actual in mismatches:
+        print(f"{table} {key}: expected {expected}, found {actual}")
+    print(f"{len(mismatches)} rollup mismatches")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,633 @@
+import sqlite3
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox, ttk
+
+import metrics
+from inventory_service import InventoryService
+from money import Money
+from tk_screens import ScreenManager, clear
+
+# Runs database calls on a background thread so a slow query or a locked
+# database never freezes the window. Results are handed back to the Tk
+# thread by polling with root.after, since Tk itself is not thread-safe.
+class TaskRunner:
+    POLL_MS = 20
+
+    def __init__(self, root, on_cancel=None):
+        self.root = root
+        self.on_cancel = on_cancel
+        # A single worker keeps one long-lived connection and runs
+        # tasks in the order they were submitted
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inventory-db')
+        self.pending = []
+        self.polling = False
+
+        self.status = tk.Frame(root)
+        tk.Label(self.status, text="Working...").pack(side='left')
+        self.progress = ttk.Progressbar(self.status, mode='indeterminate', length=120)
+        self.progress.pack(side='left', padx=5)
+        tk.Button(self.status, text="Cancel", command=self.cancel).pack(side='left')
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_cancelled=None):
+        # on_cancelled runs when the task is cancelled before it starts or
+        # its query is interrupted, so callers can undo their own state
+        future = self.executor.submit(func, *args)
+        self.pending.append((future, getattr(func, '__name__', 'task'), on_done, on_error, on_cancelled))
+        if not self.polling:
+            self.polling = True
+            self.status.grid(row=100, column=0, columnspan=4, sticky='w')
+            self.progress.start()
+            self.root.after(self.POLL_MS, self.poll)
+        return future
+
+    def poll(self):
+        finished, waiting = [], []
+        for entry in self.pending:
+            (finished if entry[0].done() else waiting).append(entry)
+        self.pending = waiting
+
+        for future, name, on_done, on_error, on_cancelled in finished:
+            if future.cancelled():
+                if on_cancelled:
+                    on_cancelled()
+                continue
+            error = future.exception()
+            if error is None:
+                if on_done:
+                    # Time spent updating widgets with the result
+                    with metrics.measure(f"inventory.{name}", 'ui'):
+                        on_done(future.result())
+            elif isinstance(error, sqlite3.OperationalError) and 'interrupted' in str(error):
+                # Cancelled while the query was running
+                if on_cancelled:
+                    on_cancelled()
+            elif on_error:
+                on_error(error)
+            else:
+                messagebox.showerror("Error", str(error))
+
+        if self.pending:
+            self.root.after(self.POLL_MS, self.poll)
+        else:
+            self.polling = False
+            self.progress.stop()
+            self.status.grid_remove()
+
+    def cancel(self):
+        for future, *_ in self.pending:
+            future.cancel()
+        if self.on_cancel:
+            self.on_cancel()
+
+# Scrollable table that only loads the rows the user scrolls to. Sorting
+# and name filtering are done by the database, not on the loaded rows.
+class PagedTable(tk.Frame):
+    PAGE_SIZE = 200
+
+    def __init__(self, master, tasks, service, report, height=20, load=True):
+        super().__init__(master)
+        self.tasks = tasks
+        self.service = service
+        self.report = report
+        # Set by the first reload: through InventoryClient the column list
+        # is an HTTP round trip, so it is fetched by the task runner too
+        self.headings = None
+        self.sort = None
+        self.columns_loading = False
+        self.descending = False
+        self.cursor = None
+        self.exhausted = False
+        self.loading = False
+        self.generation = 0
+
+        tk.Label(self, text="Filter by name").grid(row=0, column=0, sticky='w')
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', lambda *args: self.reload())
+        tk.Entry(self, textvariable=self.filter_var).grid(row=0, column=1, sticky='we')
+
+        self.tree = ttk.Treeview(self, show='headings', height=height)
+        scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: self.on_scroll(scrollbar, first, last))
+        self.tree.grid(row=1, column=0, columnspan=2, sticky='nsew')
+        scrollbar.grid(row=1, column=2, sticky='ns')
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+
+        if load:
+            self.reload()
+
+    def set_columns(self, columns):
+        self.headings = columns['headings']
+        self.sort = columns['key']
+        self.tree.configure(columns=self.headings, displaycolumns=columns['visible'])
+        for heading in self.headings:
+            self.tree.heading(heading, text=heading, command=lambda h=heading: self.sort_by(h))
+            self.tree.column(heading, width=120)
+
+    def load_columns(self):
+        if self.columns_loading:
+            return
+        self.columns_loading = True
+
+        def show_columns(columns):
+            self.columns_loading = False
+            if not self.winfo_exists():
+                return
+            self.set_columns(columns)
+            self.reload()
+
+        def stopped():
+            # Cancelled or failed: the next reload asks again
+            self.columns_loading = False
+
+        def failed(error):
+            stopped()
+            messagebox.showerror("Error", str(error))
+
+        self.tasks.submit(self.service.report_columns, self.report,
+                          on_done=show_columns, on_error=failed, on_cancelled=stopped)
+
+    def sort_by(self, heading):
+        if heading == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = heading, False
+        self.reload()
+
+    def reload(self):
+        # Results of fetches started before this reload are discarded
+        self.generation += 1
+        self.tree.delete(*self.tree.get_children())
+        self.cursor = None
+        self.exhausted = False
+        self.loading = False
+        if self.headings is None:
+            # Loads the first page once the columns arrive
+            self.load_columns()
+            return
+        for heading in self.headings:
+            arrow = (' \u25bc' if self.descending else ' \u25b2') if heading == self.sort else ''
+            self.tree.heading(heading, text=heading + arrow)
+        self.load_more()
+
+    def load_more(self):
+        if self.exhausted or self.loading or self.headings is None:
+            return
+        self.loading = True
+        generation = self.generation
+
+        def show_page(result):
+            if generation != self.generation or not self.winfo_exists():
+                return
+            rows, cursor = result['rows'], result['next']
+            for row in rows:
+                self.tree.insert('', 'end', values=row)
+            self.cursor = cursor
+            self.exhausted = len(rows) < self.PAGE_SIZE
+            self.loading = False
+
+        def stopped():
+            # Cancelled or failed: scrolling may try this page again
+            if generation == self.generation:
+                self.loading = False
+
+        def failed(error):
+            stopped()
+            messagebox.showerror("Error", str(error))
+
+        self.tasks.submit(self.service.fetch_report, self.report, self.cursor, self.PAGE_SIZE,
+                          self.sort, self.descending, self.filter_var.get(),
+                          on_done=show_page, on_error=failed, on_cancelled=stopped)
+
+    def on_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        # Fetch the next page once the user is near the bottom of what's loaded
+        if float(last) > 0.9:
+            self.after_idle(self.load_more)
+
+# Autocomplete for product ID entries. Typing a name (anything that isn't a
+# number) lists matching products under the entry; Down then Return, or a
+# double click, puts the chosen product's ID in the entry.
+class ProductSearch:
+    DELAY_MS = 150     # search once typing pauses, not on every key
+    RESULTS = 8
+
+    def __init__(self, entry, tasks, service, on_choose=None):
+        self.entry = entry
+        self.tasks = tasks
+        self.service = service
+        self.on_choose = on_choose
+        self.products = []
+        self.pending = None
+        self.generation = 0
+
+        self.listbox = tk.Listbox(entry.master, width=50)
+        entry.bind('<KeyRelease>', self.on_key, add='+')
+        entry.bind('<Down>', self.focus_results, add='+')
+        entry.bind('<Escape>', lambda event: self.hide(), add='+')
+        entry.bind('<FocusOut>', self.on_focus_out, add='+')
+        self.listbox.bind('<Return>', self.choose)
+        self.listbox.bind('<Double-Button-1>', self.choose)
+        self.listbox.bind('<Escape>', lambda event: (self.hide(), entry.focus_set()))
+        self.listbox.bind('<FocusOut>', self.on_focus_out)
+
+    def on_key(self, event):
+        if event.keysym in ('Down', 'Up', 'Return', 'Escape', 'Tab'):
+            return
+        if self.pending is not None:
+            self.entry.after_cancel(self.pending)
+        self.pending = self.entry.after(self.DELAY_MS, self.search)
+
+    def search(self):
+        self.pending = None
+        text = self.entry.get().strip()
+        if len(text) < 2 or text.isdigit():
+            self.hide()
+            return
+        # Results of searches started before this one are discarded
+        self.generation += 1
+        generation = self.generation
+
+        def show(products):
+            if generation != self.generation or not self.entry.winfo_exists():
+                return
+            if not products:
+                self.hide()
+                return
+            self.products = products
+            self.listbox.delete(0, 'end')
+            for product in products:
+                self.listbox.insert('end', f"{product['id']}  {product['name']}  "
+                                           f"{product['price']}  ({product['quantity']} in stock)")
+            self.listbox.config(height=len(products))
+            self.listbox.place(in_=self.entry, relx=0, rely=1)
+            self.listbox.lift()
+
+        self.tasks.submit(self.service.search_products, text, self.RESULTS, on_done=show)
+
+    def focus_results(self, event=None):
+        if not self.listbox.winfo_ismapped():
+            return None
+        self.listbox.focus_set()
+        self.listbox.selection_clear(0, 'end')
+        self.listbox.selection_set(0)
+        self.listbox.activate(0)
+        return 'break'
+
+    def choose(self, event=None):
+        selected = self.listbox.curselection()
+        if not selected:
+            return
+        product = self.products[selected[0]]
+        self.entry.delete(0, 'end')
+        self.entry.insert(0, str(product['id']))
+        self.hide()
+        self.entry.focus_set()
+        if self.on_choose:
+            self.on_choose()
+
+    def on_focus_out(self, event=None):
+        # Focus moving from the entry to the list is not leaving
+        self.entry.after(200, self.hide_unless_focused)
+
+    def hide_unless_focused(self):
+        if self.entry.winfo_exists() and self.entry.focus_get() not in (self.entry, self.listbox):
+            self.hide()
+
+    def hide(self):
+        self.generation += 1
+        self.listbox.place_forget()
+
+# What was typed into a product ID entry, as (product or None, exact): the
+# product with that ID or exact name, or else the best search match, which
+# the caller should confirm before acting on. Runs on the task thread.
+def resolve_product(service, text):
+    text = text.strip()
+    if text.isdigit():
+        return service.get_product(int(text)), True
+    product = service.find_product(text)
+    if product is not None:
+        return product, True
+    matches = service.search_products(text, 1)
+    return (matches[0] if matches else None), False
+
+# GUI class
+class InventoryApp:
+    def __init__(self, root, service=None):
+        self.root = root
+        self.root.title("Inventory Management System")
+        self.current_user = None
+        # Either a local InventoryService or an InventoryClient for a server
+        self.service = service or InventoryService()
+        self.tasks = TaskRunner(root, on_cancel=self.service.interrupt)
+        
+        # Screens are built on first use and reused after that
+        self.screens = ScreenManager(root)
+        self.screens.container.grid(row=0, column=0, columnspan=4, sticky='nsew')
+        self.screens.add('login', self.build_login,
+                         lambda: clear(self.password_entry))
+        self.screens.add('main', self.build_main)
+        self.screens.add('add_product', self.build_add_product,
+                         lambda: clear(self.product_name_entry, self.quantity_entry, self.price_entry,
+                                       self.reorder_point_entry))
+        self.screens.add('edit_product', self.build_edit_product,
+                         lambda: (clear(self.product_id_entry, self.new_quantity_entry, self.new_price_entry,
+                                        self.new_reorder_point_entry),
+                                  self.edit_product_search.hide()))
+        self.screens.add('delete_product', self.build_delete_product,
+                         lambda: (clear(self.delete_product_id_entry), self.delete_product_search.hide()))
+        self.screens.add('inventory', self.build_view_inventory,
+                         lambda: self.inventory_table.reload())
+        self.screens.add('record_sale', self.build_record_sale,
+                         lambda: (clear(self.sale_product_id_entry, self.sale_quantity_entry),
+                                  self.sale_product_label.config(text=""), self.sale_product_search.hide()))
+        self.screens.add('low_stock', self.build_low_stock_report,
+                         lambda: self.low_stock_table.reload())
+        self.screens.add('sales_summary', self.build_sales_summary,
+                         self.refresh_sales_summary)
+        
+        self.login_screen()
+    
+    def login_screen(self):
+        self.screens.show('login')
+
+    def build_login(self, frame):
+        tk.Label(frame, text="Username").grid(row=0, column=0)
+        self.username_entry = tk.Entry(frame)
+        self.username_entry.grid(row=0, column=1)
+        
+        tk.Label(frame, text="Password").grid(row=1, column=0)
+        self.password_entry = tk.Entry(frame, show='*')
+        self.password_entry.grid(row=1, column=1)
+        
+        tk.Button(frame, text="Login", command=self.login).grid(row=2, column=0)
+        tk.Button(frame, text="Register", command=self.register).grid(row=2, column=1)
+    
+    def login(self):
+        username = self.username_entry.get()
+        password = self.password_entry.get()
+        
+        def done(authenticated):
+            if authenticated:
+                self.current_user = username
+                self.main_screen()
+            else:
+                messagebox.showerror("Error", "Invalid username or password")
+        
+        self.tasks.submit(self.service.authenticate_user, username, password, on_done=done)
+    
+    def register(self):
+        username = self.username_entry.get()
+        password = self.password_entry.get()
+        
+        def done(registered):
+            if registered:
+                messagebox.showinfo("Success", "User registered successfully")
+            else:
+                messagebox.showerror("Error", "Username already exists")
+        
+        self.tasks.submit(self.service.register_user, username, password, on_done=done)
+    
+    def main_screen(self):
+        self.screens.show('main')
+
+    def build_main(self, frame):
+        tk.Button(frame, text="Add Product", command=self.add_product_screen).grid(row=0, column=0)
+        tk.Button(frame, text="Edit Product", command=self.edit_product_screen).grid(row=0, column=1)
+        tk.Button(frame, text="Delete Product", command=self.delete_product_screen).grid(row=0, column=2)
+        tk.Button(frame, text="View Inventory", command=self.view_inventory_screen).grid(row=0, column=3)
+        tk.Button(frame, text="Record Sale", command=self.record_sale_screen).grid(row=1, column=0)
+        tk.Button(frame, text="Low Stock Report", command=self.low_stock_report).grid(row=1, column=1)
+        tk.Button(frame, text="Sales Summary", command=self.sales_summary).grid(row=1, column=2)
+    
+    def add_product_screen(self):
+        self.screens.show('add_product')
+
+    def build_add_product(self, frame):
+        tk.Label(frame, text="Product Name").grid(row=0, column=0)
+        self.product_name_entry = tk.Entry(frame)
+        self.product_name_entry.grid(row=0, column=1)
+        
+        tk.Label(frame, text="Quantity").grid(row=1, column=0)
+        self.quantity_entry = tk.Entry(frame)
+        self.quantity_entry.grid(row=1, column=1)
+        
+        tk.Label(frame, text="Price").grid(row=2, column=0)
+        self.price_entry = tk.Entry(frame)
+        self.price_entry.grid(row=2, column=1)
+        
+        tk.Label(frame, text="Reorder Point (optional)").grid(row=3, column=0)
+        self.reorder_point_entry = tk.Entry(frame)
+        self.reorder_point_entry.grid(row=3, column=1)
+        
+        tk.Button(frame, text="Add", command=self.add_product).grid(row=4, column=0, columnspan=2)
+    
+    def add_product(self):
+        name = self.product_name_entry.get()
+        quantity = self.quantity_entry.get()
+        price = self.price_entry.get()
+        reorder_point = self.reorder_point_entry.get()
+        
+        if not name or not quantity or not price:
+            messagebox.showerror("Error", "All fields are required")
+            return
+        
+        try:
+            quantity = int(quantity)
+            price = str(Money.parse(price))
+            reorder_point = int(reorder_point) if reorder_point else None
+        except ValueError:
+            messagebox.showerror("Error", "Invalid quantity, price or reorder point")
+            return
+        
+        self.tasks.submit(self.service.add_product, name, quantity, price, reorder_point, on_done=self.show_success("Product added successfully"))
+    
+    def edit_product_screen(self):
+        self.screens.show('edit_product')
+
+    def build_edit_product(self, frame):
+        tk.Label(frame, text="Product ID or name").grid(row=0, column=0)
+        self.product_id_entry = tk.Entry(frame)
+        self.product_id_entry.grid(row=0, column=1)
+        self.edit_product_search = ProductSearch(self.product_id_entry, self.tasks, self.service)
+        
+        tk.Label(frame, text="New Quantity").grid(row=1, column=0)
+        self.new_quantity_entry = tk.Entry(frame)
+        self.new_quantity_entry.grid(row=1, column=1)
+        
+        tk.Label(frame, text="New Price").grid(row=2, column=0)
+        self.new_price_entry = tk.Entry(frame)
+        self.new_price_entry.grid(row=2, column=1)
+        
+        tk.Label(frame, text="New Reorder Point (optional)").grid(row=3, column=0)
+        self.new_reorder_point_entry = tk.Entry(frame)
+        self.new_reorder_point_entry.grid(row=3, column=1)
+        
+        tk.Button(frame, text="Update", command=self.update_product).grid(row=4, column=0, columnspan=2)
+    
+    def update_product(self):
+        product_id = self.product_id_entry.get()
+        new_quantity = self.new_quantity_entry.get()
+        new_price = self.new_price_entry.get()
+        new_reorder_point = self.new_reorder_point_entry.get()
+        
+        if not product_id or not new_quantity or not new_price:
+            messagebox.showerror("Error", "All fields are required")
+            return
+        
+        try:
+            new_quantity = int(new_quantity)
+            new_price = str(Money.parse(new_price))
+            new_reorder_point = int(new_reorder_point) if new_reorder_point else None
+        except ValueError:
+            messagebox.showerror("Error", "Invalid quantity, price or reorder point")
+            return
+        
+        self.with_product(product_id, lambda product_id: self.tasks.submit(
+            self.service.update_product, product_id, new_quantity, new_price, new_reorder_point,
+            on_done=self.show_success("Product updated successfully")))
+    
+    def delete_product_screen(self):
+        self.screens.show('delete_product')
+
+    def build_delete_product(self, frame):
+        tk.Label(frame, text="Product ID or name").grid(row=0, column=0)
+        self.delete_product_id_entry = tk.Entry(frame)
+        self.delete_product_id_entry.grid(row=0, column=1)
+        self.delete_product_search = ProductSearch(self.delete_product_id_entry, self.tasks, self.service)
+        
+        tk.Button(frame, text="Delete", command=self.delete_product).grid(row=1, column=0, columnspan=2)
+    
+    def delete_product(self):
+        product_id = self.delete_product_id_entry.get()
+        
+        if not product_id:
+            messagebox.showerror("Error", "Product ID is required")
+            return
+        
+        self.with_product(product_id, lambda product_id: self.tasks.submit(
+            self.service.delete_product, product_id, on_done=self.show_success("Product deleted successfully")))
+    
+    def view_inventory_screen(self):
+        self.screens.show('inventory')
+
+    def build_view_inventory(self, frame):
+        self.inventory_table = PagedTable(frame, self.tasks, self.service, 'products', load=False)
+        self.inventory_table.grid(row=0, column=0, columnspan=4, sticky='nsew')
+        
+        tk.Button(frame, text="Back", command=self.main_screen).grid(row=1, column=0, columnspan=4)
+
+    def record_sale_screen(self):
+        self.screens.show('record_sale')
+
+    def build_record_sale(self, frame):
+        tk.Label(frame, text="Product ID or name").grid(row=0, column=0)
+        self.sale_product_id_entry = tk.Entry(frame)
+        self.sale_product_id_entry.grid(row=0, column=1)
+        
+        tk.Label(frame, text="Quantity Sold").grid(row=1, column=0)
+        self.sale_quantity_entry = tk.Entry(frame)
+        self.sale_quantity_entry.grid(row=1, column=1)
+        
+        tk.Button(frame, text="Record Sale", command=self.record_sale).grid(row=2, column=0, columnspan=2)
+        
+        # Shows the product once its ID is entered (scanners end with Return)
+        self.sale_product_label = tk.Label(frame, text="")
+        self.sale_product_label.grid(row=3, column=0, columnspan=2)
+        self.sale_product_id_entry.bind('<Return>', self.show_sale_product)
+        self.sale_product_id_entry.bind('<FocusOut>', self.show_sale_product)
+        self.sale_product_search = ProductSearch(self.sale_product_id_entry, self.tasks, self.service,
+                                                 on_choose=self.show_sale_product)
+    
+    def show_sale_product(self, event=None):
+        text = self.sale_product_id_entry.get().strip()
+        if not text:
+            self.sale_product_label.config(text="")
+            return
+        
+        def done(found):
+            product, _ = found
+            if product is None:
+                self.sale_product_label.config(text="No such product")
+            else:
+                self.sale_product_label.config(
+                    text=f"{product['name']}  {product['price']}  ({product['quantity']} in stock)")
+        
+        self.tasks.submit(resolve_product, self.service, text, on_done=done)
+    
+    def record_sale(self):
+        product_id = self.sale_product_id_entry.get()
+        quantity_sold = self.sale_quantity_entry.get()
+        
+        if not product_id or not quantity_sold:
+            messagebox.showerror("Error", "All fields are required")
+            return
+        
+        try:
+            quantity_sold = int(quantity_sold)
+        except ValueError:
+            messagebox.showerror("Error", "Invalid quantity")
+            return
+        
+        def done(error):
+            if error:
+                messagebox.showerror("Error", error)
+            else:
+                messagebox.showinfo("Success", "Sale recorded successfully")
+                self.main_screen()
+        
+        self.with_product(product_id, lambda product_id: self.tasks.submit(
+            self.service.record_sale, product_id, quantity_sold, on_done=done))
+    
+    def with_product(self, text, action):
+        # Calls action(product_id) for what was typed into a product ID
+        # entry. A name that isn't exact is only used once the user confirms
+        # the product it matched.
+        if text.strip().isdigit():
+            action(int(text))
+            return
+        
+        def resolved(found):
+            product, exact = found
+            if product is None:
+                messagebox.showerror("Error", f"No product matches \"{text.strip()}\"")
+            elif exact or messagebox.askyesno(
+                    "Confirm", f"Use {product['name']} (ID {product['id']})?"):
+                action(product['id'])
+        
+        self.tasks.submit(resolve_product, self.service, text, on_done=resolved)
+    
+    def show_success(self, message):
+        def done(result):
+            messagebox.showinfo("Success", message)
+            self.main_screen()
+        return done
+    
+    def low_stock_report(self):
+        self.screens.show('low_stock')
+
+    def build_low_stock_report(self, frame):
+        self.low_stock_table = PagedTable(frame, self.tasks, self.service, 'low_stock', load=False)
+        self.low_stock_table.grid(row=0, column=0, columnspan=4, sticky='nsew')
+        
+        tk.Button(frame, text="Back", command=self.main_screen).grid(row=1, column=0, columnspan=4)
+    
+    def sales_summary(self):
+        self.screens.show('sales_summary')
+
+    def build_sales_summary(self, frame):
+        # Read from the rollup tables rather than the raw sales history
+        tk.Label(frame, text="Sales by Product").grid(row=0, column=0, columnspan=4)
+        self.product_sales_table = PagedTable(frame, self.tasks, self.service, 'sales_by_product', height=10, load=False)
+        self.product_sales_table.grid(row=1, column=0, columnspan=4, sticky='nsew')
+        
+        tk.Label(frame, text="Sales by Day").grid(row=2, column=0, columnspan=4)
+        self.daily_sales_table = PagedTable(frame, self.tasks, self.service, 'sales_by_day', height=10, load=False)
+        self.daily_sales_table.grid(row=3, column=0, columnspan=4, sticky='nsew')
+        
+        tk.Button(frame, text="Back", command=self.main_screen).grid(row=4, column=0, columnspan=4)
+
+    def refresh_sales_summary(self):
+        self.product_sales_table.reload()
+        self.daily_sales_table.reload()
@@ -0,0 +1,191 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+
+import inventory_db as db
+from metrics import timed
+
+# Product search by name, for as-you-type lookups in large catalogs.
+#
+# Names are indexed word by word in the product_search FTS5 table, which
+# triggers keep in step with products (see inventory_db). A query matches
+# products having a word that starts with each word typed, in any order,
+# so "oak ch" finds "Oak Chair 40" (inventory_db.search_terms says which
+# long words must match whole). Matches are read in id order, which FTS5
+# produces without sorting, and the first CANDIDATES of them ranked here:
+# names starting with the text first, then shorter names. Asking FTS5 to
+# rank every match costs over 100 ms once a word matches tens of thousands
+# of products.
+#
+# When nothing matches, each word of 4 letters or more is checked against
+# the catalog's vocabulary for typos (one edit, two for words of 8 or more;
+# a swap of neighbours counts as one) and the query is run again with the
+# corrections.
+#
+#   search("oak ch")   -> [(id, name, quantity, price, reorder_point), ...]
+#   search("chiar")    -> the chairs
+
+CANDIDATES = 200           # matches ranked per query
+MIN_FUZZY_LENGTH = 4
+MAX_CORRECTIONS = 5        # per word
+CANDIDATE_WORDS = 50       # vocabulary words compared per word typed
+VOCABULARY_REFRESH = 60.0  # seconds before checking for new words
+
+SEARCH = ("SELECT p.id, p.name, p.quantity, p.price, p.reorder_point "
+          "FROM product_search s JOIN products p ON p.id = s.rowid "
+          "WHERE product_search MATCH ? ORDER BY s.rowid LIMIT ?")
+# Digits sort before letters, so this skips numeric words (sizes, model
+# numbers), which aren't corrected
+VOCABULARY = "SELECT term, doc FROM product_search_vocab WHERE term >= 'a'"
+
+
+@timed('inventory.search_products', 'sqlite')
+def search(text, limit=10):
+    # Returns up to limit (id, name, quantity, price, reorder_point) rows
+    match = db.prefix_query(text)
+    if not match:
+        return []
+    conn = db.get_connection()
+    rows = conn.execute(SEARCH, (match, CANDIDATES)).fetchall()
+    if not rows:
+        corrected = _corrected_query(conn, text)
+        if corrected:
+            rows = conn.execute(SEARCH, (corrected, CANDIDATES)).fetchall()
+    return _ranked(rows, text)[:limit]
+
+
+def _ranked(rows, text):
+    text = text.strip().lower()
+    return sorted(rows, key=lambda row: (not row[1].lower().startswith(text), len(row[1]), row[0]))
+
+
+def _corrected_query(conn, text):
+    # db.prefix_query(text) with each long enough word widened to its
+    # likely corrections, or None if no word has any
+    vocabulary.refresh(conn)
+    corrected = False
+    terms = []
+    for word, prefix in db.search_terms(text):
+        # A word that may be the beginning of one is compared with the
+        # beginnings of vocabulary words
+        alternatives = vocabulary.similar(word, prefix)
+        corrected = corrected or bool(alternatives)
+        terms.append(' OR '.join([f'"{word}"' + ('*' if prefix else '')]
+                                 + [f'"{alternative}"' for alternative in alternatives]))
+    if not corrected:
+        return None
+    return ' AND '.join(f"({term})" for term in dict.fromkeys(terms))
+
+
+def distance(word, candidate, limit, prefix=False):
+    # Edit distance (with swaps of neighbouring letters), or with prefix=True
+    # the distance to the nearest beginning of candidate. Stops early and
+    # returns limit + 1 once it must be over limit.
+    before, previous = None, list(range(len(candidate) + 1))
+    for i in range(1, len(word) + 1):
+        current = [i] + [0] * len(candidate)
+        for j in range(1, len(candidate) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (word[i - 1] != candidate[j - 1]))
+            if i > 1 and j > 1 and word[i - 1] == candidate[j - 2] and word[i - 2] == candidate[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous) if prefix else previous[-1]
+
+
+def _bigrams(word, prefix=False):
+    # Letter pairs, with the start (and unless prefix, the end) marked so
+    # the first and last letters count too. Short words share too few
+    # trigrams with their misspellings ("lmap" and "lamp" share none).
+    padded = '$' + word + ('' if prefix else '$')
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class Vocabulary:
+    # The catalog's distinct words, with a bigram index to find the ones
+    # that look like a misspelt word. Reading them from product_search_vocab
+    # counts through the whole index (over 100 ms for a large catalog), so
+    # only the first load is waited for; after that, every
+    # VOCABULARY_REFRESH seconds, a background thread reloads them if
+    # products have been added while the old words stay in use.
+    def __init__(self):
+        self.frequency = {}     # word -> number of products using it
+        self.words = []         # sorted, for prefix checks
+        self.bigrams = {}       # letter pair -> words containing it
+        self._source = None     # (database path, newest product id) loaded
+        self._checked = 0.0
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def refresh(self, conn):
+        path = db.DB_PATH
+        now = time.monotonic()
+        if self._source is None or self._source[0] != path:
+            with self._lock:
+                if self._source is None or self._source[0] != path:
+                    self._load(conn, path)
+            self._checked = now
+        elif now - self._checked >= VOCABULARY_REFRESH and not self._reloading:
+            self._checked = now
+            self._reloading = True
+            threading.Thread(target=self._reload, args=(path,), name='search-vocabulary', daemon=True).start()
+
+    def _reload(self, path):
+        conn = db.connect(path)
+        try:
+            with self._lock:
+                self._load(conn, path)
+        finally:
+            conn.close()
+            self._reloading = False
+
+    def _load(self, conn, path):
+        source = (path, conn.execute("SELECT MAX(id) FROM products").fetchone()[0])
+        if source == self._source:
+            return
+        frequency = dict(conn.execute(VOCABULARY))
+        bigrams = {}
+        for word in frequency:
+            for bigram in _bigrams(word):
+                bigrams.setdefault(bigram, []).append(word)
+        self.frequency, self.bigrams, self._source = frequency, bigrams, source
+        self.words = sorted(frequency)
+
+    def known(self, word, prefix=False):
+        # Whether word is in the catalog (or begins a word that is)
+        if not prefix:
+            return word in self.frequency
+        i = bisect.bisect_left(self.words, word)
+        return i < len(self.words) and self.words[i].startswith(word)
+
+    def similar(self, word, prefix=False):
+        # Up to MAX_CORRECTIONS words within the allowed distance of word,
+        # closest and most used first. With prefix=True, words that already
+        # start with it aren't returned; the prefix query finds those.
+        if len(word) < MIN_FUZZY_LENGTH or word.isdigit() or self.known(word, prefix):
+            return []
+        limit = 1 if len(word) < 8 else 2
+        bigrams, shared = _bigrams(word, prefix), Counter()
+        for bigram in bigrams:
+            shared.update(self.bigrams.get(bigram, ()))
+        # One edit changes at most three letter pairs (a swap does)
+        needed = len(bigrams) - 3 * limit
+        found = []
+        for candidate in heapq.nlargest(CANDIDATE_WORDS, shared, key=shared.get):
+            if shared[candidate] < needed or candidate == word:
+                continue
+            if prefix and candidate.startswith(word):
+                continue
+            if not prefix and abs(len(candidate) - len(word)) > limit:
+                continue
+            edits = distance(word, candidate, limit, prefix)
+            if edits <= limit:
+                found.append((edits, -self.frequency[candidate], candidate))
+        return [candidate for _, _, candidate in sorted(found)[:MAX_CORRECTIONS]]
+
+
+vocabulary = Vocabulary()
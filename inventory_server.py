@@ -0,0 +1,322 @@
+import argparse
+import http.client
+import json
+import select
+import sqlite3
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import metrics
+from inventory_service import InventoryService
+
+# Local HTTP/JSON front end for InventoryService, so POS terminals and
+# scripts can use the inventory without the Tk GUI.
+#
+#   python inventory_server.py --port 8765
+#
+# Every route but /login needs the token it returns, sent as
+# "Authorization: Bearer <token>"; without one the answer is 401. The one
+# exception is POST /users on a database with no users yet, so the first
+# account can be registered.
+#
+#   POST   /login                 {"username", "password"} -> {"authenticated", "token"}
+#   POST   /logout                revokes the token sent with it
+#   POST   /users                 {"username", "password"}
+#   GET    /products/<id>         one product, or {"product": null}
+#   GET    /products?name=        the product with that exact name
+#   GET    /products?q=&limit=    products matching a search, best first
+#   POST   /products              {"name", "quantity", "price", "reorder_point"?}
+#   PUT    /products/<id>         {"quantity", "price", "reorder_point"?}
+#   DELETE /products/<id>
+#   POST   /sales                 {"items": [[product_id, quantity], ...]}
+#   GET    /alerts                pending low stock alerts
+#   POST   /alerts/take           pending alerts, marked as notified
+#   GET    /analytics/series?bucket=hour|day|week&start=&end=&product=&window=
+#   GET    /analytics/top?start=&end=&n=&by=revenue|units
+#   GET    /analytics/compare?start=&end=&product=
+#   GET    /reports/<name>/columns
+#   GET    /reports/<name>?after=<json>&limit=&sort=&desc=1&q=
+#   GET    /cache                 product cache hit and miss counts
+
+
+class InventoryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, so clients reuse connections
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    service = None
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            body = self.read_json()
+            if not self.authorized(method, parts):
+                return self.send_json(401, {'error': "Not logged in"})
+            result = self.route(method, parts, parse_qs(url.query), body)
+        except (ValueError, TypeError) as e:
+            return self.send_json(400, {'error': str(e)})
+        except sqlite3.OperationalError as e:
+            return self.send_json(503, {'error': str(e)})
+        except sqlite3.Error as e:
+            return self.send_json(500, {'error': str(e)})
+        except Exception:
+            # Anything else is a bug; still answer, so the client isn't left
+            # with a dropped connection
+            traceback.print_exc()
+            return self.send_json(500, {'error': "Internal server error"})
+        if result is None:
+            return self.send_json(404, {'error': "Not found"})
+        self.send_json(200, result)
+
+    def token(self):
+        scheme, _, token = (self.headers.get('Authorization') or '').partition(' ')
+        return token.strip() if scheme.lower() == 'bearer' else None
+
+    def authorized(self, method, parts):
+        if method == 'POST' and parts == ['login']:
+            return True
+        if method == 'POST' and parts == ['users'] and not self.service.has_users():
+            return True
+        return self.service.session_user(self.token()) is not None
+
+    def route(self, method, parts, query, body):
+        service = self.service
+        if method == 'POST' and parts == ['login']:
+            token = service.login(body.get('username') or '', body.get('password') or '')
+            return {'authenticated': token is not None, 'token': token}
+        if method == 'POST' and parts == ['logout']:
+            service.logout(self.token())
+            return {}
+        if method == 'POST' and parts == ['users']:
+            return {'registered': service.register_user(body.get('username'), body.get('password'))}
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'products':
+            return {'product': service.get_product(parts[1])}
+        if method == 'GET' and parts == ['products'] and 'name' in query:
+            return {'product': service.find_product(query['name'][0])}
+        if method == 'GET' and parts == ['products'] and 'q' in query:
+            return {'products': service.search_products(query['q'][0], query.get('limit', [10])[0])}
+        if method == 'POST' and parts == ['products']:
+            return {'id': service.add_product(body.get('name'), body.get('quantity'), body.get('price'),
+                                              body.get('reorder_point'))}
+        if method == 'PUT' and len(parts) == 2 and parts[0] == 'products':
+            return {'updated': service.update_product(parts[1], body.get('quantity'), body.get('price'),
+                                                      body.get('reorder_point'))}
+        if method == 'DELETE' and len(parts) == 2 and parts[0] == 'products':
+            return {'deleted': service.delete_product(parts[1])}
+        if method == 'POST' and parts == ['sales']:
+            return {'error': service.record_sales(body.get('items') or [])}
+        if method == 'GET' and parts == ['alerts']:
+            return {'alerts': service.stock_alerts()}
+        if method == 'POST' and parts == ['alerts', 'take']:
+            return {'alerts': service.stock_alerts(take=True)}
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'analytics':
+            first = lambda name, default=None: query.get(name, [default])[0]
+            if parts[1] == 'series':
+                return {'series': service.sales_series(first('bucket', 'day'), first('start'), first('end'),
+                                                       first('product'), first('window'))}
+            if parts[1] == 'top':
+                return {'products': service.top_products(first('start'), first('end'), first('n', 10),
+                                                         first('by', 'revenue'))}
+            if parts[1] == 'compare':
+                return service.compare_sales(first('start'), first('end'), first('product'))
+        if method == 'GET' and len(parts) == 3 and parts[0] == 'reports' and parts[2] == 'columns':
+            return service.report_columns(parts[1])
+        if method == 'GET' and parts == ['cache']:
+            return service.cache_stats()
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'reports':
+            first = lambda name, default=None: query.get(name, [default])[0]
+            after = first('after')
+            return service.fetch_report(parts[1], json.loads(after) if after else None,
+                                        first('limit', 200), first('sort'),
+                                        first('desc') == '1', first('q', ''))
+        return None
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            raise ValueError("Request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Per-request logging to stderr costs more than the request itself
+
+
+class InventoryServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+def make_server(host='127.0.0.1', port=8765, service=None):
+    handler = type('Handler', (InventoryHandler,), {'service': service or InventoryService()})
+    return InventoryServer((host, port), handler)
+
+
+# Client with the same methods as InventoryService, so the GUI can run
+# against a server instead of a local database file
+class InventoryClient:
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.token = None   # from authenticate_user, sent with every request
+        self._local = threading.local()
+
+    def request(self, method, path, payload=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        elif conn.sock is not None and select.select([conn.sock], [], [], 0)[0]:
+            # An idle keep-alive connection with something to read has been
+            # closed by the server; start a new one before sending
+            conn.close()
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        try:
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            # The connection dropped. Only requests that are safe to repeat
+            # are retried: a POST may already have been committed (a sale
+            # recorded twice would take the stock twice).
+            conn.close()
+            if method not in ('GET', 'PUT', 'DELETE'):
+                raise
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+        result = json.loads(response.read())
+        if response.status != 200:
+            raise ValueError(result.get('error', f"HTTP {response.status}"))
+        return result
+
+    def register_user(self, username, password):
+        return self.request('POST', '/users', {'username': username, 'password': password})['registered']
+
+    def authenticate_user(self, username, password):
+        result = self.request('POST', '/login', {'username': username, 'password': password})
+        self.token = result['token']
+        return result['authenticated']
+
+    def logout(self):
+        if self.token:
+            self.request('POST', '/logout')
+            self.token = None
+
+    def add_product(self, name, quantity, price, reorder_point=None):
+        return self.request('POST', '/products', {'name': name, 'quantity': quantity, 'price': price,
+                                                  'reorder_point': reorder_point})['id']
+
+    def update_product(self, product_id, quantity, price, reorder_point=None):
+        return self.request('PUT', f'/products/{product_id}', {'quantity': quantity, 'price': price,
+                                                               'reorder_point': reorder_point})['updated']
+
+    def delete_product(self, product_id):
+        return self.request('DELETE', f'/products/{product_id}')['deleted']
+
+    def get_product(self, product_id):
+        return self.request('GET', f'/products/{int(product_id)}')['product']
+
+    def find_product(self, name):
+        return self.request('GET', f"/products?{urlencode({'name': name})}")['product']
+
+    def search_products(self, text, limit=10):
+        return self.request('GET', f"/products?{urlencode({'q': text, 'limit': limit})}")['products']
+
+    def cache_stats(self):
+        return self.request('GET', '/cache')
+
+    def record_sale(self, product_id, quantity):
+        return self.record_sales([(product_id, quantity)])
+
+    def record_sales(self, items):
+        return self.request('POST', '/sales', {'items': [list(item) for item in items]})['error']
+
+    def stock_alerts(self, take=False):
+        if take:
+            return self.request('POST', '/alerts/take')['alerts']
+        return self.request('GET', '/alerts')['alerts']
+
+    def sales_series(self, bucket='day', start=None, end=None, product_id=None, window=None):
+        params = {'bucket': bucket, 'start': start, 'end': end, 'product': product_id, 'window': window}
+        return self.request('GET', f'/analytics/series?{self._query(params)}')['series']
+
+    def top_products(self, start=None, end=None, n=10, by='revenue'):
+        params = {'start': start, 'end': end, 'n': n, 'by': by}
+        return self.request('GET', f'/analytics/top?{self._query(params)}')['products']
+
+    def compare_sales(self, start, end, product_id=None):
+        params = {'start': start, 'end': end, 'product': product_id}
+        return self.request('GET', f'/analytics/compare?{self._query(params)}')
+
+    @staticmethod
+    def _query(params):
+        return urlencode({name: value for name, value in params.items() if value is not None})
+
+    def report_columns(self, report):
+        return self.request('GET', f'/reports/{report}/columns')
+
+    def fetch_report(self, report, after=None, limit=200, sort=None, descending=False, name_filter=''):
+        params = {'limit': limit, 'q': name_filter}
+        if after is not None:
+            params['after'] = json.dumps(after)
+        if sort:
+            params['sort'] = sort
+        if descending:
+            params['desc'] = '1'
+        result = self.request('GET', f'/reports/{report}?{urlencode(params)}')
+        if result['next'] is not None:
+            result['next'] = tuple(result['next'])
+        return result
+
+    def interrupt(self):
+        pass  # Queries run on the server; cancelling only drops pending work
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inventory HTTP/JSON server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', help="database file (default: inventory.db)")
+    args = parser.parse_args(argv)
+
+    metrics.start_from_env()
+    server = make_server(args.host, args.port, InventoryService(args.db))
+    print(f"Serving inventory on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import auth
+import inventory_analytics as analytics
+import inventory_db as db
+import inventory_search as product_search
+from money import Money, format_cents
+
+# Business logic for the inventory system with no GUI dependency. The Tk
+# app, the HTTP server and scripts all go through this class, so the same
+# validation and queries apply no matter who is calling.
+
+REPORTS = {
+    'products': db.products_query,
+    'low_stock': db.low_stock_query,
+    'sales': db.sales_query,
+    'sales_by_product': db.product_sales_query,
+    'sales_by_day': db.daily_sales_query,
+}
+
+
+class InventoryService:
+    def __init__(self, db_path=None):
+        if db_path:
+            db.configure(db_path)
+        self.sessions = auth.SessionStore()
+
+    # Users
+    def register_user(self, username, password):
+        if not username or not password:
+            raise ValueError("Username and password are required")
+        return db.register_user(username, password)
+
+    def authenticate_user(self, username, password):
+        return db.authenticate_user(username, password)
+
+    def has_users(self):
+        return db.has_users()
+
+    def login(self, username, password):
+        # Returns a session token, or None if the credentials are wrong
+        if not self.authenticate_user(username, password):
+            return None
+        return self.sessions.create(username)
+
+    def session_user(self, token):
+        return self.sessions.user(token)
+
+    def logout(self, token):
+        self.sessions.revoke(token)
+
+    # Products
+    # A reorder point of None (or blank) means the default for new products
+    # and no change for existing ones
+    def add_product(self, name, quantity, price, reorder_point=None):
+        name, quantity, price = self._product_fields(name, quantity, price)
+        return db.add_product(name, quantity, price, self._reorder_point(reorder_point))
+
+    def update_product(self, product_id, quantity, price, reorder_point=None):
+        _, quantity, price = self._product_fields('-', quantity, price)
+        return db.update_product(int(product_id), quantity, price, self._reorder_point(reorder_point))
+
+    def delete_product(self, product_id):
+        return db.delete_product(int(product_id))
+
+    # Single products, as dicts (None if there is no such product), served
+    # from the product cache when they were looked up recently
+    def get_product(self, product_id):
+        return self._product(db.get_product(int(product_id)))
+
+    def find_product(self, name):
+        return self._product(db.product_by_name(name))
+
+    # As-you-type search by name, tolerating typos; best matches first
+    def search_products(self, text, limit=10):
+        return [self._product(row) for row in product_search.search(text or '', min(int(limit), 100))]
+
+    def cache_stats(self):
+        return db.product_cache.stats()
+
+    # Sales; both return None on success or an error message
+    def record_sale(self, product_id, quantity):
+        return db.record_sale(int(product_id), int(quantity))
+
+    def record_sales(self, items):
+        return db.record_sales([(int(product_id), int(quantity)) for product_id, quantity in items])
+
+    # Low stock alerts, as dicts. take=True marks them notified, so each
+    # alert is handed out once; that is how a notifier builds its reorder list.
+    def stock_alerts(self, take=False):
+        rows = db.take_alerts() if take else db.pending_alerts()
+        return [{'id': product_id, 'name': name, 'quantity': quantity, 'reorder_point': reorder_point,
+                 'order_quantity': order_quantity, 'raised': raised}
+                for product_id, name, quantity, reorder_point, order_quantity, raised in rows]
+
+    # Sales analytics over [start, end); dates are ISO strings and revenue
+    # comes back as "12.34". A window gives a trailing moving average.
+    def sales_series(self, bucket='day', start=None, end=None, product_id=None, window=None):
+        if window:
+            rows = analytics.moving_average(bucket, int(window), start, end, product_id)
+        else:
+            rows = analytics.series(bucket, start, end, product_id)
+        return [{'bucket': key, 'units': units, 'revenue': format_cents(revenue)}
+                for key, units, revenue in rows]
+
+    def top_products(self, start=None, end=None, n=10, by='revenue'):
+        return [{'id': product_id, 'name': name, 'units': units, 'revenue': format_cents(revenue)}
+                for product_id, name, units, revenue in analytics.top_products(start, end, min(int(n), 1000), by)]
+
+    def compare_sales(self, start, end, product_id=None):
+        result = analytics.compare_periods(start, end, product_id)
+        for period in ('current', 'previous'):
+            units, revenue = result[period]
+            result[period] = {'units': units, 'revenue': format_cents(revenue)}
+        return result
+
+    # Reports, fetched a page at a time
+    def report_columns(self, report):
+        query = self._query(report)
+        return {'headings': query.headings, 'visible': query.visible_headings, 'key': query.key}
+
+    def fetch_report(self, report, after=None, limit=200, sort=None, descending=False, name_filter=''):
+        query = self._query(report)
+        if sort is not None and sort not in query.headings:
+            raise ValueError(f"Cannot sort {report} by {sort}")
+        rows, cursor = query.fetch(after, min(int(limit), 1000), sort, descending, name_filter)
+        return {'rows': rows, 'next': cursor}
+
+    def interrupt(self):
+        db.interrupt_all()
+
+    def _query(self, report):
+        if report not in REPORTS:
+            raise ValueError(f"Unknown report: {report}")
+        return REPORTS[report]()
+
+    @staticmethod
+    def _product(row):
+        if row is None:
+            return None
+        product_id, name, quantity, price, reorder_point = row
+        return {'id': product_id, 'name': name, 'quantity': quantity, 'price': format_cents(price),
+                'reorder_point': reorder_point}
+
+    @staticmethod
+    def _product_fields(name, quantity, price):
+        try:
+            quantity = int(quantity)
+            price = Money.parse(price).cents
+        except (TypeError, ValueError):
+            raise ValueError("Invalid quantity or price")
+        if not name:
+            raise ValueError("Product name is required")
+        if quantity < 0 or price < 0:
+            raise ValueError("Quantity and price cannot be negative")
+        return name, quantity, price
+
+    @staticmethod
+    def _reorder_point(value):
+        if value is None or value == '':
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid reorder point")
+        if value < 0:
+            raise ValueError("Reorder point cannot be negative")
+        return value
@@ -0,0 +1,297 @@
+import atexit
+import bisect
+import functools
+import os
+import threading
+import time
+
+# Operation timings for the inventory and ATM hot paths. Functions are
+# wrapped with @timed('op', layer) or blocks with `with measure('op', layer)`;
+# each (op, layer) pair keeps a count, an error count, a total and a latency
+# histogram. Layers separate time spent in SQLite ('sqlite') from time in
+# Tk callbacks ('ui') and in-memory work ('core').
+#
+# Collection is off until enable() is called (or METRICS=1 is set). While
+# off, a wrapped call costs one global check on top of the call itself.
+#
+# Export is Prometheus text format, served by serve() or written by dump():
+#
+#   METRICS_PORT=9464 python inventory_1.py
+#   curl localhost:9464/metrics
+#   curl 'localhost:9464/profile?sample=100'    profile 1 call in 100
+#   curl localhost:9464/profile                 collected profile so far
+#   curl 'localhost:9464/profile?sample=0'      stop profiling
+#
+# With METRICS_FILE set the metrics are written there when the process exits.
+# The profiler and HTTP modules are imported only when they are used, so
+# importing this module stays cheap for the modules that are instrumented.
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_enabled = os.environ.get('METRICS', '') not in ('', '0')
+_histograms = {}          # (op, layer) -> Histogram
+_histograms_lock = threading.Lock()
+
+# Sampling profiler: every _sample_every-th measured call runs under cProfile
+_sample_every = 0
+_sample_count = 0
+_profile = None
+_profile_lock = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ('op', 'layer', 'count', 'errors', 'total', 'buckets', 'lock')
+
+    def __init__(self, op, layer):
+        self.op = op
+        self.layer = layer
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # the last one is +Inf
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.count = self.errors = 0
+            self.total = 0.0
+            self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds, failed=False):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            self.buckets[i] += 1
+            if failed:
+                self.errors += 1
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def histogram(op, layer='core'):
+    key = (op, layer)
+    found = _histograms.get(key)
+    if found is None:
+        with _histograms_lock:
+            found = _histograms.setdefault(key, Histogram(op, layer))
+    return found
+
+
+def reset():
+    # Zeroes every histogram in place; decorated functions keep theirs
+    with _histograms_lock:
+        for hist in _histograms.values():
+            hist.clear()
+
+
+def timed(op, layer='core'):
+    # Decorator: records every call of the function under (op, layer)
+    def decorate(func):
+        hist = histogram(op, layer)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            return _call(hist, func, args, kwargs)
+        return wrapper
+    return decorate
+
+
+def _call(hist, func, args, kwargs):
+    sample_every = _sample_every   # read once; profiling may be switched off meanwhile
+    if sample_every and _sampled(sample_every):
+        func = functools.partial(_profiled, func)
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except BaseException:
+        hist.observe(time.perf_counter() - start, failed=True)
+        raise
+    hist.observe(time.perf_counter() - start)
+    return result
+
+
+class _Measure:
+    __slots__ = ('hist', 'start')
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        self.hist.observe(time.perf_counter() - self.start, failed=kind is not None)
+        return False
+
+
+class _Nothing:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        return False
+
+
+_NOTHING = _Nothing()
+
+
+def measure(op, layer='core'):
+    # Context manager for timing a block rather than a whole function
+    if not _enabled:
+        return _NOTHING
+    return _Measure(histogram(op, layer))
+
+
+# Profiling
+def set_profiling(sample_every):
+    # Profile one measured call in sample_every; 0 turns profiling off and
+    # keeps what was collected until the next start
+    global _sample_every, _sample_count, _profile
+    with _profile_lock:
+        if sample_every and not _sample_every:
+            import cProfile
+            _profile = cProfile.Profile()
+        _sample_every = int(sample_every)
+        _sample_count = 0
+
+
+def _sampled(sample_every):
+    global _sample_count
+    _sample_count += 1   # a lost update under contention only shifts the sample
+    return _sample_count % sample_every == 0
+
+
+def _profiled(func, *args, **kwargs):
+    # cProfile allows one active profile per thread, so samples that would
+    # overlap another one run unprofiled
+    if not _profile_lock.acquire(blocking=False):
+        return func(*args, **kwargs)
+    try:
+        profile = _profile
+        if profile is None:
+            return func(*args, **kwargs)
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        _profile_lock.release()
+
+
+def profile_report(limit=30):
+    import io
+    import pstats
+    with _profile_lock:
+        if _profile is None:
+            return "Profiling has not been started\n"
+        out = io.StringIO()
+        try:
+            pstats.Stats(_profile, stream=out).sort_stats('cumulative').print_stats(limit)
+        except TypeError:
+            return "No calls sampled yet\n"
+        return out.getvalue()
+
+
+# Export
+def render():
+    # Prometheus text exposition format
+    with _histograms_lock:
+        hists = sorted(_histograms.values(), key=lambda h: (h.op, h.layer))
+    lines = [
+        "# HELP app_operation_seconds Latency of instrumented operations",
+        "# TYPE app_operation_seconds histogram",
+    ]
+    errors = [
+        "# HELP app_operation_errors_total Instrumented operations that raised",
+        "# TYPE app_operation_errors_total counter",
+    ]
+    for hist in hists:
+        with hist.lock:
+            buckets, count, total, failed = list(hist.buckets), hist.count, hist.total, hist.errors
+        labels = f'op="{_label(hist.op)}",layer="{_label(hist.layer)}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += n
+            lines.append(f'app_operation_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"app_operation_seconds_sum{{{labels}}} {total!r}")
+        lines.append(f"app_operation_seconds_count{{{labels}}} {count}")
+        errors.append(f"app_operation_errors_total{{{labels}}} {failed}")
+    return '\n'.join(lines + errors) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def dump(path):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(path + '.tmp', path)
+
+
+def serve(port=9464, host='127.0.0.1'):
+    # Serves /metrics and /profile from a daemon thread; returns the server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlsplit
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/metrics':
+                return self.send_text(render(), 'text/plain; version=0.0.4')
+            if url.path == '/profile':
+                sample = parse_qs(url.query).get('sample')
+                if sample:
+                    try:
+                        set_profiling(max(int(sample[0]), 0))
+                    except ValueError:
+                        return self.send_text("sample must be a whole number\n", status=400)
+                    return self.send_text(f"profiling 1 call in {sample[0]}\n" if _sample_every
+                                          else "profiling off\n")
+                return self.send_text(profile_report())
+            self.send_text("Not found\n", status=404)
+
+        def send_text(self, text, content_type='text/plain', status=200):
+            data = text.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+
+def start_from_env():
+    # Called by the programs' entry points: METRICS_PORT serves the
+    # metrics, METRICS_FILE writes them at exit. Either one turns them on.
+    port = os.environ.get('METRICS_PORT')
+    path = os.environ.get('METRICS_FILE')
+    if port or path:
+        enable()
+    if port:
+        serve(int(port))
+    if path:
+        atexit.register(dump, path)
@@ -0,0 +1,88 @@
+# Exact money amounts stored as a whole number of cents. Arithmetic is
+# plain int arithmetic, so there is no float rounding drift; values are
+# parsed from and formatted to "12.34" strings. Hot paths (AccountStore
+# balances) work on the int cents directly: a Money operation is a
+# Python-level call and costs more than a C Decimal one.
+
+
+class Money:
+    __slots__ = ('cents',)
+
+    def __init__(self, cents=0):
+        self.cents = cents
+
+    @classmethod
+    def parse(cls, value):
+        # Accepts "12", "12.3", "12.34", "$1,234.50", "-5" (or a Money)
+        if isinstance(value, Money):
+            return value
+        # Fast path for plain "1234.56", the form files and ledgers use
+        if type(value) is str and len(value) > 3 and value[-3] == '.':
+            digits = value[:-3] + value[-2:]
+            if digits.isdigit() and digits.isascii():
+                return cls(int(digits))
+        text = str(value).strip().replace(',', '')
+        sign = 1
+        if text.startswith('-'):
+            sign, text = -1, text[1:]
+        text = text.lstrip('$')
+        whole, _, fraction = text.partition('.')
+        fraction = fraction.rstrip('0') if len(fraction) > 2 else fraction
+        if not (whole or fraction) or not (whole.isdigit() or whole == '') \
+                or not (fraction.isdigit() or fraction == '') or len(fraction) > 2:
+            raise ValueError(f"Invalid amount: {value!r}")
+        return cls(sign * (int(whole or 0) * 100 + int(fraction.ljust(2, '0'))))
+
+    def __add__(self, other):
+        return Money(self.cents + other.cents)
+
+    def __sub__(self, other):
+        return Money(self.cents - other.cents)
+
+    def __mul__(self, count):
+        return Money(self.cents * count)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and self.cents == other.cents
+
+    def __lt__(self, other):
+        return self.cents < other.cents
+
+    def __le__(self, other):
+        return self.cents <= other.cents
+
+    def __gt__(self, other):
+        return self.cents > other.cents
+
+    def __ge__(self, other):
+        return self.cents >= other.cents
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __str__(self):
+        cents = self.cents
+        if cents < 0:
+            return f"-{-cents // 100}.{-cents % 100:02d}"
+        return f"{cents // 100}.{cents % 100:02d}"
+
+    def __format__(self, spec):
+        return format(str(self), spec) if spec else str(self)
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+
+ZERO = Money(0)
+
+
+def format_cents(cents):
+    return str(Money(cents))
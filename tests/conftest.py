@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import inventory_db as db  # noqa: E402
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    # A fresh, migrated inventory database; yields its connection
+    db.configure(str(tmp_path / 'inventory.db'))
+    yield db.get_connection()
+    db.close_connection()
@@ -0,0 +1,222 @@
+# The same checks against every ATM storage backend (see atm_core.open_store):
+# account operations must give the same results on each, and the persistent
+# ones must come back unchanged after a reopen.
+import os
+import random
+import subprocess
+import sys
+import threading
+import textwrap
+
+import pytest
+
+import auth
+from atm_accounts import AccountStore
+from atm_core import ACCOUNT_ATTEMPTS, BACKENDS, ATMCore, TooManyAttempts, open_store
+from atm_journal import Journal
+from atm_ledger import Ledger
+from money import Money
+
+PERSISTENT = [backend for backend in BACKENDS if backend != 'memory']
+
+
+def cheap_hash(pin):
+    # Real scrypt hashes, just cheap enough for tests
+    return auth.hash_password(pin, n=16)
+
+
+@pytest.fixture
+def configs(tmp_path):
+    return {
+        'memory': 'memory',
+        'log': f"log:{tmp_path / 'ledger'}",
+        'sqlite': f"sqlite:{tmp_path / 'atm.db'}",
+    }
+
+
+def open_core(config):
+    return ATMCore(open_store(config), cheap_hash)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_account_operations(configs, backend):
+    core = open_core(configs[backend])
+    try:
+        assert core.create_account('alice', '1234', Money.parse('100.00'))
+        assert core.create_account('bob', '9999')
+        assert not core.create_account('alice', '0000')
+        with pytest.raises(ValueError):
+            core.create_account('carol', '1111', Money.parse('-1'))
+        assert 'carol' not in core.accounts
+        assert core.authenticate('alice', '0000') is None
+        assert core.authenticate('nobody', '1234') is None
+
+        alice = core.authenticate('alice', '1234')
+        assert alice.deposit(Money.parse('0.10'))
+        assert not alice.deposit(Money(0))
+        assert not alice.withdraw(Money.parse('-1'))
+        assert not alice.withdraw(Money.parse('500'))
+        assert alice.withdraw(Money.parse('20.05'))
+        assert core.transfer('alice', 'bob', Money.parse('30'))
+        assert not core.transfer('alice', 'alice', Money.parse('1'))
+        assert not core.transfer('alice', 'nobody', Money.parse('1'))
+        assert not core.transfer('bob', 'alice', Money.parse('31'))
+        assert str(alice.check_balance()) == '50.05'
+        assert sorted(core.accounts) == ['alice', 'bob']
+        assert [entry[1] for entry in alice.history()] == ['O', 'W', 'D', 'C']
+    finally:
+        core.close()
+
+
+@pytest.mark.parametrize('backend', PERSISTENT)
+def test_reopen_keeps_balances(configs, backend):
+    core = open_core(configs[backend])
+    core.create_account('alice', '1234', Money.parse('100.00'))
+    core.create_account('bob', '9999')
+    core.transfer('alice', 'bob', Money.parse('30'))
+    core.close()
+
+    core = open_core(configs[backend])
+    try:
+        assert str(core.authenticate('bob', '9999').check_balance()) == '30.00'
+        assert str(core.accounts['alice'].check_balance()) == '70.00'
+        # Nothing recovered twice
+        assert [entry[1] for entry in core.accounts['bob'].history()] == ['I', 'C']
+    finally:
+        core.close()
+
+
+@pytest.mark.parametrize('backend', PERSISTENT)
+def test_lockout_survives_reopen(configs, backend):
+    core = open_core(configs[backend])
+    core.create_account('alice', '1234')
+    for _ in range(ACCOUNT_ATTEMPTS):
+        assert core.authenticate('alice', '0000') is None
+    with pytest.raises(TooManyAttempts):
+        core.authenticate('alice', '1234')
+    core.close()
+
+    core = open_core(configs[backend])
+    try:
+        with pytest.raises(TooManyAttempts):
+            core.authenticate('alice', '1234')
+    finally:
+        core.close()
+
+
+def test_ledger_replay_stops_at_torn_line(tmp_path):
+    config = f"log:{tmp_path}"
+    core = open_core(config)
+    core.create_account('alice', '1234', Money.parse('10.00'))
+    core.accounts['alice'].deposit(Money.parse('5.00'))
+    core.close()
+    # A crash in the middle of writing a deposit record
+    segment = max(name for name in os.listdir(tmp_path) if name.startswith('ledger-'))
+    with open(tmp_path / segment, 'a', encoding='utf-8') as f:
+        f.write("D\talice\t99")
+
+    core = open_core(config)
+    try:
+        alice = core.accounts['alice']
+        assert str(alice.check_balance()) == '15.00'
+        assert alice.deposit(Money.parse('1.00'))
+    finally:
+        core.close()
+    core = open_core(config)
+    try:
+        assert str(core.accounts['alice'].check_balance()) == '16.00'
+    finally:
+        core.close()
+
+
+def test_journal_rebuilt_after_crash(tmp_path):
+    # The process dies after the ledger has the changes on disk but before
+    # the journal has written their entries
+    script = textwrap.dedent(f'''
+        import os
+        from atm_accounts import AccountStore
+        from atm_journal import Journal
+        from atm_ledger import Ledger
+        from money import Money
+        ledger = Ledger({str(tmp_path)!r})
+        store = AccountStore(ledger=ledger, journal=Journal({str(tmp_path / 'journal.db')!r}, flush_interval=3600))
+        store.load(ledger.open())
+        store.create('alice', 'x', Money(1000))
+        store.create('bob', 'x')
+        store['alice'].deposit(Money(500))
+        store.transfer('alice', 'bob', Money(300))
+        os._exit(0)
+    ''')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', script], cwd=root, check=True)
+
+    for _ in range(2):   # and nothing is rebuilt twice
+        core = open_core(f"log:{tmp_path}")
+        try:
+            assert [entry[1:] for entry in core.accounts['alice'].history()] \
+                == [('O', 300, 1200), ('D', 500, 1500), ('C', 1000, 1000)]
+            assert [entry[1:] for entry in core.accounts['bob'].history()] == [('I', 300, 300), ('C', 0, 0)]
+        finally:
+            core.close()
+
+
+def test_ledger_compaction(tmp_path):
+    def open_ledger_store():
+        ledger = Ledger(str(tmp_path), segment_records=10, commit_delay=0)
+        store = AccountStore(ledger=ledger, journal=Journal())
+        store.load(ledger.open())
+        return store
+
+    store = open_ledger_store()
+    store.create('alice', cheap_hash('1234'), Money(1000))
+    store.create('bob', cheap_hash('9999'))
+    for _ in range(40):
+        store.transfer('alice', 'bob', Money(10))
+    store.set_locked_until('bob', 2e9)
+    store.close()
+
+    files = os.listdir(tmp_path)
+    snapshots = [name for name in files if name.startswith('snapshot-')]
+    assert len(snapshots) == 1
+    covered = int(snapshots[0][len('snapshot-'):-len('.txt')])
+    # Every sealed segment was folded into the snapshot and deleted
+    assert all(int(name[len('ledger-'):-len('.log')]) > covered for name in files if name.startswith('ledger-'))
+
+    store = open_ledger_store()
+    try:
+        assert store['alice'].balance.cents == 600
+        assert store['bob'].balance.cents == 400
+        assert store.locked_until('bob') == 2e9
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_concurrent_operations_conserve_money(configs, backend, threads=4, ops=300):
+    core = open_core(configs[backend])
+    numbers = [f"{i:04d}" for i in range(20)]
+    for number in numbers:
+        core.create_account(number, '0000', Money(100000))
+    net = [0] * threads
+
+    def worker(t):
+        rng = random.Random(t)
+        for _ in range(ops):
+            kind, amount = rng.random(), Money(rng.randint(1, 5000))
+            if kind < 0.3:
+                net[t] += amount.cents if core.accounts[rng.choice(numbers)].deposit(amount) else 0
+            elif kind < 0.6:
+                net[t] -= amount.cents if core.accounts[rng.choice(numbers)].withdraw(amount) else 0
+            else:
+                core.transfer(rng.choice(numbers), rng.choice(numbers), amount)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    try:
+        total = sum(account.balance.cents for account in core.accounts.values())
+        assert total == 100000 * len(numbers) + sum(net)
+    finally:
+        core.close()
@@ -0,0 +1,28 @@
+# The batch runner end to end, through the command line as it is used
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_batch(ops, workers):
+    return subprocess.run([sys.executable, 'atm_batch.py', '-', '--workers', str(workers)],
+                          cwd=ROOT, input=ops, capture_output=True, text=True, timeout=60, check=True)
+
+
+def test_negative_create_then_cross_shard_transfers():
+    # Transfers to an account whose create was rejected used to be sent to
+    # the other shard as credits, which killed that worker and hung the run
+    sources = [f"src{i}" for i in range(20)]
+    ops = "create bad 1 -5.00\n"
+    ops += "".join(f"create {source} 1 100\n" for source in sources)
+    ops += "".join(f"transfer {source} bad 1\n" for source in sources)
+
+    for workers in (1, 2):
+        done = run_batch(ops, workers)
+        lines = [line.split('\t') for line in done.stdout.splitlines()]
+        assert lines[0] == ['1', 'create', 'rejected', 'invalid amount']
+        assert all(status == 'ok' for _, kind, status, _ in lines[1:21])
+        assert [line[1:3] for line in lines[21:]] == [['transfer', 'rejected']] * 20
+        assert '20 accounts holding 2000.00 (balanced)' in done.stderr
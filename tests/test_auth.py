@@ -0,0 +1,24 @@
+import pytest
+
+import auth
+
+CORRUPTED = [
+    'scrypt$x$8$1$..$..',           # parameters that aren't numbers
+    'scrypt$16$8$1$!!!$@@',         # salt and digest that aren't base64
+    'scrypt$16$8$1$YQ=$YQ==',       # truncated base64
+    'scrypt$3$8$1$YQ==$YQ==',       # n that scrypt refuses
+    'scrypt$-1$8$1$YQ==$YQ==',
+    'pbkdf2_sha256$x$YQ==$YQ==',
+]
+
+
+def test_verify_password():
+    stored = auth.hash_password('secret', n=16)
+    assert auth.verify_password('secret', stored)
+    assert not auth.verify_password('wrong', stored)
+
+
+@pytest.mark.parametrize('stored', CORRUPTED)
+def test_corrupted_hash_matches_nothing(stored):
+    assert auth.verify_password('secret', stored) is False
+    assert auth.needs_rehash(stored)
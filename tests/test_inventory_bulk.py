@@ -0,0 +1,40 @@
+# Bulk import/export round trips (inventory_bulk)
+import io
+
+import inventory_bulk as bulk
+import inventory_db as db
+
+
+def reorder_points(conn):
+    return dict(conn.execute("SELECT name, reorder_point FROM products"))
+
+
+def alerts(conn):
+    return sorted(name for (name,) in conn.execute(
+        "SELECT p.name FROM stock_alerts a JOIN products p ON p.id = a.product_id"))
+
+
+def test_export_import_keeps_reorder_points(inventory):
+    db.add_product('bolts', 8, 25, reorder_point=10)
+    db.add_product('nuts', 3, 10, reorder_point=2)
+    db.add_product('washers', 4, 5)
+    before = reorder_points(inventory), alerts(inventory)
+    assert before[1] == ['bolts', 'washers']
+
+    for fmt in ('csv', 'jsonl'):
+        f = io.StringIO()
+        assert bulk.export_table('products', f, fmt) == 3
+        # Different reorder points in the database, restored by the import
+        with inventory:
+            inventory.execute("UPDATE products SET reorder_point = 0")
+        f.seek(0)
+        assert bulk.import_products(bulk.product_rows(bulk.read_records(f, fmt))) == 3
+        assert (reorder_points(inventory), alerts(inventory)) == before
+
+
+def test_import_without_reorder_point_keeps_existing(inventory):
+    db.add_product('bolts', 8, 25, reorder_point=10)
+    f = io.StringIO("name,quantity,price\nbolts,12,0.30\nscrews,1,0.05\n")
+    assert bulk.import_products(bulk.product_rows(bulk.read_records(f, 'csv'))) == 2
+    assert reorder_points(inventory) == {'bolts': 10, 'screws': db.DEFAULT_REORDER_POINT}
+    assert alerts(inventory) == ['screws']
@@ -0,0 +1,130 @@
+# EXPLAIN QUERY PLAN checks for the report queries, and the migrations that
+# create the indexes they rely on. A query that falls back to scanning a
+# whole table fails here rather than in production on a large inventory.
+import sqlite3
+
+import pytest
+
+import inventory_db as db
+import inventory_search
+
+EXPECTED = [
+    # The report reads the alert rows and looks each product up, rather
+    # than scanning products; later pages start inside stock_alerts
+    ("low stock report",
+     *db.low_stock_query().sql(),
+     "SEARCH p USING INTEGER PRIMARY KEY"),
+    ("low stock report, next page",
+     *db.low_stock_query().sql(after=(40, 40)),
+     "SEARCH a USING INTEGER PRIMARY KEY (rowid>?)"),
+    ("pending stock alerts",
+     "SELECT product_id FROM stock_alerts WHERE notified IS NULL ORDER BY raised", (),
+     "idx_stock_alerts_pending"),
+    ("sales summary join",
+     "SELECT p.name, s.quantity, s.total_price, s.date "
+     "FROM sales s JOIN products p ON s.product_id = p.id", (),
+     "idx_sales_product_date"),
+    ("sales for one product",
+     "SELECT quantity, total_price, date FROM sales WHERE product_id = ? ORDER BY date", (1,),
+     "idx_sales_product_date"),
+    ("sales in a date range",
+     "SELECT * FROM sales WHERE date >= ? AND date < ?", ('2024-01-01', '2024-02-01'),
+     "idx_sales_date"),
+    ("product cache change log",
+     "SELECT product_id, version FROM product_changes WHERE version > ?", (0,),
+     "idx_product_changes_version"),
+    ("product by name",
+     db.PRODUCT_BY_NAME, ('p1',),
+     "idx_products_name"),
+    ("product search",
+     inventory_search.SEARCH, ('"oak"*', 200),
+     "VIRTUAL TABLE INDEX"),
+]
+
+# The tables as the first release created them, before any migration
+BASELINE_SCHEMA = (
+    '''CREATE TABLE products (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       name TEXT NOT NULL,
+       quantity INTEGER NOT NULL,
+       price REAL NOT NULL)''',
+    '''CREATE TABLE users (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       username TEXT NOT NULL UNIQUE,
+       password TEXT NOT NULL)''',
+    '''CREATE TABLE sales (
+       id INTEGER PRIMARY KEY AUTOINCREMENT,
+       product_id INTEGER,
+       quantity INTEGER,
+       total_price REAL,
+       date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+       FOREIGN KEY (product_id) REFERENCES products (id))''',
+)
+
+
+def query_plan(conn, sql, params=()):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def schema(conn):
+    return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master"))
+
+
+@pytest.fixture(scope='module')
+def analyzed(tmp_path_factory):
+    # Realistic planner statistics instead of an empty database
+    db.configure(str(tmp_path_factory.mktemp('plans') / 'plans.db'))
+    conn = db.get_connection()
+    with conn:
+        conn.executemany("INSERT INTO products (name, quantity, price) VALUES (?, ?, ?)",
+                         [(f"p{i}", i % 500, 100) for i in range(5000)])
+        conn.executemany("INSERT INTO sales (product_id, quantity, total_price, date) VALUES (?, ?, ?, ?)",
+                         [(i % 5000 + 1, 1, 100, f"2024-{i % 12 + 1:02d}-01") for i in range(20000)])
+    conn.execute("ANALYZE")
+    yield conn
+    db.close_connection()
+
+
+@pytest.mark.parametrize('label, sql, params, index', EXPECTED, ids=[label for label, *_ in EXPECTED])
+def test_query_uses_index(analyzed, label, sql, params, index):
+    plan = query_plan(analyzed, sql, params)
+    assert any(index in step for step in plan), f"{label}: {' | '.join(plan)}"
+
+
+def test_new_database_is_current(inventory):
+    assert db.schema_version(inventory) == db.MIGRATIONS[-1][0]
+
+
+def test_migrates_baseline_database(tmp_path):
+    path = str(tmp_path / 'baseline.db')
+    old = sqlite3.connect(path)
+    with old:
+        for statement in BASELINE_SCHEMA:
+            old.execute(statement)
+        old.execute("INSERT INTO products (name, quantity, price) VALUES ('Oak Chair', 3, 19.99)")
+        old.execute("INSERT INTO products (name, quantity, price) VALUES ('Desk Lamp', 40, 12.5)")
+        old.execute("INSERT INTO sales (product_id, quantity, total_price, date) "
+                    "VALUES (1, 2, 39.98, '2024-03-01 10:00:00')")
+    old.close()
+
+    db.configure(path)
+    try:
+        conn = db.get_connection()
+        assert db.schema_version(conn) == db.MIGRATIONS[-1][0]
+        # Money became integer cents, and the rollups and alerts were backfilled
+        assert conn.execute("SELECT name, quantity, price, reorder_point FROM products ORDER BY id").fetchall() \
+            == [('Oak Chair', 3, 1999, db.DEFAULT_REORDER_POINT), ('Desk Lamp', 40, 1250, db.DEFAULT_REORDER_POINT)]
+        assert conn.execute("SELECT total_price FROM sales").fetchall() == [(3998,)]
+        assert conn.execute("SELECT product_id, units, revenue FROM product_sales_totals").fetchall() \
+            == [(1, 2, 3998)]
+        assert conn.execute("SELECT product_id FROM stock_alerts").fetchall() == [(1,)]
+        assert [row[0] for row in inventory_search.search("lam")] == [2]
+    finally:
+        db.close_connection()
+
+
+def test_migrations_rerun_is_noop(inventory):
+    db.add_product("Oak Chair", 3, 1999, None)
+    before = schema(inventory), inventory.execute("SELECT * FROM products").fetchall()
+    assert db.migrate(inventory) == db.MIGRATIONS[-1][0]
+    assert (schema(inventory), inventory.execute("SELECT * FROM products").fetchall()) == before
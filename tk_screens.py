@@ -0,0 +1,55 @@
+import tkinter as tk
+
+# Screen switching for the Tk front ends. Each screen is built once, into its
+# own frame, the first time it is shown; all the frames share one grid cell
+# and showing a screen just raises its frame to the top. Only the screen's
+# refresh callback runs on later visits, to reset entries or reload data,
+# so navigating never destroys and recreates widgets.
+
+
+class ScreenManager:
+    def __init__(self, master):
+        # The caller places self.container with pack or grid, as it likes
+        self.container = tk.Frame(master)
+        self.container.grid_rowconfigure(0, weight=1)
+        self.container.grid_columnconfigure(0, weight=1)
+        self.screens = {}      # name -> (build, refresh)
+        self.frames = {}       # name -> frame, for screens built so far
+        self.current = None
+
+    def add(self, name, build, refresh=None):
+        # build(frame) creates the widgets; refresh() runs on every show
+        self.screens[name] = (build, refresh)
+
+    def show(self, name):
+        build, refresh = self.screens[name]
+        frame = self.frames.get(name)
+        if frame is None:
+            frame = tk.Frame(self.container)
+            build(frame)
+            frame.grid(row=0, column=0, sticky='nsew')
+            self.frames[name] = frame
+        if refresh:
+            refresh()
+        frame.tkraise()
+        self.current = name
+        # Hidden screens stay mapped underneath, so move the keyboard focus
+        # onto the visible one
+        entry = _first_entry(frame)
+        (entry or frame).focus_set()
+        return frame
+
+
+def _first_entry(widget):
+    for child in widget.winfo_children():
+        if isinstance(child, tk.Entry):
+            return child
+        found = _first_entry(child)
+        if found is not None:
+            return found
+    return None
+
+
+def clear(*entries):
+    for entry in entries:
+        entry.delete(0, 'end')